@@ -0,0 +1,154 @@
+#
+# Polyomino Imagery Environment Codec Microbenchmark
+#
+# Description: Measures the time to decode a full-screenshot state message (into a topic, scalars, and uint8
+#              screenshot arrays) with the original decoder, shared.decode_message, and shared.codec.MessageCodec,
+#              for each available JSON decoder
+# Usage: python -m benchmarks.codec [--iterations 500] [--binary] [--output results.json]
+#
+import argparse
+import json
+import platform
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.runner import git_revision
+from benchmarks.standin import DEFAULT_FRAME_SIZE
+from shared import JSON_DECODERS
+from shared import STATE_TOPIC
+from shared import VIEWPORTS
+from shared import decode_message
+from shared.codec import MessageCodec
+
+
+def parse_args():
+    """Parses command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Polyomino Imagery Environment - Codec Microbenchmark"
+    )
+
+    parser.add_argument("--iterations", type=int, default=500, help="decodes per measurement (default: 500)")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="measurements per decoder; the fastest is reported (default: 5)")
+    parser.add_argument("--frame-size", type=int, default=DEFAULT_FRAME_SIZE, help="screenshot width and height")
+    parser.add_argument("--binary", action="store_true", help="also measure the binary screenshot wire format")
+    parser.add_argument("--output", type=Path, default=None, help="write results as JSON to this file")
+
+    return parser.parse_args()
+
+
+def state_message(frame_size, binary=False, seed=0):
+    """Returns the frames of a state message shaped like the Godot environment's, with random screenshots."""
+    rng = np.random.default_rng(seed)
+    screenshots = [rng.integers(0, 256, size=frame_size * frame_size, dtype=np.uint8) for _ in VIEWPORTS]
+
+    data = {
+        "last_action_seqno": 42,
+        "left_viewport": {"id": 3, "screenshot": 0 if binary else screenshots[0].tolist(), "shape": 5},
+        "mode": 0,
+        "right_viewport": {"id": 4, "screenshot": 1 if binary else screenshots[1].tolist(), "shape": 5},
+        "same": False,
+        "transformations": {"rotation_active": 321.97, "scale": 0.83, "translation": 10.27},
+    }
+    head = f"{STATE_TOPIC} {json.dumps({'data': data, 'header': {'seqno': 8, 'time': 1751298299783}})}"
+
+    frames = [head.encode("utf-8")]
+    if binary:
+        frames.extend(screenshot.tobytes() for screenshot in screenshots)
+    return frames
+
+
+def original_decode(frames):
+    """The decoder that shared.decode_message replaced: the payload starts at the first brace and is decoded by the
+    standard library's json, and screenshots are then converted into arrays (as every consumer does)."""
+    msg = frames[0].decode("utf-8")
+    ndx = msg.find("{")
+    topic, payload = msg[0: ndx - 1], json.loads(msg[ndx:])
+
+    for viewport in VIEWPORTS:
+        viewport_data = payload["data"][viewport]
+        viewport_data["screenshot"] = np.asarray(viewport_data["screenshot"], dtype=np.uint8)
+    return topic, payload
+
+
+def legacy_decode(loads):
+    """shared.decode_message, followed by the conversion of screenshots into arrays."""
+    def decode(frames):
+        topic, payload = decode_message(frames, loads)
+        for viewport in VIEWPORTS:
+            viewport_data = payload["data"][viewport]
+            viewport_data["screenshot"] = np.asarray(viewport_data["screenshot"], dtype=np.uint8)
+        return topic, payload
+
+    return decode
+
+
+def measure(decode, frames, iterations, repeats):
+    """Returns the fastest of repeats measurements of the mean time to decode frames, in microseconds."""
+    decode(frames)
+
+    best_ns = None
+    for _ in range(repeats):
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            decode(frames)
+        elapsed_ns = (time.perf_counter_ns() - start) / iterations
+        best_ns = elapsed_ns if best_ns is None else min(best_ns, elapsed_ns)
+
+    return best_ns / 1000
+
+
+def decoders():
+    """Returns the benchmarked decoders by name."""
+    candidates = {"original": original_decode}
+    for name, loads in JSON_DECODERS.items():
+        candidates[f"decode_message[{name}]"] = legacy_decode(loads)
+        candidates[f"MessageCodec[{name}]"] = MessageCodec(name).decode
+    return candidates
+
+
+def main():
+    """Main entry point for the script."""
+    args = parse_args()
+
+    report = {
+        "revision": git_revision(),
+        "time": round(time.time() * 1000),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"iterations": args.iterations, "repeats": args.repeats, "frame_size": args.frame_size},
+        "results": {},
+    }
+
+    formats = ("json", "binary") if args.binary else ("json",)
+    for wire_format in formats:
+        frames = state_message(args.frame_size, binary=wire_format == "binary")
+        print(f"{wire_format} wire format ({sum(len(frame) for frame in frames)} bytes per state):", flush=True)
+
+        results = {}
+        for name, decode in decoders().items():
+            if wire_format == "binary" and name == "original":
+                continue  # the original decoder predates the binary wire format
+
+            results[name] = measure(decode, frames, args.iterations, args.repeats)
+
+        baseline = results["original"] if "original" in results else results["decode_message[json]"]
+        for name, elapsed_us in results.items():
+            print(f"  {name:<28} {elapsed_us:10.1f} us/message  {baseline / elapsed_us:5.1f}x", flush=True)
+
+        report["results"][wire_format] = {name: {"us_per_message": elapsed_us, "speedup": baseline / elapsed_us}
+                                          for name, elapsed_us in results.items()}
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#
+# Polyomino Imagery Environment Benchmarks
+#
+# Description: Measures the throughput, latency, and peak memory of the environment's Python clients against a local
+#              stand-in for the Godot environment (see benchmarks/standin.py)
+# Usage: python -m benchmarks [--consumers env receive subscriber image_capture metrics] [--output results.json]
+#
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.standin import DEFAULT_FRAME_SIZE
+from benchmarks.standin import StandInEnvironment
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+CONSUMERS = ("env", "receive", "subscriber", "image_capture", "metrics")
+
+# the scripts under scripts/ and the stdout prefix they print once per processed message
+SCRIPT_CONSUMERS = {
+    "subscriber": ("subscriber.py", "topic:"),
+    "image_capture": ("image_capture.py", "Image received"),
+    "metrics": ("metrics.py", "State update"),
+}
+
+# time allowed for subscribers to connect before the stand-in starts publishing (avoids ZMQ's "slow joiner" loss)
+WARMUP_S = 1.0
+
+# scripts shut down after this much inactivity (which must cover their start-up and the stand-in's warmup)
+SCRIPT_TIMEOUT_MS = 3000
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def parse_args():
+    """Parses command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Polyomino Imagery Environment - Client Benchmarks"
+    )
+
+    parser.add_argument("--consumers", nargs="+", choices=CONSUMERS, default=list(CONSUMERS),
+                        help="the consumers to benchmark (default: all)")
+    parser.add_argument("--steps", type=int, default=1000, help="environment steps per env run (default: 1000)")
+    parser.add_argument("--messages", type=int, default=2000, help="states published per stream run (default: 2000)")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="states published per second in stream runs; 0 publishes as fast as possible")
+    parser.add_argument("--frame-size", type=int, default=DEFAULT_FRAME_SIZE, help="screenshot width and height")
+    parser.add_argument("--binary", action="store_true", help="publish screenshots as raw multipart frames")
+    parser.add_argument("--state-port", type=int, default=30001, help="the stand-in's state port (default: 30001)")
+    parser.add_argument("--action-port", type=int, default=30002, help="the stand-in's action port (default: 30002)")
+    parser.add_argument("--output", type=Path, default=None, help="write results as JSON to this file")
+
+    return parser.parse_args()
+
+
+def percentiles(samples_ns):
+    """Summarizes latency samples (in nanoseconds) as percentiles in milliseconds."""
+    if len(samples_ns) == 0:
+        return dict.fromkeys((f"p{q * 100:g}_ms" for q in QUANTILES))
+
+    values = np.quantile(np.asarray(samples_ns, dtype=np.float64), QUANTILES) / 1e6
+    return {f"p{q * 100:g}_ms": float(value) for q, value in zip(QUANTILES, values)}
+
+
+def peak_rss_kb():
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if platform.system() == "Darwin" else rss
+
+
+def run_standin(args, rate, count, warmup, ready, stop):
+    standin = StandInEnvironment(state_port=args.state_port, action_port=args.action_port,
+                                 frame_size=args.frame_size, binary=args.binary, seed=0)
+    try:
+        stop.wait(warmup)
+        ready.set()
+        standin.run(rate=rate, count=count, stop_event=stop)
+    finally:
+        standin.close()
+
+
+def env_consumer(args, results):
+    sys.path.insert(0, str(REPO_ROOT / "gymnasium"))
+    from PolyominoEnv import PolyominoEnvironment
+
+    env = PolyominoEnvironment(PORT=args.action_port, LISTENER_PORT=args.state_port, HOST="127.0.0.1", LOG_FILE=None)
+    time.sleep(WARMUP_S)
+
+    # a seeded reset exercises the stand-in's handling of non-action events
+    env.reset(seed=0)
+    latencies = np.zeros(args.steps, dtype=np.int64)
+    start = time.perf_counter()
+    for i in range(args.steps):
+        step_start = time.perf_counter_ns()
+        env.step(i % 8)
+        latencies[i] = time.perf_counter_ns() - step_start
+    elapsed = time.perf_counter() - start
+
+    phases = {phase: {key: value for key, value in stats.items() if key != "count"}
+              for phase, stats in env.latency_summary().items() if stats["count"]}
+    env.close()
+
+    results.put({
+        "steps": args.steps,
+        "elapsed_s": elapsed,
+        "steps_per_s": args.steps / elapsed,
+        **percentiles(latencies),
+        "phases_ns": phases,
+        "peak_rss_kb": peak_rss_kb(),
+    })
+
+
+def receive_consumer(args, results, ready):
+    from shared import get_state_subscriber
+    from shared import receive
+
+    connection = get_state_subscriber(host="127.0.0.1", port=args.state_port)
+    ready.set()
+
+    # delivery latency is measured against the stand-in's (same host) wall clock
+    latencies = []
+    states = 0
+    start = None
+    while True:
+        topic, payload = receive(connection)
+        if payload is None:
+            if start is not None:
+                break
+            continue
+
+        now_ns = time.time_ns()
+        if start is None:
+            start = time.perf_counter()
+        end = time.perf_counter()
+
+        latencies.append(now_ns - payload["header"]["time_ns"])
+        if "state" in topic:
+            states += 1
+            if states >= args.messages:
+                break
+
+    elapsed = end - start if start is not None else 0.0
+    results.put({
+        "messages": len(latencies),
+        "states": states,
+        "elapsed_s": elapsed,
+        "messages_per_s": len(latencies) / elapsed if elapsed else None,
+        **percentiles(latencies),
+        "peak_rss_kb": peak_rss_kb(),
+    })
+
+
+def start_script(args, name, savepath):
+    script, _ = SCRIPT_CONSUMERS[name]
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")]))
+    env["MPLBACKEND"] = "Agg"
+
+    command = [sys.executable, str(REPO_ROOT / "scripts" / script), "--host", "127.0.0.1",
+               "--port", str(args.state_port), "--timeout", str(SCRIPT_TIMEOUT_MS)]
+    if name == "image_capture":
+        command += ["--savepath", savepath]
+
+    return subprocess.Popen(command, cwd=savepath, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            text=True)
+
+
+def wait_for_script(process, name, start):
+    _, marker = SCRIPT_CONSUMERS[name]
+
+    processed = sum(1 for line in process.stdout if line.startswith(marker))
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    # the script idles for SCRIPT_TIMEOUT_MS after the last message before exiting
+    elapsed = time.perf_counter() - start - SCRIPT_TIMEOUT_MS / 1000
+    rss = rusage.ru_maxrss // 1024 if platform.system() == "Darwin" else rusage.ru_maxrss
+
+    return {
+        "messages": processed,
+        "elapsed_s": elapsed,
+        "messages_per_s": processed / elapsed if elapsed > 0 else None,
+        "peak_rss_kb": rss,
+    }
+
+
+def benchmark(args, name):
+    ctx = multiprocessing.get_context("spawn")
+    ready, stop = ctx.Event(), ctx.Event()
+
+    if name == "env":
+        standin = ctx.Process(target=run_standin, args=(args, None, None, 0.0, ready, stop))
+        standin.start()
+        ready.wait()
+
+        results = ctx.Queue()
+        consumer = ctx.Process(target=env_consumer, args=(args, results))
+        consumer.start()
+        result = results.get()
+        consumer.join()
+
+    elif name == "receive":
+        results, consumer_ready = ctx.Queue(), ctx.Event()
+        consumer = ctx.Process(target=receive_consumer, args=(args, results, consumer_ready))
+        consumer.start()
+        consumer_ready.wait()
+
+        standin = ctx.Process(target=run_standin, args=(args, args.rate, args.messages, WARMUP_S, ready, stop))
+        standin.start()
+        result = results.get()
+        consumer.join()
+
+    else:
+        with tempfile.TemporaryDirectory() as savepath:
+            process = start_script(args, name, savepath)
+
+            standin = ctx.Process(target=run_standin,
+                                  args=(args, args.rate, args.messages, WARMUP_S, ready, stop))
+            standin.start()
+            ready.wait()
+
+            result = wait_for_script(process, name, time.perf_counter())
+            result["states_sent"] = args.messages
+            result["dropped"] = args.messages - result["messages"]
+
+    stop.set()
+    standin.join()
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    """Main entry point for the script."""
+    args = parse_args()
+
+    report = {
+        "revision": git_revision(),
+        "time": round(time.time() * 1000),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "steps": args.steps,
+            "messages": args.messages,
+            "rate": args.rate,
+            "frame_size": args.frame_size,
+            "binary": args.binary,
+        },
+        "results": {},
+    }
+
+    for name in args.consumers:
+        print(f"Benchmarking {name}...", flush=True)
+        result = benchmark(args, name)
+        report["results"][name] = result
+        print(json.dumps(result, indent=2), flush=True)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#
+# Polyomino Imagery Environment Stand-In
+#
+# Description: A local stand-in for the Godot environment's Godot-AI-Bridge endpoints (action listener and state
+#              publisher) used to benchmark clients without launching Godot
+# Dependencies: PyZMQ (see https://pyzmq.readthedocs.io/en/latest/)
+#
+import argparse
+import json
+import time
+
+import numpy as np
+import zmq
+
+from shared import ACTION_REQ_TOPIC
+from shared import DEFAULT_ACTION_PORT
+from shared import DEFAULT_STATE_PORT
+from shared import SELECTION_RESULT_TOPIC
+from shared import STATE_TOPIC
+
+DEFAULT_FRAME_SIZE = 128
+
+# number of distinct (pre-encoded) screenshots cycled through by the stand-in
+N_FRAME_VARIANTS = 8
+
+# in free-running mode, a selection (action_requested and selection-result messages) precedes every Nth state
+SELECTION_EVERY = 10
+
+
+class StandInEnvironment:
+    """Mimics the Godot environment's action listener (REP) and state publisher (PUB).
+
+    Every action request is acknowledged and answered with an action_requested message, a selection-result message
+    (for selection actions), and a state message whose last_action_seqno matches the request. Other events (e.g.,
+    seed, problems and keyframe) are acknowledged without publishing; a seed event reseeds the random labels and
+    transformations of later states. Messages follow the
+    samples documented in scripts/metrics.py. States can also be published at a fixed rate independently of actions.
+
+    Args:
+        host (str): The address to bind to.
+        state_port (int): The state publisher's port.
+        action_port (int): The action listener's port.
+        frame_size (int): The width and height of the published screenshots.
+        binary (bool): Whether screenshots are published as raw multipart frames rather than JSON arrays.
+        seed (int, optional): Seed for the random screenshots and labels.
+    """
+
+    def __init__(self, host="127.0.0.1", state_port=DEFAULT_STATE_PORT, action_port=DEFAULT_ACTION_PORT,
+                 frame_size=DEFAULT_FRAME_SIZE, binary=False, seed=None):
+        self.binary = binary
+        self.rng = np.random.default_rng(seed)
+
+        self.context = zmq.Context()
+        self.publisher = self.context.socket(zmq.PUB)
+        self.publisher.setsockopt(zmq.SNDHWM, 0)
+        self.publisher.bind(f"tcp://{host}:{state_port}")
+
+        self.listener = self.context.socket(zmq.REP)
+        self.listener.bind(f"tcp://{host}:{action_port}")
+
+        self.seqno = 0
+        self.last_action_seqno = -1
+        self.messages_sent = 0
+
+        # screenshots are generated (and, for JSON, encoded) once so that the stand-in is not the bottleneck
+        self.frames = [self.rng.integers(0, 256, size=frame_size * frame_size, dtype=np.uint8)
+                       for _ in range(N_FRAME_VARIANTS)]
+        self.encoded_frames = [json.dumps(frame.tolist()) for frame in self.frames] if not binary else None
+
+    def _header(self):
+        self.seqno += 1
+        return {"seqno": self.seqno, "time": round(time.time() * 1000), "time_ns": time.time_ns()}
+
+    def _publish(self, topic, data):
+        self.publisher.send_string(f"{topic} {json.dumps({'data': data, 'header': self._header()})}")
+        self.messages_sent += 1
+
+    def publish_state(self):
+        """Publishes a state message shaped like the Godot environment's."""
+        left, right = self.rng.integers(0, N_FRAME_VARIANTS, size=2)
+        shape, id = int(self.rng.integers(1, 6)), int(self.rng.integers(0, 7))
+        same = bool(self.rng.integers(0, 2))
+
+        data = {
+            "last_action_seqno": self.last_action_seqno,
+            "left_viewport": {"id": id, "screenshot": 0, "shape": shape},
+            "mode": 0,
+            "right_viewport": {"id": id if same else (id + 1) % 7, "screenshot": 1, "shape": shape},
+            "same": same,
+            "transformations": {
+                "rotation_active": round(float(self.rng.uniform(0, 360)), 2),
+                "scale": round(float(self.rng.uniform(0.65, 1.4)), 2),
+                "translation": round(float(self.rng.uniform(0, 40)), 2),
+            },
+        }
+        msg = f"{STATE_TOPIC} {json.dumps({'data': data, 'header': self._header()})}"
+
+        if self.binary:
+            self.publisher.send_multipart([msg.encode("utf-8"), self.frames[left], self.frames[right]], copy=False)
+        else:
+            # splice the pre-encoded screenshots in place of their placeholders
+            msg = msg.replace('"screenshot": 0', f'"screenshot": {self.encoded_frames[left]}', 1)
+            msg = msg.replace('"screenshot": 1', f'"screenshot": {self.encoded_frames[right]}', 1)
+            self.publisher.send_string(msg)
+
+        self.messages_sent += 1
+
+    def publish_selection(self, action, seqno):
+        self._publish(ACTION_REQ_TOPIC, {"action": action, "seqno": seqno})
+        self._publish(SELECTION_RESULT_TOPIC, {"result": bool(self.rng.integers(0, 2))})
+
+    def handle_request(self):
+        """Acknowledges one pending request and, for an action, publishes the resulting messages."""
+        request = self.listener.recv_json()
+        self.listener.send_json({"status": "SUCCESS"})
+
+        event = request["data"]["event"]
+        if event["type"] != "action":
+            if event["type"] == "seed":
+                self.rng = np.random.default_rng(int(event["value"]))
+            return
+
+        seqno = request["header"]["seqno"]
+        action = event["value"]
+
+        if action.startswith("select_"):
+            self.publish_selection(action, seqno)
+        else:
+            self._publish(ACTION_REQ_TOPIC, {"action": action, "seqno": seqno})
+
+        self.last_action_seqno = seqno
+        self.publish_state()
+
+    def run(self, rate=None, count=None, duration=None, stop_event=None):
+        """Serves action requests and (when a rate is given) publishes free-running states at a fixed rate.
+
+        Args:
+            rate (float, optional): The number of free-running states published per second (0 publishes as fast as
+                possible, None publishes states only in response to actions).
+            count (int, optional): Stop after this many free-running states.
+            duration (float, optional): Stop after this many seconds.
+            stop_event (threading.Event or multiprocessing.Event, optional): Stop when set.
+        """
+        poller = zmq.Poller()
+        poller.register(self.listener, zmq.POLLIN)
+
+        interval = None if rate is None else 1.0 / rate if rate > 0 else 0.0
+        start = next_publish = time.perf_counter()
+        published = 0
+
+        while not (stop_event and stop_event.is_set()):
+            now = time.perf_counter()
+            if duration is not None and now - start >= duration:
+                break
+            if count is not None and published >= count:
+                break
+
+            if interval is not None and now >= next_publish:
+                if published % SELECTION_EVERY == SELECTION_EVERY - 1:
+                    self.publish_selection("select_same_shape", self.last_action_seqno)
+                self.publish_state()
+                published += 1
+                next_publish += interval
+                continue
+
+            timeout_ms = 100 if interval is None else max(0, round((next_publish - now) * 1000))
+            if poller.poll(timeout_ms):
+                self.handle_request()
+
+    def close(self):
+        self.publisher.close(linger=0)
+        self.listener.close(linger=0)
+        self.context.term()
+
+
+def parse_args():
+    """Parses command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Polyomino Imagery Environment - Godot Stand-In"
+    )
+
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="the address to bind to")
+    parser.add_argument("--state-port", type=int, default=DEFAULT_STATE_PORT, help="the state publisher's port")
+    parser.add_argument("--action-port", type=int, default=DEFAULT_ACTION_PORT, help="the action listener's port")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="free-running states per second; 0 publishes as fast as possible (default: none)")
+    parser.add_argument("--frame-size", type=int, default=DEFAULT_FRAME_SIZE, help="screenshot width and height")
+    parser.add_argument("--binary", action="store_true", help="publish screenshots as raw multipart frames")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+
+    return parser.parse_args()
+
+
+def main():
+    """Main entry point for the script."""
+    args = parse_args()
+
+    standin = StandInEnvironment(host=args.host, state_port=args.state_port, action_port=args.action_port,
+                                 frame_size=args.frame_size, binary=args.binary)
+    try:
+        standin.run(rate=args.rate, duration=args.duration)
+    except KeyboardInterrupt:
+        print("Interrupted by user. Shutting down...", flush=True)
+    finally:
+        standin.close()
+
+
+if __name__ == "__main__":
+    main()
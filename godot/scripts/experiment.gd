@@ -13,6 +13,11 @@ onready var rng = Globals.get_rng()
 onready var pending_actions = []
 onready var last_action_seqno = -1
 
+# identifies the most recently received action requests (by their headers' seqno and time), so that requests
+# resent by a client that did not receive their replies (see shared.ReliableRequester and shared.PipelinedRequester)
+# are not executed twice. a pipelining client may resend every request it has in flight
+onready var recent_request_ids = []
+
 # state variable for tracking object-boundary collisions
 onready var boundary_collisions = {'top': 0,  'bottom': 0, 'left': 0, 'right': 0}
 
@@ -34,9 +39,19 @@ var publish_timer = Timer.new()
 # used to preemptively publish a state change ahead of publish_timer timeout
 onready var unpublished_change = true
 
+# delta screenshot encoding (see Globals.delta_screenshots): the number of state publications,
+# whether the next one must be a keyframe, and the previously published screenshot of each viewport
+onready var frame_seqno = 0
+onready var keyframe_requested = true
+onready var last_screenshots = {}
+
 # check if the shapes are same
 onready var same = false
 
+# problems given by a "problems" event (e.g., from a manifest), which the following next_shape actions
+# present in order rather than random problems
+onready var scheduled_problems = []
+
 onready var answered = true # initially true to force next shape action when the environment is first started with blank screen
 
 ########################
@@ -87,6 +102,14 @@ func _ready():
 	# initialize Godot-AI-Bridge
 	gab.connect(gab_options)
 
+	# binary and delta screenshots fall back to JSON arrays of full screenshots (see publish_state) without a
+	# Godot-AI-Bridge build providing send_multipart, so the fallback is reported once rather than silently
+	if (Globals.binary_screenshots or Globals.delta_screenshots) and not gab.has_method('send_multipart'):
+		push_warning('POLYENV_BINARY_SCREENSHOTS/POLYENV_DELTA_SCREENSHOTS ignored: this Godot-AI-Bridge build '
+					 + 'does not provide send_multipart. Screenshots are published as JSON arrays.')
+	elif Globals.delta_screenshots and not Globals.binary_screenshots:
+		push_warning('POLYENV_DELTA_SCREENSHOTS ignored: delta screenshots require POLYENV_BINARY_SCREENSHOTS=true.')
+
 	# initializes a timer that controls the frequency of environment state broadcasts
 	publish_timer.wait_time = Globals.PUBLISH_NO_CHANGE_TIMEOUT
 	publish_timer.connect("timeout", self, "_on_publish_state")
@@ -176,6 +199,28 @@ func add_action(action, seqno):
 	pending_actions.push_front({'seqno': seqno, 'action': action})
 
 
+# whether an action with seqno is in the agent's pending_actions queue
+func is_pending(seqno):
+	for pending_action in pending_actions:
+		if pending_action['seqno'] == seqno:
+			return true
+	return false
+
+
+# re-adds an action that add_action dropped, in seqno order, so that queued actions still execute in the order they
+# were requested. while the queue is full, the action is not re-added (a later resend of its request may be)
+func requeue_action(action, seqno):
+	if len(pending_actions) > Globals.MAX_PENDING_ACTIONS:
+		push_warning('Max queue depth reached. Not requeuing dropped action with seqno %s.' % seqno)
+		return
+	
+	var index = 0
+	while index < len(pending_actions) and pending_actions[index]['seqno'] > seqno:
+		index += 1
+	
+	pending_actions.insert(index, {'seqno': seqno, 'action': action})
+
+
 func execute(action):
 	if Globals.debug:
 		print('executing action: ', action)
@@ -266,6 +311,10 @@ func update_active_image(new_object):
 	
 	
 func execute_next_shape():
+	if scheduled_problems.size() > 0:
+		execute_scheduled_problem(scheduled_problems.pop_front())
+		return
+		
 	same = rng.randi() % 2 == 0
 
 	# retrieve configuration details needed to create next polyomino object
@@ -288,6 +337,23 @@ func execute_next_shape():
 	answered = false
 	
 
+# presents a problem given as a dictionary with the reference and active objects' [shape, id] configs and
+# the active object's initial rotation, scale and [x, y] position (see gymnasium/PolyominoManifest.py)
+func execute_scheduled_problem(problem):
+	var ref_config = {'shape': int(problem['reference'][0]), 'id': int(problem['reference'][1])}
+	var active_config = {'shape': int(problem['active'][0]), 'id': int(problem['active'][1])}
+	
+	update_ref_image(generate_image(ref_config))
+	update_active_image(generate_image(active_config))
+	
+	active_object.rotation = problem['rotation']
+	active_object.scale = Vector2(problem['scale'], problem['scale'])
+	active_object.global_position = Vector2(problem['position'][0], problem['position'][1])
+	
+	same = ref_config['id'] == active_config['id']
+	answered = false
+	
+
 func execute_translation(action):
 	if active_object == null:
 		return
@@ -333,7 +399,7 @@ func execute_zoom(action):
 		
 	active_object.scale = new_scale
 
-func get_screenshot(viewport):
+func get_screenshot_bytes(viewport):
 	var screenshot = viewport.get_texture().get_data()
 
 	# the viewport data is vertically flipped. this is a workaround.
@@ -342,22 +408,72 @@ func get_screenshot(viewport):
 	# single value per pixel representing luminance (8-bit depth)
 	screenshot.convert(Image.FORMAT_L8)
 	
-	var byte_array = screenshot.get_data()
-	var pixel_data = Array(byte_array)
+	return screenshot.get_data()
+
+func get_screenshot(viewport):
+	var pixel_data = Array(get_screenshot_bytes(viewport))
 
 	return pixel_data
 
-func get_state_msg_for_viewport(viewport, object):
+func get_state_msg_for_viewport(viewport, object, frames=null, keyframe=true):
 	var shape = null if (object == null) else object.shape
 	var id = null if (object == null) else object.id
 	
-	var screenshot = get_screenshot(viewport)
-	
-	return {
+	var msg = {
 		'shape' : shape,
 		'id' : id,
-		'screenshot' : screenshot
+		'screenshot' : null
 	}
+	
+	if frames == null:
+		msg['screenshot'] = get_screenshot(viewport)
+	elif Globals.delta_screenshots:
+		add_delta_screenshot(msg, viewport, frames, keyframe)
+	else:
+		# binary wire format: the screenshot is replaced by the index of its frame
+		msg['screenshot'] = frames.size()
+		frames.append(get_screenshot_bytes(viewport))
+	
+	return msg
+
+# delta wire format: the viewport's "encoding" element is "key" (the frame holds the full screenshot),
+# "rows" (the frame holds the rows in the range given by "rows", which replace those of the previously
+# published screenshot), or "unchanged" (no frame is sent)
+func add_delta_screenshot(msg, viewport, frames, keyframe):
+	var screenshot = get_screenshot_bytes(viewport)
+	var previous = last_screenshots.get(viewport.name)
+	last_screenshots[viewport.name] = screenshot
+	
+	if keyframe or previous == null or previous.size() != screenshot.size():
+		msg['encoding'] = 'key'
+		msg['screenshot'] = frames.size()
+		frames.append(screenshot)
+		return
+		
+	if previous == screenshot:
+		msg['encoding'] = 'unchanged'
+		return
+	
+	# the patch spans from the first to the last row that changed
+	var width = int(viewport.size.x)
+	var n_rows = screenshot.size() / width
+	
+	var start = 0
+	while start < n_rows and is_row_unchanged(previous, screenshot, start, width):
+		start += 1
+		
+	var stop = n_rows
+	while stop > start and is_row_unchanged(previous, screenshot, stop - 1, width):
+		stop -= 1
+	
+	msg['encoding'] = 'rows'
+	msg['rows'] = [start, stop]
+	msg['screenshot'] = frames.size()
+	frames.append(screenshot.subarray(start * width, stop * width - 1))
+
+func is_row_unchanged(previous, screenshot, row, width):
+	var begin = row * width
+	return previous.subarray(begin, begin + width - 1) == screenshot.subarray(begin, begin + width - 1)
 
 func showResult(isCorrect):
 	ref_object.visible = false
@@ -412,9 +528,22 @@ func publish_state():
 		scale = round(active_object.scale.x * 100) / 100.0
 		same = ref_object.id == active_object.id
 	
+	# raw screenshot frames (binary wire format only)
+	var frames = null
+	if Globals.binary_screenshots and gab.has_method('send_multipart'):
+		frames = []
+	
+	# delta wire format: periodic and requested states carry full screenshots (keyframes)
+	var delta = frames != null and Globals.delta_screenshots
+	var keyframe = true
+	if delta:
+		frame_seqno += 1
+		keyframe = keyframe_requested or frame_seqno % Globals.KEYFRAME_INTERVAL == 0
+		keyframe_requested = false
+	
 	var msg = {
-		'left_viewport': get_state_msg_for_viewport(left_viewport, ref_object),
-		'right_viewport': get_state_msg_for_viewport(right_viewport, active_object),
+		'left_viewport': get_state_msg_for_viewport(left_viewport, ref_object, frames, keyframe),
+		'right_viewport': get_state_msg_for_viewport(right_viewport, active_object, frames, keyframe),
 		'last_action_seqno': self.last_action_seqno,
 		'same': same,
 		'mode': Globals.mode,
@@ -425,10 +554,17 @@ func publish_state():
 		}
 	}
 	
+	# clients detect missed states (and so unusable deltas) by gaps in the frame seqno
+	if delta:
+		msg['frame_seqno'] = frame_seqno
+	
 	# Godot-AI-Bridge wraps this state into the "data" element of a JSON-encoded message. messages 
 	# are also given a "header" element containing a unique sequence numbers (seqno) and timestamp 
-	# in milliseconds
-	gab.send(state_topic, msg)
+	# in milliseconds. in the binary wire format, the screenshots follow as additional message frames
+	if frames == null:
+		gab.send(state_topic, msg)
+	else:
+		gab.send_multipart(state_topic, msg, frames)
 	
 	# TODO: Does this variable need to be synchronized???
 	unpublished_change = false
@@ -457,9 +593,42 @@ func _on_event_requested(event_details):
 		var seqno = header['seqno']
 		var action = event['value']
 		
+		var request_id = '%s:%s' % [seqno, header['time']]
+		if request_id in recent_request_ids:
+			# a duplicate of a recent request: the state is republished instead. if the action was dropped from a
+			# full queue (i.e., it is neither pending nor executed), it is also queued again
+			if seqno > last_action_seqno and not is_pending(seqno):
+				requeue_action(action, seqno)
+			unpublished_change = true
+			return
+		recent_request_ids.append(request_id)
+		if len(recent_request_ids) > 2 * Globals.MAX_PENDING_ACTIONS:
+			recent_request_ids.pop_front()
+		
 		gab.send(action_topic, {"action": action, "seqno": seqno})
 		
 		add_action(action, seqno)
+		
+	elif event['type'] == 'keyframe':
+		# a client missed a delta-encoded state, so the next state is published with full screenshots
+		keyframe_requested = true
+		unpublished_change = true
+		
+	elif event['type'] == 'seed':
+		# reproducible problem sequences: later random problems are drawn from the reseeded generator
+		rng.seed = int(event['value'])
+		abandon_problem()
+		
+	elif event['type'] == 'problems':
+		# replaces any problems that have not yet been presented
+		scheduled_problems = event['value']
+		abandon_problem()
+
+
+# episode configuration events (seed and problems) are sent before an episode's first next_shape action,
+# which must present a new problem even if the current one was never answered
+func abandon_problem():
+	answered = true
 
 
 # signal handler for boundary collisions
@@ -15,6 +15,9 @@ const SCALE_DELTA = Vector2(0.1, 0.1) # change in scale - used for zooming opera
 
 const MAX_PENDING_ACTIONS = 5
 
+# with delta screenshots, every KEYFRAME_INTERVAL-th state publication carries full frames
+const KEYFRAME_INTERVAL = 30
+
 # for scaling operations
 const MIN_SCALE = Vector2(0.65, 0.65)
 const MAX_SCALE = Vector2(1.4, 1.4)
@@ -48,6 +51,8 @@ func _ready():
 	
 	_set_mode_from_env()
 	_set_debug_from_env()
+	_set_binary_screenshots_from_env()
+	_set_delta_screenshots_from_env()
 	
 	if debug:			
 		print("Environment running in \"%s\" mode." % [get_mode_name()])
@@ -623,6 +628,31 @@ func _set_debug_from_env():
 		debug = true
 	else:
 		debug = false
+
+# when enabled, screenshots are published as raw 8-bit frames in a multipart message
+# rather than as JSON arrays (requires a Godot-AI-Bridge build providing send_multipart)
+var binary_screenshots = false
+
+func _set_binary_screenshots_from_env():
+	var value = OS.get_environment("POLYENV_BINARY_SCREENSHOTS").to_lower()
+	
+	if value == "true":
+		binary_screenshots = true
+	else:
+		binary_screenshots = false
+
+# when enabled (along with binary screenshots), screenshots that did not change since the previous
+# state publication are omitted and changed screenshots are sent as patches of their changed rows,
+# except for periodic (and client-requested) keyframes
+var delta_screenshots = false
+
+func _set_delta_screenshots_from_env():
+	var value = OS.get_environment("POLYENV_DELTA_SCREENSHOTS").to_lower()
+	
+	if value == "true":
+		delta_screenshots = true
+	else:
+		delta_screenshots = false
 				
 # maps ui events to executable actions
 var ui_action_map := {
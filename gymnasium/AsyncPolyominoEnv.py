@@ -0,0 +1,230 @@
+import asyncio
+import json
+import time
+
+import zmq
+import zmq.asyncio
+
+from shared import STATE_TOPIC
+from shared import has_topic
+
+from PolyominoEnv import MAX_PENDING_ACTIONS, Actions, PolyominoEnvironment
+
+
+class AsyncPolyominoEnvironment(PolyominoEnvironment):
+    """A PolyominoEnvironment whose reset and step are coroutines.
+
+    Requests, acknowledgements, and state updates are awaited on zmq.asyncio sockets rather than blocking, so many
+    environments (and consumers built on shared.receive_async) can run concurrently in a single event loop and
+    thread, e.g.:
+
+        envs = [AsyncPolyominoEnvironment(PORT=port, LISTENER_PORT=port - 1) for port in ports]
+        results = await asyncio.gather(*(env.step(action) for env in envs))
+
+    Rewards, observations, logging, and timings are the same as PolyominoEnvironment's, and the constructor accepts
+    the same arguments. By default, all instances share one zmq.asyncio context (and I/O thread). Because reset and
+    step must be awaited, instances cannot be used with Gymnasium's (synchronous) wrappers. step_sequence,
+    step_repeat and step_wait are coroutines too, and step_async starts a step as a task of the running event loop.
+    Only CHANNEL='req' is supported, so steps started by step_async run one at a time, in order.
+    """
+
+    def __init__(self, CONTEXT = None, **kwargs):
+        if kwargs.get('CHANNEL', 'req') != 'req':
+            raise ValueError("AsyncPolyominoEnvironment supports only CHANNEL='req'")
+
+        if kwargs.get('BACKEND', 'godot') == 'godot' and CONTEXT is None:
+            CONTEXT = zmq.asyncio.Context.instance()
+            shared_context = True
+        else:
+            shared_context = False
+
+        super().__init__(CONTEXT=CONTEXT, **kwargs)
+
+        # the shared instance context is not terminated when a single environment is closed
+        if shared_context:
+            self.owns_context = False
+
+    async def reset(self, seed=None, options=None):
+        await self._cancel_steps_async()
+        for data in self._get_episode_events(seed):
+            if self.simulator is not None:
+                self.simulator.handle_event(data['event'])
+            else:
+                await self._send_event(data)
+                await self._recv_reply_async()
+
+        await self._send_async(self._create_action_data(Actions.NEXT_SHAPE.value))
+        return self._complete_reset()
+
+    async def step(self, action):
+        self._check_no_steps_in_flight()
+        return await self._step_now_async(action)
+
+    def step_async(self, action):
+        """Starts a step as a task of the running event loop, without waiting for its transition, which step_wait
+        returns (see PolyominoEnvironment.step_async). Each step's task waits for the previous step's to finish."""
+        if len(self._pending_steps) >= MAX_PENDING_ACTIONS:
+            raise RuntimeError(f"At most {MAX_PENDING_ACTIONS} steps can be in flight (see step_wait)")
+
+        previous = self._pending_steps[-1] if self._pending_steps else None
+        self._pending_steps.append(asyncio.get_running_loop().create_task(self._step_after(previous, action)))
+
+    async def step_wait(self):
+        """Waits for the oldest step started by step_async and returns its transition (see step)."""
+        if not self._pending_steps:
+            raise RuntimeError("No step is in flight (see step_async)")
+
+        return await self._pending_steps.popleft()
+
+    async def _step_after(self, previous, action):
+        if previous is not None:
+            # the previous step's outcome (or exception) is left to its own step_wait
+            await asyncio.wait([previous])
+        return await self._step_now_async(action)
+
+    async def _step_now_async(self, action):
+        await self._send_async(self._create_action_data(action))
+        return self._complete_step(action)
+
+    async def _cancel_steps_async(self):
+        """Discards the steps in flight once they have finished (see PolyominoEnvironment._cancel_steps)."""
+        if self._pending_steps:
+            await asyncio.gather(*self._pending_steps, return_exceptions=True)
+        self._pending_steps.clear()
+
+    async def step_sequence(self, actions):
+        """Executes a sequence of actions (a macro-action) as a single step (see PolyominoEnvironment.step_sequence).
+
+        Each action's reply is awaited before the next is sent (as a REQ socket requires), but the states that
+        reflect the actions are not, except when MAX_PENDING_ACTIONS actions are queued in the Godot environment or
+        after a next_shape action. Only the state that reflects the last action is waited on otherwise.
+        """
+        actions = [int(action) for action in actions]
+        if not actions:
+            raise ValueError("Expected at least one action")
+        self._check_no_steps_in_flight()
+
+        if self.simulator is not None:
+            return super().step_sequence(actions)
+
+        self._begin_step()
+        observed_seqno = self.seqno
+
+        reward = 0
+        executed = 0
+        for action in actions:
+            # actions beyond the Godot environment's queue depth would be dropped, so a full queue is first waited on
+            if self.seqno - observed_seqno >= MAX_PENDING_ACTIONS:
+                observed_seqno = self.seqno - MAX_PENDING_ACTIONS + 1
+                await self._wait_for_update_async(observed_seqno)
+
+            await self._submit_async(self._create_action_data(action), pipelined=True)
+            await self._recv_reply_async()
+            reward += self._apply_action(action)
+            executed += 1
+
+            if self.MAX_PROBLEMS <= self.current_problem:
+                break
+            if action == Actions.NEXT_SHAPE.value and executed < len(actions):
+                await self._wait_for_update_async(self.seqno)
+                observed_seqno = self.seqno
+
+        await self._wait_for_update_async(self.seqno)
+        return self._complete_observation(actions[executed - 1], reward, {'actions': executed})
+
+    async def step_repeat(self, action, count):
+        """Executes an action count times as a single step (see step_sequence)."""
+        return await self.step_sequence([action] * count)
+
+    async def _send_async(self, data):
+        # the in-process simulator never blocks
+        if self.simulator is not None:
+            return self._send(data)
+
+        await self._submit_async(data)
+        await self._recv_reply_async()
+
+        return await self._wait_for_update_async(self.seqno)
+
+    async def _submit_async(self, data, pipelined=False):
+        # pipelined requests are timed as parts of the step that submits them (see step_sequence)
+        if not pipelined:
+            self._begin_step()
+
+        self.seqno += 1
+        start_ns = time.perf_counter_ns()
+
+        request = self._create_request(data)
+        await self.requester.send(json.dumps(request))
+
+        self.timings['send'] = self.timings.get('send', 0) + time.perf_counter_ns() - start_ns
+
+    async def _recv_reply_async(self):
+        start_ns = time.perf_counter_ns()
+        try:
+            # see shared.ReliableRequester.recv
+            for attempt in range(self.RETRIES + 1):
+                if await self.socket.poll(self.requester.timeout(), zmq.POLLIN):
+                    reply = await self.socket.recv_json(flags=zmq.NOBLOCK)
+                    self.requester.received()
+                    return reply
+                if attempt < self.RETRIES:
+                    await self.requester.resend()
+
+            self.requester.abandon()
+            raise RuntimeError(f"Timeout waiting for reply on REQ socket (after {self.RETRIES} retries)")
+        finally:
+            self.timings['ack'] = self.timings.get('ack', 0) + time.perf_counter_ns() - start_ns
+
+    async def _recv_async(self, timeout_ms):
+        frames = await asyncio.wait_for(self.listener.recv_multipart(copy=False), timeout_ms / 1000)
+
+        # see PolyominoEnvironment._recv_nowait
+        while self.CONFLATE:
+            try:
+                newer_frames = await self.listener.recv_multipart(flags=zmq.NOBLOCK, copy=False)
+            except zmq.Again:
+                break
+            if has_topic(newer_frames, STATE_TOPIC):
+                self._discard(frames)
+                frames = newer_frames
+
+        return self._decode(frames)
+
+    async def _wait_for_update_async(self, seqNo, timeout_ms=None):
+        start_ns = time.perf_counter_ns()
+        start_decode_ns = self.timings.get('decode', 0)
+        keyframe_requested = False
+        try:
+            end_time = time.perf_counter() + ((self.TIMEOUT if timeout_ms is None else timeout_ms) / 1000)
+
+            # see PolyominoEnvironment._wait_for_update
+            nudges = 0
+            nudge_time = time.perf_counter() + self._wait_timeout() / 1000
+            while (remaining := end_time - time.perf_counter()) > 0:
+                if nudges < self.RETRIES:
+                    remaining = min(remaining, max(0.001, nudge_time - time.perf_counter()))
+                try:
+                    topic, payload = await self._recv_async(timeout_ms=remaining * 1000)
+                except (asyncio.TimeoutError, zmq.Again):
+                    if nudges < self.RETRIES and time.perf_counter() >= nudge_time:
+                        await self.requester.send(self.requester.last_request)
+                        await self._recv_reply_async()
+                        nudges += 1
+                        nudge_time = time.perf_counter() + self._wait_timeout() / 1000
+                    continue
+                if self._is_update(topic, payload, seqNo):
+                    # see PolyominoEnvironment._wait_for_update
+                    if self.needs_keyframe:
+                        if not keyframe_requested:
+                            await self._request_keyframe()
+                            await self._recv_reply_async()
+                            keyframe_requested = True
+                        continue
+
+                    self._update_latest_state(payload)
+                    return payload
+            raise TimeoutError(f"Timeout waiting for environment state update with seqNo {seqNo}")
+        finally:
+            decode_ns = self.timings.get('decode', 0) - start_decode_ns
+            self.timings['wait'] = self.timings.get('wait', 0) + time.perf_counter_ns() - start_ns - decode_ns
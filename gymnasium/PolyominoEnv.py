@@ -1,11 +1,31 @@
 import gymnasium as gym
 import zmq, json, time
+from collections import deque
 from enum import Enum
 import logging
+import os
 import numpy as np
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', filename='polyomino_env.log', filemode='a')
-logging.info("============== Polyomino Environment initialized ================")
+from shared import DEFAULT_REQUEST_RETRIES
+from shared import PipelinedRequester
+from shared import ReliableRequester
+from shared import STATE_TOPIC
+from shared import VIEWPORTS
+from shared import has_topic
+from shared import peek_last_action_seqno
+from shared.codec import MessageCodec
+from shared.delta import FrameReconstructor
+from shared.delta import KEYFRAME_EVENT
+from shared.shm import SharedFrameReader
+from shared.latency import AdaptiveTimeout
+from shared.latency import LatencyTracker
+from shared.latency import serve_metrics
+
+from PolyominoManifest import Manifest
+from PolyominoRenderTable import RenderTable
+from PolyominoSimulator import PolyominoSimulator
+from PolyominoTrajectoryLog import TrajectoryLogger
+
 
 class Actions(Enum):
     UP = 0
@@ -20,8 +40,84 @@ class Actions(Enum):
     SELECT_SAME = 9
     SELECT_DIFFERENT = 10
 
+# supported backends: 'godot' (a running Godot environment reached over ZMQ) or 'numpy' (an in-process simulator)
+BACKENDS = ('godot', 'numpy')
+
+# supported action channels: 'req' (a REQ socket, one request in flight) or 'dealer' (a DEALER socket, several requests
+# in flight; see step_async)
+CHANNELS = ('req', 'dealer')
+
+# timed phases of a step: REQ send, wait for the REP ack, wait for the matching state (excluding decoding), message
+# decoding (except JSON screenshots), screenshot parsing and conversion to arrays (observations are converted lazily;
+# conversions after their step has completed are recorded as samples of their own), in-process simulation (numpy
+# backend), and the step as a whole
+STEP_PHASES = ('send', 'ack', 'wait', 'decode', 'convert', 'simulate', 'total')
+
+# the Godot environment queues at most this many unexecuted actions and drops the oldest when more arrive (see
+# MAX_PENDING_ACTIONS in godot/scripts/globals.gd)
+MAX_PENDING_ACTIONS = 5
+
+class LazyObservation(dict):
+    """An observation dict whose screenshots are parsed and converted to arrays when they are first accessed.
+
+    Until then, each element holds a function that performs the conversion, so consumers that read only one
+    viewport (or only the scalars in info) never pay for parsing (see shared.codec.EncodedScreenshot) or converting
+    the other. Element access, iteration over
+    values or items, copying, comparison, and pickling all return the converted arrays.
+    """
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if callable(value):
+            value = value()
+            super().__setitem__(key, value)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __iter__(self):
+        # overriding __iter__ makes dict(observation) and **observation copy elements through __getitem__
+        return super().__iter__()
+
+    def _convert_all(self):
+        for key in self.keys():
+            self[key]
+
+    def values(self):
+        self._convert_all()
+        return super().values()
+
+    def items(self):
+        self._convert_all()
+        return super().items()
+
+    def copy(self):
+        self._convert_all()
+        return dict(super().items())
+
+    def __eq__(self, other):
+        self._convert_all()
+        return super().__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._convert_all()
+        return super().__repr__()
+
+    def __reduce__(self):
+        return dict, (self.copy(),)
+
 class PolyominoEnvironment(gym.Env):
-    def __init__(self, PORT = 10002, LISTENER_PORT = 10001, HOST = 'localhost', TIMEOUT = 5000, MSG_TIMEOUT_FILTER = '', MAX_TIMESTEPS = 1000):
+    def __init__(self, PORT = 10002, LISTENER_PORT = 10001, HOST = 'localhost', TIMEOUT = 5000, MSG_TIMEOUT_FILTER = STATE_TOPIC, MAX_TIMESTEPS = 1000, BACKEND = 'godot', CONTEXT = None, CONFLATE = False, LOG_FILE = None, LOG_LEVEL = logging.INFO, LOG_STEP_LEVEL = logging.INFO, LOG_SAMPLE_RATE = 1.0, OBSERVATION_DIR = None, TIMINGS = False, METRICS_PORT = None, RENDER_TABLE = None, MANIFEST = None, RETRIES = DEFAULT_REQUEST_RETRIES, ADAPTIVE_TIMEOUTS = True, CHANNEL = 'req'):
+        if BACKEND not in BACKENDS:
+            raise ValueError(f"Unsupported backend: {BACKEND} (expected one of {BACKENDS})")
+        if RENDER_TABLE is not None and BACKEND != 'numpy':
+            raise ValueError("RENDER_TABLE requires the numpy backend")
+        if CHANNEL not in CHANNELS:
+            raise ValueError(f"Unsupported channel: {CHANNEL} (expected one of {CHANNELS})")
+
         self.ACTION_MAP = {
               'W': 'up',
               'S': 'down',
@@ -47,6 +143,27 @@ class PolyominoEnvironment(gym.Env):
         self.TIMEOUT = TIMEOUT
         self.MSG_TOPIC_FILTER = MSG_TIMEOUT_FILTER
 
+        # requests whose replies (or states) do not arrive are resent up to RETRIES times, so each attempt waits at
+        # most a share of TIMEOUT. with ADAPTIVE_TIMEOUTS, they are resent after a few typical round-trips (see
+        # shared.latency.AdaptiveTimeout)
+        self.RETRIES = RETRIES
+        self.ADAPTIVE_TIMEOUTS = ADAPTIVE_TIMEOUTS
+        self.RETRY_TIMEOUT = max(1, TIMEOUT // (RETRIES + 1))
+        self.BACKEND = BACKEND
+        self.CHANNEL = CHANNEL
+
+        # the numpy backend's observations are served from this render table directory (see PolyominoRenderTable)
+        # rather than rendered, when given
+        self.RENDER_TABLE = RENDER_TABLE
+
+        # problems are presented in the order given by this manifest (a PolyominoManifest.Manifest or the path of a
+        # saved one) rather than drawn at random, one episode (MAX_PROBLEMS problems) per reset
+        self.manifest = Manifest.load(MANIFEST) if isinstance(MANIFEST, (str, os.PathLike)) else MANIFEST
+        self._manifest_episodes = None
+
+        # when True, only the most recent queued state is decoded; older (stale) states are dropped undecoded
+        self.CONFLATE = CONFLATE
+
         self.MAX_TIMESTEPS = MAX_TIMESTEPS
         self.current_timestep = 0
 
@@ -57,8 +174,34 @@ class PolyominoEnvironment(gym.Env):
 
         self.seqno = 1
 
+        # the seqno of the last action known to be executed while a sequence of actions is pipelined (see step_sequence)
+        self._observed_seqno = self.seqno
+
+        # steps submitted by step_async that step_wait has yet to complete (oldest first): (action, seqno, ticket)
+        # tuples, where ticket identifies the request's reply (see shared.ReliableRequester.request). with the numpy
+        # backend, the completed transitions are held instead
+        self._pending_steps = deque()
+
         self.latest_env_state = None
 
+        # rebuilds full screenshots when the Godot environment publishes delta-encoded states
+        self.reconstructor = FrameReconstructor()
+
+        # maps screenshots relayed through shared memory (see scripts/shm_relay.py) to views of the relay's ring buffer
+        self.frame_reader = SharedFrameReader()
+
+        # decodes messages, parsing JSON screenshots directly into arrays and applying the reconstructor and frame
+        # reader (see shared.codec)
+        self.codec = MessageCodec(reconstructor=self.reconstructor, frame_reader=self.frame_reader)
+
+        # whether the latest state's screenshots were lost (to a gap in delta-encoded states, here or in a relay) and
+        # must be restored by a keyframe
+        self.needs_keyframe = False
+
+        # the reference (left) viewport's screenshot only changes with the reference object, so the converted array
+        # is reused for as long as the object is shown: a (key, array) tuple, where key is the object's (shape, id)
+        self._left_cache = (None, None)
+
         self.answered = False
         
         # 128 x 128 pixel images with 1 channel (grayscale)
@@ -68,15 +211,52 @@ class PolyominoEnvironment(gym.Env):
         })
 
 
-        self.context = zmq.Context()
-        self._connect()
-        self._listener_connect()
+        self.simulator = None
+        self.context = None
+
+        # per-step scalars are written to LOG_FILE by a background thread. trajectory logging is disabled by default
+        # (LOG_FILE=None), so that environments do not write to the working directory unasked. steps are logged at
+        # LOG_STEP_LEVEL, and are dropped when it is below the LOG_LEVEL threshold
+        self.trajectory_log = None
+        if LOG_FILE is not None:
+            self.trajectory_log = TrajectoryLogger(LOG_FILE, level=LOG_LEVEL, step_level=LOG_STEP_LEVEL,
+                                                   sample_rate=LOG_SAMPLE_RATE, observation_dir=OBSERVATION_DIR)
+            self.trajectory_log.log("============== Polyomino Environment initialized ================")
+
+        # per-phase step latencies (see STEP_PHASES); TIMINGS=True also returns each step's timings in its info dict
+        self.TIMINGS = TIMINGS
+        self.timings = {}
+        self._step_start_ns = None
+        self.latency = LatencyTracker(STEP_PHASES, labels={'env': f'{self.HOST}:{self.PORT}'})
+        self._wait_timeout = AdaptiveTimeout(self.latency, 'wait', max_ms=self.RETRY_TIMEOUT) if ADAPTIVE_TIMEOUTS \
+            else (lambda: self.RETRY_TIMEOUT)
+        self.metrics_server = None
+        if METRICS_PORT is not None:
+            self.metrics_server = serve_metrics(self.latency, METRICS_PORT)
+
+        # a context shared with other environments (e.g., by PolyominoVectorEnv) is not terminated on close
+        self.owns_context = CONTEXT is None
+
+        if self.BACKEND == 'numpy':
+            self.simulator = PolyominoSimulator()
+            if RENDER_TABLE is not None:
+                self.simulator.renderer = RenderTable(RENDER_TABLE).render
+        else:
+            self.context = zmq.Context() if CONTEXT is None else CONTEXT
+            self._connect()
+            self._listener_connect()
 
 
     def _connect(self):
-        self.socket = self.context.socket(zmq.REQ)
-        self.socket.connect(f"tcp://{self.HOST}:{self.PORT}")
-        self.socket.setsockopt(zmq.RCVTIMEO, self.TIMEOUT)
+        # the socket is replaced when a reply is lost (see shared.ReliableRequester)
+        requester_class = PipelinedRequester if self.CHANNEL == 'dealer' else ReliableRequester
+        self.requester = requester_class(f"tcp://{self.HOST}:{self.PORT}", context=self.context,
+                                           timeout=self.RETRY_TIMEOUT, retries=self.RETRIES,
+                                           adaptive=self.ADAPTIVE_TIMEOUTS)
+
+    @property
+    def socket(self):
+        return self.requester.socket
 
     def _listener_connect(self):
         self.listener = self.context.socket(zmq.SUB)
@@ -84,6 +264,9 @@ class PolyominoEnvironment(gym.Env):
         self.listener.setsockopt(zmq.RCVTIMEO, self.TIMEOUT)
         self.listener.connect(f"tcp://{self.HOST}:{str(self.LISTENER_PORT)}")
 
+        self.poller = zmq.Poller()
+        self.poller.register(self.listener, zmq.POLLIN)
+
     def _create_request(self, data):
         header = {
             'seqno': self.seqno,
@@ -92,47 +275,257 @@ class PolyominoEnvironment(gym.Env):
 
         return {'header': header, 'data': data}
     
+    def _create_action_data(self, action):
+        return {
+            'event': {
+                'type': 'action',
+                'value': self.ACTION_DESC[action]
+            }
+        }
+
     def _send(self, data):
+        if self.simulator is not None:
+            self.seqno += 1
+            self.timings = {}
+            self._step_start_ns = time.perf_counter_ns()
+            payload = self._simulate(data)
+            self.timings['simulate'] = time.perf_counter_ns() - self._step_start_ns
+            return payload
+
+        self._submit(data)
+        self._recv_reply()
+
+        return self._wait_for_update(self.seqno) 
+
+    def _begin_step(self):
+        self.timings = {}
+        self._step_start_ns = time.perf_counter_ns()
+
+    def _submit(self, data, pipelined=False):
+        # pipelined requests are timed as parts of the step that submits them (see step_sequence)
+        if not pipelined:
+            self._begin_step()
+
         self.seqno += 1
+        start_ns = time.perf_counter_ns()
+
         request = self._create_request(data)
         encoded_req = json.dumps(request)
-        self.socket.send_string(encoded_req)
+        self.requester.send(encoded_req)
+
+        self.timings['send'] = self.timings.get('send', 0) + time.perf_counter_ns() - start_ns
+
+    def _recv_reply(self, flags=0):
+        start_ns = time.perf_counter_ns()
         try:
-            reply = self.socket.recv_json(flags=0)
+            if flags & zmq.NOBLOCK:
+                return self.requester.recv_nowait()
+            return self.requester.recv()
         except zmq.Again:
-            raise RuntimeError("Timeout waiting for reply on REQ socket")
+            raise RuntimeError(f"Timeout waiting for reply on REQ socket (after {self.RETRIES} retries)")
+        finally:
+            self.timings['ack'] = self.timings.get('ack', 0) + time.perf_counter_ns() - start_ns
 
-        return self._wait_for_update(self.seqno) 
+    def _simulate(self, data):
+        self.simulator.execute(data['event']['value'], self.seqno)
+        return self._get_simulated_state()
+
+    def _get_simulated_state(self):
+        header = {
+            'seqno': self.seqno,
+            'time': round(time.time() * 1000) # milliseconds
+        }
+        payload = {'header': header, 'data': self.simulator.get_state()}
+        self._update_latest_state(payload)
+
+        return payload
 
-    def _recv(self):
-        poller = zmq.Poller()
-        poller.register(self.listener, zmq.POLLIN)
-        socks = dict(poller.poll(self.TIMEOUT))
+    def _update_latest_state(self, payload):
+        self.latest_env_state = {
+            'state': [payload['data']['left_viewport']['screenshot'], payload['data']['right_viewport']['screenshot']],
+            'reference': (payload['data']['left_viewport']['shape'], payload['data']['left_viewport']['id']),
+            'isSame': payload['data']['same'],
+            'transformations': payload['data']['transformations']
+        }
+
+    def _recv(self, timeout_ms=None):
+        socks = dict(self.poller.poll(self.TIMEOUT if timeout_ms is None else timeout_ms))
         if self.listener in socks and socks[self.listener] == zmq.POLLIN:
-            msg = self.listener.recv_string()
-            ndx = msg.find('{')
-            topic, encoded_payload = msg[0:ndx - 1], msg[ndx:]
-            payload = json.loads(encoded_payload)
-            return topic, payload
+            return self._recv_nowait()
         raise zmq.Again("No message received within timeout")
 
-    def _wait_for_update(self, seqNo, timeout_ms=5000):
-        end_time = time.time() + (timeout_ms / 1000)
-        while time.time() < end_time:
+    def _recv_nowait(self):
+        # screenshots published as binary frames are decoded without copying (see shared.codec.MessageCodec)
+        frames = self.listener.recv_multipart(flags=zmq.NOBLOCK, copy=False)
+
+        # latest state wins: any states queued behind this one supersede it, so only the newest is decoded. (the
+        # ZMQ_CONFLATE socket option cannot be used for this because it does not support multipart messages)
+        while self.CONFLATE:
             try:
-                topic, payload = self._recv()
-                # print(f"Received topic: {topic}, payload: {payload}")
+                newer_frames = self.listener.recv_multipart(flags=zmq.NOBLOCK, copy=False)
             except zmq.Again:
-                continue
-            if "/state" in topic:
-                lastActionSeqNo = payload["data"]["last_action_seqno"]
-                if lastActionSeqNo >= seqNo:
-                    self.latest_env_state = {
-                        'state': [payload['data']['left_viewport']['screenshot'], payload['data']['right_viewport']['screenshot']],
-                        'isSame': payload['data']['same']
-                    }
+                break
+            if has_topic(newer_frames, STATE_TOPIC):
+                self._discard(frames)
+                frames = newer_frames
+
+        return self._decode(frames)
+
+    def _decode(self, frames):
+        start_ns = time.perf_counter_ns()
+        # JSON screenshots are parsed when the observation is first accessed (see LazyObservation)
+        topic, payload = self.codec.decode_payload(frames, lazy=True)
+        if "/state" in topic:
+            data = payload['data']
+            self.needs_keyframe = any(data[viewport]['screenshot'] is None for viewport in VIEWPORTS)
+        self.timings['decode'] = self.timings.get('decode', 0) + time.perf_counter_ns() - start_ns
+
+        return topic, payload
+
+    def _discard(self, frames):
+        # delta-encoded screenshots build on every previous state, so skipped states must still be applied. (their
+        # screenshots are small patches that are sent as binary frames, so this is cheap)
+        if self.reconstructor.tracking:
+            self._decode(frames)
+
+    def _send_event(self, data):
+        """Sends a request that is not an action (and so is not reflected by a state's last_action_seqno). The
+        request's reply must be received before the next request is sent."""
+        self._free_requester()
+        return self.requester.send(json.dumps(self._create_request(data)))
+
+    def _request_keyframe(self):
+        """Requests that the Godot environment publish its next state with full screenshots (see shared.delta)."""
+        return self._send_event(KEYFRAME_EVENT)
+
+    def _wait_for_update(self, seqNo, timeout_ms=None):
+        start_ns = time.perf_counter_ns()
+        start_decode_ns = self.timings.get('decode', 0)
+        keyframe_requested = False
+        try:
+            end_time = time.perf_counter() + ((self.TIMEOUT if timeout_ms is None else timeout_ms) / 1000)
+
+            # a state that is late by more than the adaptive timeout is nudged for (see _nudge), up to RETRIES times
+            nudges = 0
+            nudge_time = time.perf_counter() + self._wait_timeout() / 1000
+            while (remaining := end_time - time.perf_counter()) > 0:
+                if nudges < self.RETRIES:
+                    remaining = min(remaining, max(0, nudge_time - time.perf_counter()))
+                try:
+                    topic, payload = self._recv(timeout_ms=max(1, round(remaining * 1000)))
+                    # print(f"Received topic: {topic}, payload: {payload}")
+                except zmq.Again:
+                    if nudges < self.RETRIES and time.perf_counter() >= nudge_time:
+                        self._nudge()
+                        nudges += 1
+                        nudge_time = time.perf_counter() + self._wait_timeout() / 1000
+                    continue
+                if self._is_update(topic, payload, seqNo):
+                    # screenshots lost to a gap in delta-encoded states are restored by the next keyframe
+                    if self.needs_keyframe:
+                        if not keyframe_requested:
+                            self._request_keyframe()
+                            self._recv_reply()
+                            keyframe_requested = True
+                        continue
+
+                    self._update_latest_state(payload)
                     return payload
-        raise TimeoutError(f"Timeout waiting for environment state update with seqNo {seqNo}")
+            raise TimeoutError(f"Timeout waiting for environment state update with seqNo {seqNo}")
+        finally:
+            decode_ns = self.timings.get('decode', 0) - start_decode_ns
+            self.timings['wait'] = self.timings.get('wait', 0) + time.perf_counter_ns() - start_ns - decode_ns
+
+    def _nudge(self):
+        """Resends the last request when the state that reflects it is late (e.g., because the action was dropped
+        from a full queue, or the state was lost). The Godot environment does not execute the duplicate of an action
+        it already received. It republishes its state instead, and queues the action again if it was dropped."""
+        self._free_requester()
+        self.requester.send(self.requester.last_request)
+        self._recv_reply()
+
+    def _skip_to_update(self, seqNo, timeout_ms=5000):
+        """Waits for a state that reflects the action with seqNo, discarding earlier states without decoding them.
+
+        Returns:
+            list: The (undecoded) frames of the state message.
+        """
+        start_ns = time.perf_counter_ns()
+        try:
+            end_time = time.perf_counter() + (timeout_ms / 1000)
+            while (remaining := end_time - time.perf_counter()) > 0:
+                if not self.poller.poll(max(1, round(remaining * 1000))):
+                    continue
+                frames = self.listener.recv_multipart(flags=zmq.NOBLOCK, copy=False)
+                if not has_topic(frames, STATE_TOPIC):
+                    continue
+                if (peek_last_action_seqno(frames) or 0) >= seqNo:
+                    return frames
+                self._discard(frames)
+            raise TimeoutError(f"Timeout waiting for environment state update with seqNo {seqNo}")
+        finally:
+            self.timings['wait'] = self.timings.get('wait', 0) + time.perf_counter_ns() - start_ns
+
+    def _is_update(self, topic, payload, seqNo):
+        return "/state" in topic and payload["data"]["last_action_seqno"] >= seqNo
+
+    def _get_observation(self):
+        left, right = self.latest_env_state["state"]
+
+        # after a selection, the viewports show the result rather than the reference object
+        reference = self.latest_env_state["reference"]
+        left_key = None if self.answered or None in reference else reference
+
+        return LazyObservation(left=lambda: self._convert_left(left, left_key), right=lambda: self._convert(right))
+
+    def _convert(self, screenshot):
+        start_ns = time.perf_counter_ns()
+
+        # screenshots are either unparsed JSON arrays (shared.codec.EncodedScreenshot, which are parsed here) or uint8
+        # arrays (binary wire format), which are reshaped in place as views of the received frames (or, for
+        # screenshots relayed through shared memory, as SharedFrame views of the ring buffer)
+        array = np.asanyarray(screenshot, dtype=np.uint8).reshape(128, 128, 1)
+
+        elapsed_ns = time.perf_counter_ns() - start_ns
+        if self._step_start_ns is not None:
+            self.timings['convert'] = self.timings.get('convert', 0) + elapsed_ns
+        else:
+            # an observation first accessed after its step completed is not counted against a later step
+            self.latency.record('convert', elapsed_ns)
+        return array
+
+    def _convert_left(self, screenshot, key):
+        cached_key, cached_array = self._left_cache
+        if key is not None and key == cached_key:
+            # observations get copies, so that callers may modify them without changing the cached array
+            return cached_array.copy()
+
+        array = self._convert(screenshot)
+        if key is not None:
+            # the cached copy is independent of the received frame (or of a shared memory frame's ring buffer slot,
+            # which may be reused) and of the returned array
+            self._left_cache = (key, np.array(array))
+
+        return array
+
+    def _record_timings(self, info):
+        if self._step_start_ns is None:
+            return
+
+        self.timings['total'] = time.perf_counter_ns() - self._step_start_ns
+        self._step_start_ns = None
+
+        self.latency.record_all(self.timings)
+        if self.TIMINGS:
+            info['timings_ns'] = dict(self.timings)
+
+    def latency_summary(self):
+        """Returns the count, mean, and p50/p95/p99 latency (in nanoseconds) of each step phase."""
+        return self.latency.summary()
+
+    def dump_latency(self, path):
+        """Writes the step phase latencies to a file in the Prometheus text format."""
+        self.latency.dump(path)
 
     def _check_selection(self, selected_same):
         return self.latest_env_state["isSame"] == selected_same
@@ -154,39 +547,111 @@ class PolyominoEnvironment(gym.Env):
 
         return reward
 
-    def reset(self, seed=42):
-        data = {
-            'event': {
-                'type': 'action',
-                'value': self.ACTION_DESC[Actions.NEXT_SHAPE.value]
-            }
-        }
-        self._send(data)
+    def reset(self, seed=None, options=None):
+        self._cancel_steps()
+        for data in self._get_episode_events(seed):
+            if self.simulator is not None:
+                self.simulator.handle_event(data['event'])
+            else:
+                self._send_event(data)
+                self._recv_reply()
+
+        self._send(self._create_action_data(Actions.NEXT_SHAPE.value))
+        return self._complete_reset()
+
+    def _get_episode_events(self, seed=None):
+        """Returns the events that configure the environment's problems before an episode: the seed of its random
+        number generator (if given), and the episode's problems (if the environment has a manifest)."""
+        events = []
+        if seed is not None:
+            events.append({'event': {'type': 'seed', 'value': int(seed)}})
+
+        if self.manifest is not None:
+            if self._manifest_episodes is None:
+                self._manifest_episodes = self.manifest.episodes(self.MAX_PROBLEMS)
+            events.append({'event': {'type': 'problems', 'value': next(self._manifest_episodes)}})
+
+        return events
+
+    def _complete_reset(self):
         self.current_timestep = 0
         self.current_problem = 0
 
-        left, right = self.latest_env_state["state"]
-
         self.answered= False
 
-        observation = {
-            "left": np.array(left, dtype=np.uint8).reshape(128, 128, 1),
-            "right": np.array(right, dtype=np.uint8).reshape(128, 128, 1)
-        }
-
+        observation = self._get_observation()
 
         info = {}
+        self._record_timings(info)
         return (observation, info)
 
     def step(self, action):
+        self._check_no_steps_in_flight()
+        return self._step_now(action)
+
+    def step_async(self, action):
+        """Submits an action without waiting for its transition, which step_wait returns.
+
+        The agent can then work (e.g., run inference on the current observation) while the environment executes the
+        action. Up to MAX_PENDING_ACTIONS steps can be in flight; with CHANNEL='dealer', their requests are sent
+        without waiting for replies, and the replies and states are matched to the steps by their order and seqnos.
+        (With CHANNEL='req', the previous step's reply is received first.) The numpy backend executes the step at
+        once.
+        """
+        if len(self._pending_steps) >= MAX_PENDING_ACTIONS:
+            raise RuntimeError(f"At most {MAX_PENDING_ACTIONS} steps can be in flight (see step_wait)")
+
+        if self.simulator is not None:
+            self._pending_steps.append(self._step_now(action))
+            return
+
+        self._free_requester()
+        self._submit(self._create_action_data(action), pipelined=True)
+        self._pending_steps.append((action, self.seqno, self.requester.sent))
+
+    def step_wait(self):
+        """Waits for the oldest step submitted by step_async and returns its transition (see step). Steps are
+        completed in the order they were submitted."""
+        if not self._pending_steps:
+            raise RuntimeError("No step is in flight (see step_async)")
+
+        if self.simulator is not None:
+            return self._pending_steps.popleft()
+
+        action, seqno, ticket = self._pending_steps.popleft()
+        self._begin_step()
+        while self.requester.acked < ticket:
+            self._recv_reply()
+
+        self._wait_for_update(seqno)
+        return self._complete_step(action)
+
+    def _step_now(self, action):
+        self._send(self._create_action_data(action))
+        return self._complete_step(action)
+
+    def _free_requester(self):
+        """With CHANNEL='req', receives the reply of the request in flight (if any), so another can be sent."""
+        if self.CHANNEL == 'req' and self.requester.in_flight:
+            self._recv_reply()
+
+    def _check_no_steps_in_flight(self):
+        if self._pending_steps:
+            raise RuntimeError("Steps submitted by step_async must be completed by step_wait first")
+
+    def _cancel_steps(self):
+        """Discards the steps in flight, receiving their replies (their states are skipped by later waits)."""
+        if self.simulator is None:
+            while self.requester.in_flight:
+                self._recv_reply()
+        self._pending_steps.clear()
+
+    def _complete_step(self, action):
+        reward = self._apply_action(action)
+        return self._complete_observation(action, reward, {})
+
+    def _apply_action(self, action):
         self.current_timestep += 1
-        data = {
-            'event': {
-                'type': 'action',
-                'value': self.ACTION_DESC[action]
-            }
-        }
-        self._send(data)
 
         reward = self.calculate_reward(action)
 
@@ -194,25 +659,125 @@ class PolyominoEnvironment(gym.Env):
             self.current_problem += 1
             self.answered= False # reset after choosing the next shape
 
-        left, right = self.latest_env_state["state"]
-
-        observation = {
-            "left": np.array(left, dtype=np.uint8).reshape(128, 128, 1),
-            "right": np.array(right, dtype=np.uint8).reshape(128, 128, 1)
-        }
+        return reward
 
+    def _complete_observation(self, action, reward, info):
+        observation = self._get_observation()
 
-        info = {}
         # terminated = self.MAX_TIMESTEPS <= self.current_timestep;
         terminated = self.MAX_PROBLEMS <= self.current_problem
         truncated = False
-        logging.info(f"Observation: {observation}, Action: {action}, Reward: {reward}, Terminated: {terminated}, Truncated: {truncated}, Info: {info}")
+        self._record_timings(info)
+        if self.trajectory_log is not None:
+            self.trajectory_log.log_step(self.seqno, action, reward, terminated, truncated, self.latest_env_state['transformations'])
         return observation, reward, terminated, truncated, info
 
+    def step_sequence(self, actions):
+        """Executes a sequence of actions (a macro-action) as a single step.
+
+        Actions are submitted without waiting for the states that reflect them, keeping at most MAX_PENDING_ACTIONS
+        of them queued in the Godot environment, and only the state that reflects the last action is decoded (or,
+        with the numpy backend, rendered). Each action is rewarded by calculate_reward, exactly as if it were
+        stepped, and the rewards are summed. After a next_shape action, the sequence waits for the new problem's
+        state so that later selections are rewarded against it. The sequence ends early if the episode terminates.
+
+        Args:
+            actions (iterable): The actions (see Actions).
+
+        Returns:
+            tuple: The same elements as step's, with the summed reward. The info dict's "actions" element holds the
+                number of actions that were executed.
+        """
+        actions = [int(action) for action in actions]
+        if not actions:
+            raise ValueError("Expected at least one action")
+        self._check_no_steps_in_flight()
+
+        self._begin_step()
+        self._observed_seqno = self.seqno
+
+        reward = 0
+        executed = 0
+        for action in actions:
+            self._submit_pipelined(self._create_action_data(action))
+            reward += self._apply_action(action)
+            executed += 1
+
+            if self.MAX_PROBLEMS <= self.current_problem:
+                break
+            if action == Actions.NEXT_SHAPE.value and executed < len(actions):
+                self._drain_pipeline()
+
+        self._drain_pipeline()
+        return self._complete_observation(actions[executed - 1], reward, {'actions': executed})
+
+    def step_repeat(self, action, count):
+        """Executes an action count times as a single step (see step_sequence)."""
+        return self.step_sequence([action] * count)
+
+    def _submit_pipelined(self, data):
+        if self.simulator is not None:
+            self.seqno += 1
+            start_ns = time.perf_counter_ns()
+            self.simulator.execute(data['event']['value'], self.seqno)
+            self.timings['simulate'] = self.timings.get('simulate', 0) + time.perf_counter_ns() - start_ns
+            return
+
+        # actions beyond the Godot environment's queue depth would be dropped, so a full queue is first waited on
+        if self.seqno - self._observed_seqno >= MAX_PENDING_ACTIONS:
+            frames = self._skip_to_update(self.seqno - MAX_PENDING_ACTIONS + 1)
+            self._observed_seqno = peek_last_action_seqno(frames)
+            self._discard(frames)
+
+        self._submit(data, pipelined=True)
+        self._recv_reply()
+
+    def _drain_pipeline(self):
+        """Waits for (and decodes) the state that reflects every submitted action."""
+        if self.simulator is not None:
+            start_ns = time.perf_counter_ns()
+            self._get_simulated_state()
+            self.timings['simulate'] = self.timings.get('simulate', 0) + time.perf_counter_ns() - start_ns
+        else:
+            _, payload = self._decode(self._skip_to_update(self.seqno))
+            if self.needs_keyframe:
+                self._request_keyframe()
+                self._recv_reply()
+                self._wait_for_update(self.seqno)
+            else:
+                self._update_latest_state(payload)
+
+        self._observed_seqno = self.seqno
+
+    def save_observation(self, observation=None, path=None):
+        """Writes an observation (by default, the latest one) to a .npz file in the background."""
+        if self.trajectory_log is None:
+            raise RuntimeError("Trajectory logging is disabled (LOG_FILE=None)")
+
+        if observation is None:
+            observation = self._get_observation()
+
+        return self.trajectory_log.save_observation(observation, self.seqno, path)
+
     def close(self):
-        self.socket.close()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+            self.metrics_server = None
+
+        if self.trajectory_log is not None:
+            self.trajectory_log.close()
+            self.trajectory_log = None
+
+        self.frame_reader.close()
+
+        if self.context is None:
+            return
+
+        self.requester.close()
         self.listener.close()
-        self.context.term()
+        if self.owns_context:
+            self.context.term()
 
 
 """
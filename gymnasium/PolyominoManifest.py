@@ -0,0 +1,160 @@
+#
+# Polyomino Imagery Environment Manifests
+#
+# Description: Generates, stores and shards episode manifests: fixed sequences of problems that the environment
+#              presents in order (in place of random problems), for reproducible and comparable runs
+# Dependencies: NumPy
+#
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+from PolyominoSimulator import random_problem
+
+MANIFEST_VERSION = 1
+
+
+class Manifest:
+    """A sequence of problems, each given as a dict with the following elements:
+
+        reference: the reference (left) object's [shape, id] config
+        active: the active (right) object's [shape, id] config
+        same: whether the environment reports the objects as the same (i.e., whether their ids match)
+        rotation: the active object's initial rotation (as assigned to its Node2D.rotation by experiment.gd)
+        scale: the active object's initial scale
+        position: the active object's initial [x, y] position in its viewport
+
+    Environments given a manifest present its problems in order, one episode (MAX_PROBLEMS problems) at a time,
+    starting over from the first problem once every problem has been presented. Manifests are split across parallel
+    workers (or the instances of a PolyominoVectorEnv) with shard, which returns non-overlapping parts.
+
+    Args:
+        problems (list): The problems.
+        seed (int, optional): The seed the problems were generated with (for reference).
+    """
+
+    def __init__(self, problems, seed=None):
+        self.problems = list(problems)
+        self.seed = seed
+
+    def __len__(self):
+        return len(self.problems)
+
+    def __getitem__(self, index):
+        return self.problems[index]
+
+    def shard(self, index, count):
+        """Returns the index-th of count contiguous, non-overlapping parts of the manifest (whose sizes differ by at
+        most one problem)."""
+        if not 0 <= index < count:
+            raise ValueError(f'Shard index {index} is not in [0, {count})')
+
+        start, stop = len(self) * index // count, len(self) * (index + 1) // count
+        return Manifest(self.problems[start:stop], seed=self.seed)
+
+    def episodes(self, size):
+        """Yields successive episodes of size problems each, wrapping around to the first problem as needed."""
+        if not self.problems:
+            raise ValueError('The manifest has no problems')
+
+        position = 0
+        while True:
+            yield [self.problems[(position + i) % len(self)] for i in range(size)]
+            position = (position + size) % len(self)
+
+    def save(self, path):
+        header = {'version': MANIFEST_VERSION, 'seed': self.seed, 'problems': len(self)}
+
+        # one problem per line, so manifests can be inspected (and diffed) with line-oriented tools
+        with open(path, 'w') as file:
+            file.write(json.dumps(header) + '\n')
+            for problem in self.problems:
+                file.write(json.dumps(problem) + '\n')
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            header = json.loads(file.readline())
+            if header['version'] != MANIFEST_VERSION:
+                raise ValueError(f"Unsupported manifest version: {header['version']}")
+
+            problems = [json.loads(line) for line in file if line.strip()]
+
+        return cls(problems, seed=header['seed'])
+
+
+def generate(n_problems, seed=None):
+    """Generates a manifest of random problems, drawn as the environment draws them (see random_problem).
+
+    Args:
+        n_problems (int): The number of problems.
+        seed (int, optional): The random number generator's seed.
+
+    Returns:
+        Manifest: The generated manifest.
+    """
+    rng = np.random.default_rng(seed)
+    return Manifest([random_problem(rng) for _ in range(n_problems)], seed=seed)
+
+
+def parse_args():
+    """Parses command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description='Polyomino Imagery Environment - Manifest Generator'
+    )
+
+    parser.add_argument(
+        '--output',
+        type=str,
+        required=True,
+        help='the manifest file (with --shards, the prefix of the shard files)',
+    )
+    parser.add_argument(
+        '--problems',
+        type=int,
+        required=True,
+        help='the number of problems',
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        required=False,
+        default=None,
+        help="the random number generator's seed (default: random)",
+    )
+    parser.add_argument(
+        '--shards',
+        type=int,
+        required=False,
+        default=None,
+        help='split the manifest into this many files (<output>.<index>), e.g., one per worker',
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    """Main entry point for the script."""
+    args = parse_args()
+    manifest = generate(args.problems, seed=args.seed)
+
+    if args.shards is None:
+        manifest.save(args.output)
+        print(f'Wrote {len(manifest)} problems to {args.output}', flush=True)
+        return
+
+    for index in range(args.shards):
+        path = Path(f'{args.output}.{index}')
+        shard = manifest.shard(index, args.shards)
+        shard.save(path)
+        print(f'Wrote {len(shard)} problems to {path}', flush=True)
+
+
+if __name__ == '__main__':
+    main()
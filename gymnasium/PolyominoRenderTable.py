@@ -0,0 +1,234 @@
+#
+# Polyomino Imagery Environment Render Table
+#
+# Description: Builds (and serves frames from) a memory-mapped table of pre-rendered polyominoes for every shape,
+#              rotation and scale, so the simulator backend can produce observations without rendering them
+# Dependencies: NumPy
+#
+import argparse
+import bisect
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+
+from PolyominoSimulator import ANGULAR_DELTA
+from PolyominoSimulator import MAX_SCALE
+from PolyominoSimulator import MIN_SCALE
+from PolyominoSimulator import POLYOMINO_CONFIGS
+from PolyominoSimulator import Polyomino
+from PolyominoSimulator import SCALE_DELTA
+from PolyominoSimulator import VIEWPORT_SIZE
+from PolyominoSimulator import render
+
+RENDER_TABLE_VERSION = 1
+
+# files that make up a render table directory
+HEADER_FILE = 'render_table.json'
+FRAMES_FILE = 'frames.u8'
+INDEX_FILE = 'index.bin'
+
+# objects are rendered at the center of a canvas large enough for the largest (fully rotated) object at MAX_SCALE
+CANVAS_SIZE = 2 * VIEWPORT_SIZE
+CANVAS_CENTER = VIEWPORT_SIZE
+
+# one index entry per (shape, id, rotation, scale): the bounding box of the object's pixels, relative to its position,
+# and the offset of the box's pixels (row-major) in FRAMES_FILE
+INDEX_DTYPE = np.dtype([
+    ('offset', '<i8'),
+    ('top', '<i2'),
+    ('left', '<i2'),
+    ('height', '<u2'),
+    ('width', '<u2'),
+])
+
+
+def table_scales(scale_step=SCALE_DELTA):
+    """Returns the scales of a table's entries: MIN_SCALE in scale_step increments, up to and including MAX_SCALE."""
+    count = int(math.floor((MAX_SCALE - MIN_SCALE) / scale_step + 1e-9)) + 1
+    scales = [round(MIN_SCALE + i * scale_step, 6) for i in range(count)]
+    if not math.isclose(scales[-1], MAX_SCALE):
+        scales.append(MAX_SCALE)
+    return scales
+
+
+def build(path, rotation_step=ANGULAR_DELTA, scale_step=SCALE_DELTA, verbose=False):
+    """Renders every polyomino at every rotation and scale of the table into a render table directory.
+
+    Each entry stores only the bounding box of the object's pixels; positions are applied when frames are served (see
+    RenderTable.render).
+
+    Args:
+        path (str): The render table directory (created if it does not exist; an existing table is replaced).
+        rotation_step (int): The rotation increment in degrees (which must divide 360).
+        scale_step (float): The scale increment.
+        verbose (bool): Whether to print progress.
+
+    Returns:
+        RenderTable: The built table.
+    """
+    if 360 % rotation_step:
+        raise ValueError(f'Rotation step {rotation_step} does not divide 360 degrees')
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    rotations = range(0, 360, rotation_step)
+    scales = table_scales(scale_step)
+
+    index = np.zeros(len(POLYOMINO_CONFIGS) * len(rotations) * len(scales), dtype=INDEX_DTYPE)
+    canvas = np.zeros((CANVAS_SIZE, CANVAS_SIZE), dtype=np.uint8)
+
+    entry = offset = 0
+    with open(path / FRAMES_FILE, 'wb') as frames:
+        for shape, id in POLYOMINO_CONFIGS:
+            for rotation in rotations:
+                for scale in scales:
+                    obj = Polyomino(shape, id, math.radians(rotation), scale, x=CANVAS_CENTER, y=CANVAS_CENTER)
+                    render(obj, out=canvas, size=CANVAS_SIZE)
+
+                    rows, cols = np.flatnonzero(canvas.any(axis=1)), np.flatnonzero(canvas.any(axis=0))
+                    if len(rows):
+                        box = canvas[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+                        index[entry] = (offset, rows[0] - CANVAS_CENTER, cols[0] - CANVAS_CENTER, *box.shape)
+                        frames.write(np.ascontiguousarray(box).data)
+                        offset += box.size
+                    entry += 1
+
+            if verbose:
+                print(f'Rendered shape {shape}, id {id} ({entry} of {len(index)} entries)', flush=True)
+
+    index.tofile(path / INDEX_FILE)
+
+    header = {
+        'version': RENDER_TABLE_VERSION,
+        'viewport_size': VIEWPORT_SIZE,
+        'configs': POLYOMINO_CONFIGS,
+        'rotation_step': rotation_step,
+        'scales': scales,
+    }
+    (path / HEADER_FILE).write_text(json.dumps(header, indent=2))
+
+    return RenderTable(path)
+
+
+class RenderTable:
+    """Serves frames from a render table directory (see build) in place of PolyominoSimulator.render.
+
+    A frame is served by copying the entry of the object's shape and id at the nearest rotation and scale of the table
+    into the viewport, shifted to the object's position rounded to the nearest pixel. Frames are therefore exact for
+    rotations, scales and positions on the table's grid, and quantized otherwise (e.g., to within 2.5 degrees, half a
+    scale step and half a pixel with the default table). The simulator's random transformations are not on the grid,
+    so observations of active objects are generally quantized; finer tables (e.g., --rotation-step 1) reduce this.
+
+    Args:
+        path (str): The render table directory.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.header = json.loads((self.path / HEADER_FILE).read_text())
+        if self.header['version'] != RENDER_TABLE_VERSION:
+            raise ValueError(f"Unsupported render table version: {self.header['version']}")
+
+        self.index = np.fromfile(self.path / INDEX_FILE, dtype=INDEX_DTYPE)
+        self.frames = np.memmap(self.path / FRAMES_FILE, dtype=np.uint8, mode='r') \
+            if (self.path / FRAMES_FILE).stat().st_size else np.zeros(0, dtype=np.uint8)
+
+        self.rotation_step = self.header['rotation_step']
+        self.n_rotations = 360 // self.rotation_step
+        self.scales = self.header['scales']
+        self.configs = {tuple(config): i for i, config in enumerate(self.header['configs'])}
+
+        # scales are looked up by the midpoints between consecutive entries
+        self._scale_bounds = [(a + b) / 2 for a, b in zip(self.scales, self.scales[1:])]
+
+        # the index as plain lists, which are faster than structured array elements to read one entry at a time
+        self._entries = list(zip(*(self.index[field].tolist() for field in INDEX_DTYPE.names)))
+
+    def __len__(self):
+        return len(self.index)
+
+    def entry(self, obj):
+        """Returns the index of the table entry nearest to a polyomino's shape, id, rotation and scale."""
+        config = self.configs[(obj.shape, obj.id)]
+        rotation = round(math.degrees(obj.rotation) / self.rotation_step) % self.n_rotations
+        scale = bisect.bisect(self._scale_bounds, obj.scale)
+        return (config * self.n_rotations + rotation) * len(self.scales) + scale
+
+    def render(self, obj, out=None):
+        """Returns a polyomino's (128 x 128 uint8) frame from the table (see PolyominoSimulator.render)."""
+        frame = np.zeros((VIEWPORT_SIZE, VIEWPORT_SIZE), dtype=np.uint8) if out is None else out
+        if out is not None:
+            frame.fill(0)
+
+        if obj is None:
+            return frame
+
+        offset, top, left, height, width = self._entries[self.entry(obj)]
+        if not height:
+            return frame
+
+        # entries are rendered at integer positions (as is CENTROID, so reference objects are served exactly)
+        top += math.floor(obj.y + 0.5)
+        left += math.floor(obj.x + 0.5)
+
+        # entries may extend past the viewport's edges, so they are clipped
+        y0, y1 = max(top, 0), min(top + height, VIEWPORT_SIZE)
+        x0, x1 = max(left, 0), min(left + width, VIEWPORT_SIZE)
+        if y0 < y1 and x0 < x1:
+            box = self.frames[offset:offset + height * width].reshape(height, width)
+            frame[y0:y1, x0:x1] = box[y0 - top:y1 - top, x0 - left:x1 - left]
+
+        return frame
+
+
+def parse_args():
+    """Parses command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description='Polyomino Imagery Environment - Render Table Builder'
+    )
+
+    parser.add_argument(
+        '--output',
+        type=str,
+        required=True,
+        help='the render table directory',
+    )
+    parser.add_argument(
+        '--rotation-step',
+        type=int,
+        required=False,
+        default=ANGULAR_DELTA,
+        help=f'the rotation increment in degrees (default: {ANGULAR_DELTA})',
+    )
+    parser.add_argument(
+        '--scale-step',
+        type=float,
+        required=False,
+        default=SCALE_DELTA,
+        help=f'the scale increment (default: {SCALE_DELTA})',
+    )
+    parser.add_argument(
+        '--verbose',
+        action='store_true',
+        help='print progress while rendering',
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    """Main entry point for the script."""
+    args = parse_args()
+    table = build(args.output, rotation_step=args.rotation_step, scale_step=args.scale_step, verbose=args.verbose)
+    print(f'Rendered {len(table)} entries ({table.frames.nbytes / 2 ** 20:.1f} MiB) to {args.output}', flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,464 @@
+import math
+from collections import deque
+
+import numpy as np
+
+# action execution constants (see godot/scripts/globals.gd)
+LINEAR_DELTA = 4  # change in pixels - used for linear translations
+ANGULAR_DELTA = 5  # change in degrees - used for rotational actions
+SCALE_DELTA = 0.1  # change in scale - used for zooming operations
+
+MIN_SCALE = 0.65
+MAX_SCALE = 1.4
+
+MONOMINOS, DOMINOS, TROMINOS, TETROMINOS, PENTOMINOS = 1, 2, 3, 4, 5
+
+# cells that are "on" for each polyomino as (column, row) positions in a 5 x 5 grid, indexed by shape then id (see
+# _create_monominos through _create_pentominos in godot/scripts/globals.gd)
+SHAPES = {
+    MONOMINOS: [
+        [(2, 2)],
+    ],
+    DOMINOS: [
+        [(2, 1), (2, 2)],
+    ],
+    TROMINOS: [
+        [(2, 1), (2, 2), (2, 3)],
+        [(2, 1), (2, 2), (3, 2)],
+    ],
+    TETROMINOS: [
+        [(2, 1), (2, 2), (3, 2), (3, 3)],
+        [(2, 1), (1, 2), (2, 2), (1, 3)],
+        [(2, 1), (1, 2), (2, 2), (3, 2)],
+        [(1, 1), (2, 1), (1, 2), (2, 2)],
+        [(2, 1), (2, 2), (2, 3), (2, 4)],
+        [(2, 1), (2, 2), (1, 3), (2, 3)],
+        [(2, 1), (2, 2), (2, 3), (3, 3)],
+    ],
+    PENTOMINOS: [
+        [(2, 1), (1, 2), (2, 2), (3, 2), (3, 3)],
+        [(2, 1), (1, 2), (2, 2), (3, 2), (1, 3)],
+        [(2, 1), (2, 2), (2, 3), (2, 4), (3, 4)],
+        [(2, 1), (2, 2), (2, 3), (2, 4), (1, 4)],
+        [(2, 1), (1, 2), (2, 2), (1, 3), (2, 3)],
+        [(2, 1), (2, 2), (3, 2), (2, 3), (3, 3)],
+        [(2, 1), (2, 2), (1, 3), (2, 3), (1, 4)],
+        [(2, 1), (2, 2), (2, 3), (3, 3), (3, 4)],
+        [(2, 1), (1, 2), (2, 2), (2, 3), (2, 4)],
+        [(2, 1), (2, 2), (3, 2), (2, 3), (2, 4)],
+        [(2, 1), (3, 1), (2, 2), (1, 3), (2, 3)],
+        [(1, 1), (2, 1), (2, 2), (2, 3), (3, 3)],
+        [(2, 0), (2, 1), (2, 2), (2, 3), (2, 4)],
+        [(2, 1), (2, 2), (1, 3), (2, 3), (3, 3)],
+        [(1, 1), (3, 1), (1, 2), (2, 2), (3, 2)],
+        [(2, 1), (2, 2), (0, 3), (1, 3), (2, 3)],
+        [(3, 1), (2, 2), (3, 2), (1, 3), (2, 3)],
+        [(2, 1), (1, 2), (2, 2), (3, 2), (2, 3)],
+    ],
+}
+
+# (shape, id) pairs in the order used by Globals._initialize_polyomino_configs
+POLYOMINO_CONFIGS = [(shape, id) for shape in SHAPES for id in range(len(SHAPES[shape]))]
+
+# viewport geometry (see godot/scenes/*.tscn)
+VIEWPORT_SIZE = 128
+CENTROID = (66.0, 64.0)
+CELL_SIZE = 16
+GRID_OFFSET = -32  # position of the polyomino's grid relative to its origin
+BOUNDARIES = {'top': 4.0, 'bottom': 124.0, 'left': 4.0, 'right': 124.0}
+COLLISION_EXTENTS = (7.38906, 7.58457)  # half-extents of each monomino's collision rectangle
+
+# bounds of the random position and scale assigned to the active object (see experiment.gd)
+MIN_POSITION_STEP = 50
+MAX_POSITION_STEP = 85
+MAX_RANDOM_SCALE = 1.1
+
+# luminance of the result colors after Image.convert(FORMAT_L8), which averages the RGB channels
+CORRECT_RESULT_COLOR = 255 // 3  # green (right viewport)
+INCORRECT_RESULT_COLOR = 255 // 3  # red (left viewport)
+
+# modes (see Globals.mode_enum)
+PLAY_MODE = 0
+TEST_MODE = 1
+
+TEST_ENABLED_ACTIONS = ('next_shape', 'select_same_shape', 'select_different_shape')
+
+# a monomino's texture (godot/resources/monomino.png): white with a 1 pixel black border
+_MONOMINO = np.zeros((CELL_SIZE, CELL_SIZE), dtype=np.uint8)
+_MONOMINO[1:-1, 1:-1] = 255
+
+# the polyomino's grid spans [GRID_OFFSET - CELL_SIZE / 2, GRID_OFFSET + 4.5 * CELL_SIZE) in object coordinates.
+# bitmaps are padded so that every pixel in an object's bounding box maps onto the bitmap without clipping
+_BITMAP_PADDING = 48
+_BITMAP_ORIGIN = GRID_OFFSET - CELL_SIZE // 2 - _BITMAP_PADDING
+_BITMAP_SIZE = 5 * CELL_SIZE + 2 * _BITMAP_PADDING
+
+_PIXEL_CENTERS = np.arange(VIEWPORT_SIZE, dtype=np.float32) + 0.5
+
+
+def _create_bitmap(on_positions):
+    bitmap = np.zeros((_BITMAP_SIZE, _BITMAP_SIZE), dtype=np.uint8)
+    for col, row in on_positions:
+        top, left = _BITMAP_PADDING + row * CELL_SIZE, _BITMAP_PADDING + col * CELL_SIZE
+        bitmap[top:top + CELL_SIZE, left:left + CELL_SIZE] = _MONOMINO
+    return bitmap.ravel()
+
+
+_BITMAPS = {(shape, id): _create_bitmap(SHAPES[shape][id]) for shape, id in POLYOMINO_CONFIGS}
+
+# centers of each "on" cell in object coordinates (used for boundary collisions)
+_CELL_CENTERS = {
+    (shape, id): [(GRID_OFFSET + CELL_SIZE * col, GRID_OFFSET + CELL_SIZE * row) for col, row in SHAPES[shape][id]]
+    for shape, id in POLYOMINO_CONFIGS
+}
+
+
+def _round(value):
+    # GDScript's round (half away from zero) applied to two decimal places
+    return math.floor(value * 100 + 0.5) / 100.0
+
+
+class Polyomino:
+    """A polyomino object and its transformations (rotation in radians, as in Godot's Node2D.rotation)."""
+    __slots__ = ('shape', 'id', 'rotation', 'scale', 'x', 'y')
+
+    def __init__(self, shape, id, rotation=0.0, scale=1.0, x=CENTROID[0], y=CENTROID[1]):
+        self.shape = shape
+        self.id = id
+        self.rotation = rotation
+        self.scale = scale
+        self.x = x
+        self.y = y
+
+
+def _transform_cells(obj, cos, sin):
+    # viewport coordinates of the centers of the object's cells
+    xs = [obj.x + obj.scale * (cos * cx - sin * cy) for cx, cy in _CELL_CENTERS[(obj.shape, obj.id)]]
+    ys = [obj.y + obj.scale * (sin * cx + cos * cy) for cx, cy in _CELL_CENTERS[(obj.shape, obj.id)]]
+    return xs, ys
+
+
+def render(obj, out=None, size=VIEWPORT_SIZE):
+    """Rasterizes a polyomino into a 128 x 128 (by default) uint8 luminance frame.
+
+    Pixels are sampled from the polyomino's unrotated bitmap with nearest-neighbor sampling, so edge pixels may differ
+    slightly from Godot's filtered rendering.
+
+    Args:
+        obj (Polyomino): The polyomino to render (or None for an empty frame).
+        out (np.ndarray, optional): A preallocated (size, size) uint8 array to render into.
+        size (int): The frame's height and width (a larger canvas keeps objects from being clipped).
+
+    Returns:
+        np.ndarray: The rendered frame.
+    """
+    frame = np.zeros((size, size), dtype=np.uint8) if out is None else out
+    if out is not None:
+        frame.fill(0)
+
+    if obj is None:
+        return frame
+
+    cos, sin = math.cos(obj.rotation), math.sin(obj.rotation)
+
+    # only pixels within the bounding box of the object's (rotated) cells can be covered
+    radius = CELL_SIZE / math.sqrt(2) * obj.scale + 1
+    xs, ys = _transform_cells(obj, cos, sin)
+    x0, x1 = max(0, int(min(xs) - radius)), min(size, int(max(xs) + radius) + 1)
+    y0, y1 = max(0, int(min(ys) - radius)), min(size, int(max(ys) + radius) + 1)
+    if x0 >= x1 or y0 >= y1:
+        return frame
+
+    pixel_centers = _PIXEL_CENTERS if size == VIEWPORT_SIZE else np.arange(size, dtype=np.float32) + 0.5
+    dx = pixel_centers[x0:x1] - np.float32(obj.x)
+    dy = pixel_centers[y0:y1] - np.float32(obj.y)
+
+    # inverse transform from viewport to bitmap coordinates
+    c = np.float32(cos / obj.scale)
+    s = np.float32(sin / obj.scale)
+    offset = np.float32(-_BITMAP_ORIGIN)
+    u = np.add.outer(s * dy + offset, c * dx).astype(np.intp)
+    v = np.add.outer(c * dy + offset, -s * dx).astype(np.intp)
+
+    v *= _BITMAP_SIZE
+    v += u
+    _BITMAPS[(obj.shape, obj.id)].take(v, out=frame[y0:y1, x0:x1])
+
+    return frame
+
+
+def random_problem(rng):
+    """Draws a problem as the Godot environment's execute_next_shape does (with a NumPy generator).
+
+    Args:
+        rng (np.random.Generator): The random number generator.
+
+    Returns:
+        dict: The problem: the reference and active objects' [shape, id] configs, whether the environment reports
+        them as the same, and the active object's initial rotation, scale and [x, y] position (see
+        PolyominoManifest).
+    """
+    same = rng.integers(2) == 0
+
+    reference = POLYOMINO_CONFIGS[rng.integers(len(POLYOMINO_CONFIGS))]
+    active = reference if same else POLYOMINO_CONFIGS[rng.integers(len(POLYOMINO_CONFIGS))]
+
+    # experiment.gd assigns the rotation in degrees to Node2D.rotation (radians); this is kept for parity
+    rotation = int(rng.integers(1, 360 // ANGULAR_DELTA + 1) * ANGULAR_DELTA)
+
+    scale_step = rng.random()
+    scale = MIN_SCALE * scale_step + MAX_RANDOM_SCALE * (1 - scale_step)
+
+    step_x, step_y = rng.random(2)
+    position = [MIN_POSITION_STEP * step_x + MAX_POSITION_STEP * (1 - step_x),
+                MIN_POSITION_STEP * step_y + MAX_POSITION_STEP * (1 - step_y)]
+
+    return {
+        'reference': list(reference),
+        'active': list(active),
+        # as in publish_state, objects are considered the same when their ids match
+        'same': reference[1] == active[1],
+        'rotation': rotation,
+        'scale': float(scale),
+        'position': [float(x) for x in position]
+    }
+
+
+class PolyominoSimulator:
+    """An in-process NumPy re-implementation of the Godot environment (godot/scripts/experiment.gd).
+
+    Actions are applied using the same rules and constants as the Godot environment, and get_state returns the "data"
+    element of the state messages that the Godot environment publishes. Boundary collisions are resolved immediately
+    after each action, so states reflect the position the active object settles at.
+
+    Args:
+        seed (int, optional): The seed of the random shapes and transformations.
+        mode (int): PLAY_MODE or TEST_MODE.
+        renderer (callable): Renders a Polyomino (or None) into a new frame (e.g., render, or the render method of a
+            PolyominoRenderTable.RenderTable).
+    """
+
+    def __init__(self, seed=None, mode=PLAY_MODE, renderer=render):
+        self.rng = np.random.default_rng(seed)
+        self.mode = mode
+        self.renderer = renderer
+
+        # problems presented by the following next_shape actions, in place of random ones (see handle_event)
+        self.problems = deque()
+
+        self.last_action_seqno = -1
+
+        # initially true to force next shape action (as in experiment.gd)
+        self.answered = True
+        self.same = False
+
+        # the reference object (left viewport) and active object (right viewport)
+        self.ref_object = None
+        self.active_object = None
+
+        # None when hidden; otherwise, whether the last selection was correct
+        self.result = None
+
+        self._left_frame = None
+        self._right_frame = None
+
+    def seed(self, seed):
+        self.rng = np.random.default_rng(seed)
+
+    def handle_event(self, event):
+        """Handles a non-action event of the action protocol: 'seed' (reseeds the random problems) or 'problems'
+        (replaces the scheduled problems).
+
+        Both configure an episode, so the current problem is abandoned: the next next_shape action presents a new
+        problem even if the current one was never answered (as in experiment.gd).
+        """
+        if event['type'] == 'seed':
+            self.seed(event['value'])
+            self.answered = True
+        elif event['type'] == 'problems':
+            self.problems = deque(event['value'])
+            self.answered = True
+
+    def is_action_enabled(self, action):
+        return self.mode != TEST_MODE or action in TEST_ENABLED_ACTIONS
+
+    def execute(self, action, seqno):
+        """Executes an action, updating last_action_seqno even if the action is ignored (as in experiment.gd).
+
+        Args:
+            action (str): The action's name (e.g., 'rotate_clockwise').
+            seqno (int): The action's sequence number.
+
+        Returns:
+            bool or None: The selection result for selection actions that were executed; otherwise, None.
+        """
+        result = None
+        if self.is_action_enabled(action) and self.answered == (action == 'next_shape'):
+            self.result = None
+
+            if action in ('up', 'down', 'left', 'right'):
+                self._execute_translation(action)
+            elif action in ('rotate_clockwise', 'rotate_counterclockwise'):
+                self._execute_rotation(action)
+            elif action in ('zoom_in', 'zoom_out'):
+                self._execute_zoom(action)
+            elif action == 'next_shape':
+                self._execute_next_shape()
+            elif action in ('select_same_shape', 'select_different_shape'):
+                result = self._execute_selection(action)
+            else:
+                raise ValueError(f"Unrecognized action: {action}")
+
+            self._resolve_collisions()
+            self._right_frame = None
+
+        self.last_action_seqno = seqno
+        return result
+
+    def get_state(self):
+        """Returns the environment's state in the format of the "data" element of published state messages."""
+        ref, active = self.ref_object, self.active_object
+
+        delta_rot = translation = scale = None
+
+        # as in publish_state, objects are considered the same when their ids match
+        self.same = True
+        if ref is not None and active is not None:
+            delta_rot = _round(math.degrees(active.rotation - ref.rotation) % 360)
+            translation = _round(math.hypot(active.x - ref.x, active.y - ref.y))
+            scale = _round(active.scale)
+            self.same = ref.id == active.id
+
+        left, right = self._get_frames()
+
+        return {
+            'left_viewport': self._get_viewport_state(ref, left),
+            'right_viewport': self._get_viewport_state(active, right),
+            'last_action_seqno': self.last_action_seqno,
+            'same': self.same,
+            'mode': self.mode,
+            'transformations': {
+                'rotation_active': delta_rot,
+                'scale': scale,
+                'translation': translation
+            }
+        }
+
+    @staticmethod
+    def _get_viewport_state(obj, screenshot):
+        return {
+            'shape': None if obj is None else obj.shape,
+            'id': None if obj is None else obj.id,
+            'screenshot': screenshot
+        }
+
+    def _get_frames(self):
+        if self.result is not None:
+            left = np.full((VIEWPORT_SIZE, VIEWPORT_SIZE), 0 if self.result else INCORRECT_RESULT_COLOR, np.uint8)
+            right = np.full((VIEWPORT_SIZE, VIEWPORT_SIZE), CORRECT_RESULT_COLOR if self.result else 0, np.uint8)
+            return left, right
+
+        # the reference object never moves, so its frame is only rendered when it changes
+        if self._left_frame is None:
+            self._left_frame = self.renderer(self.ref_object)
+            self._left_frame.setflags(write=False)
+
+        if self._right_frame is None:
+            self._right_frame = self.renderer(self.active_object)
+            self._right_frame.setflags(write=False)
+
+        return self._left_frame, self._right_frame
+
+    def _execute_next_shape(self):
+        problem = self.problems.popleft() if self.problems else random_problem(self.rng)
+
+        self.ref_object = Polyomino(*problem['reference'])
+        self.active_object = Polyomino(*problem['active'])
+        self.active_object.rotation = float(problem['rotation'])
+        self.active_object.scale = problem['scale']
+        self.active_object.x, self.active_object.y = problem['position']
+
+        self._left_frame = None
+        self.answered = False
+
+    def _execute_translation(self, action):
+        if self.active_object is None:
+            return
+
+        if action == 'up':
+            self.active_object.y -= LINEAR_DELTA
+        elif action == 'down':
+            self.active_object.y += LINEAR_DELTA
+        elif action == 'left':
+            self.active_object.x -= LINEAR_DELTA
+        elif action == 'right':
+            self.active_object.x += LINEAR_DELTA
+
+    def _execute_rotation(self, action):
+        if self.active_object is None:
+            return
+
+        delta = math.radians(ANGULAR_DELTA)
+        self.active_object.rotation += delta if action == 'rotate_clockwise' else -delta
+
+    def _execute_zoom(self, action):
+        if self.active_object is None:
+            return
+
+        new_scale = self.active_object.scale + (SCALE_DELTA if action == 'zoom_in' else -SCALE_DELTA)
+        self.active_object.scale = min(max(new_scale, MIN_SCALE), MAX_SCALE)
+
+    def _execute_selection(self, action):
+        if self.active_object is None:
+            return None
+
+        self.answered = True
+
+        chose_same = 'same' in action
+        is_correct = self.same if chose_same else not self.same
+        self.result = is_correct
+
+        return is_correct
+
+    def _get_colliding_boundaries(self):
+        obj = self.active_object
+        c, s = math.cos(obj.rotation), math.sin(obj.rotation)
+
+        # projected half-extents of the (rotated) collision rectangles
+        ex, ey = COLLISION_EXTENTS
+        hx = obj.scale * (ex * abs(c) + ey * abs(s))
+        hy = obj.scale * (ex * abs(s) + ey * abs(c))
+
+        xs, ys = _transform_cells(obj, c, s)
+
+        # a boundary collides when any collision rectangle reaches past it
+        boundaries = []
+        if min(ys) - hy < BOUNDARIES['top']:
+            boundaries.append('top')
+        if max(ys) + hy > BOUNDARIES['bottom']:
+            boundaries.append('bottom')
+        if min(xs) - hx < BOUNDARIES['left']:
+            boundaries.append('left')
+        if max(xs) + hx > BOUNDARIES['right']:
+            boundaries.append('right')
+
+        return boundaries
+
+    def _resolve_collisions(self):
+        # as in experiment.gd's _process, the active object moves 1 pixel away from each colliding boundary until it
+        # no longer collides
+        if self.active_object is None:
+            return
+
+        for _ in range(VIEWPORT_SIZE):
+            boundaries = self._get_colliding_boundaries()
+            if not boundaries:
+                return
+
+            dx = ('left' in boundaries) - ('right' in boundaries)
+            dy = ('top' in boundaries) - ('bottom' in boundaries)
+            if dx == 0 and dy == 0:
+                return
+
+            self.active_object.x += dx
+            self.active_object.y += dy
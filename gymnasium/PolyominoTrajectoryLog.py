@@ -0,0 +1,138 @@
+import logging
+import logging.handlers
+import queue
+from itertools import count
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_LOG_FILE = 'polyomino_env.log'
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_instances = count()
+
+
+class _ObservationHandler(logging.Handler):
+    """Writes the observations attached to log records as compressed NumPy archives (.npz)."""
+
+    def emit(self, record):
+        observation = getattr(record, 'observation', None)
+        if observation is None:
+            return
+
+        try:
+            path = Path(record.observation_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            np.savez_compressed(path, **observation)
+        except Exception:
+            self.handleError(record)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """A queue handler that queues records unformatted, so that they are formatted by the background thread rather
+    than by the step loop. (Records' arguments are scalars or copied arrays, which later steps cannot change.)"""
+
+    def prepare(self, record):
+        return record
+
+
+class _ScalarHandler(logging.FileHandler):
+    """A file handler that skips observation records (which are written by _ObservationHandler)."""
+
+    def emit(self, record):
+        if getattr(record, 'observation', None) is None:
+            super().emit(record)
+
+
+class TrajectoryLogger:
+    """Records an environment's trajectory without slowing down its step loop.
+
+    Log records are handed to a queue unformatted, and formatted and written to file by a background thread
+    (logging.handlers.QueueListener).
+    Only compact per-step scalars are recorded; observations are written as binary .npz files, and only when
+    save_observation is called.
+
+    Args:
+        path (str): The log file's path.
+        level (int): The logger's threshold; records below it (including steps, if step_level is lower) are dropped.
+        step_level (int): The level at which steps (and saved observations) are logged.
+        sample_rate (float): The fraction of steps to record (e.g., 0.01 records every 100th step).
+        observation_dir (str): The directory where saved observations are written (defaults to the log's directory).
+    """
+
+    def __init__(self, path=DEFAULT_LOG_FILE, level=logging.INFO, step_level=logging.INFO, sample_rate=1.0,
+                 observation_dir=None):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"Sample rate must be in [0, 1] (got {sample_rate})")
+
+        self.step_level = step_level
+        self.sample_rate = sample_rate
+        self.observation_dir = Path(observation_dir) if observation_dir else Path(path).parent
+
+        # deterministic sampling: a step is recorded each time the accumulated rate reaches 1
+        self._credit = 1.0 - sample_rate
+
+        self.logger = logging.getLogger(f'polyomino_env.trajectory.{next(_instances)}')
+        self.logger.setLevel(level)
+        self.logger.propagate = False
+
+        file_handler = _ScalarHandler(path, mode='a', delay=True)
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+        self._queue = queue.SimpleQueue()
+        self.logger.addHandler(_DeferredQueueHandler(self._queue))
+        self._listener = logging.handlers.QueueListener(self._queue, file_handler, _ObservationHandler())
+        self._listener.start()
+
+    def log(self, msg, *args, level=None):
+        self.logger.log(logging.INFO if level is None else level, msg, *args)
+
+    def log_step(self, seqno, action, reward, terminated, truncated, transformations=None):
+        """Records a step's scalars, subject to the logger's level and sample rate."""
+        if not self.logger.isEnabledFor(self.step_level):
+            return
+
+        self._credit += self.sample_rate
+        if self._credit < 1.0:
+            return
+        self._credit -= 1.0
+
+        if transformations is None:
+            transformations = {}
+
+        self.logger.log(self.step_level,
+                        'Seqno: %s, Action: %s, Reward: %s, Terminated: %s, Truncated: %s, '
+                        'Rotation: %s, Scale: %s, Translation: %s',
+                        seqno, action, reward, terminated, truncated, transformations.get('rotation_active'),
+                        transformations.get('scale'), transformations.get('translation'))
+
+    def save_observation(self, observation, seqno, path=None):
+        """Queues an observation to be written as a .npz archive (one array per view) by the background thread.
+
+        Returns:
+            Path: The path the observation will be written to.
+        """
+        path = Path(path) if path else self.observation_dir / f'observation_{seqno}.npz'
+
+        # arrays are copied because observations may be views of buffers that are reused by later steps
+        observation = {name: np.array(view) for name, view in observation.items()}
+
+        # records are queued directly so that on-demand saves bypass the logger's level and sampling
+        record = self.logger.makeRecord(self.logger.name, self.step_level, __file__, 0, 'Observation saved: %s',
+                                        (path,), None, extra={'observation': observation, 'observation_path': str(path)})
+        self._queue.put_nowait(record)
+        return path
+
+    def close(self):
+        """Flushes queued records and stops the background writer."""
+        if self._listener is None:
+            return
+
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
+        self._listener = None
+
+        for handler in self.logger.handlers:
+            handler.close()
+        self.logger.handlers.clear()
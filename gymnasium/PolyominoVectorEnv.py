@@ -0,0 +1,238 @@
+import os
+import time
+from copy import deepcopy
+
+import gymnasium as gym
+import numpy as np
+import zmq
+from gymnasium.vector import AutoresetMode
+from gymnasium.vector.utils import batch_space, concatenate, create_empty_array
+
+from PolyominoEnv import Actions, PolyominoEnvironment
+from PolyominoManifest import Manifest
+
+
+class PolyominoVectorEnv(gym.vector.VectorEnv):
+    """Steps several Godot environment instances concurrently.
+
+    Actions are submitted to every instance before any replies are awaited, and the REQ (ack) and SUB (state) sockets
+    of all instances are serviced by a single zmq.Poller, so a batched step costs roughly one round-trip rather than
+    one per instance. Sub-environments that terminate are reset on the following step (next-step autoreset).
+
+    Args:
+        ADDRESSES (list): One (host, port) or (host, port, listener_port) tuple per Godot instance, where port is the
+            instance's action listener port. When omitted, listener_port defaults to port - 1 (i.e., the 10002/10001
+            convention used by the environment's container).
+        TIMEOUT (int): The maximum time in milliseconds to wait for all instances to reply.
+        MAX_TIMESTEPS (int): Passed on to each PolyominoEnvironment.
+        COPY (bool): Whether to return copies of the batched observations rather than the reused batch buffers.
+        CONFLATE (bool): Whether each instance decodes only its most recent queued state (see PolyominoEnvironment).
+        MANIFEST (Manifest or str, optional): A manifest (or the path of one) whose problems are presented in order
+            (see PolyominoManifest); each instance plays its own shard of it.
+    """
+    metadata = {"autoreset_mode": AutoresetMode.NEXT_STEP}
+
+    def __init__(self, ADDRESSES, TIMEOUT = 5000, MAX_TIMESTEPS = 1000, COPY = True, CONFLATE = False, MANIFEST = None):
+        self.TIMEOUT = TIMEOUT
+        self.COPY = COPY
+
+        if isinstance(MANIFEST, (str, os.PathLike)):
+            MANIFEST = Manifest.load(MANIFEST)
+
+        self.context = zmq.Context()
+        self.envs = []
+        for i, address in enumerate(ADDRESSES):
+            host, port = address[0], address[1]
+            listener_port = address[2] if len(address) > 2 else port - 1
+            manifest = None if MANIFEST is None else MANIFEST.shard(i, len(ADDRESSES))
+
+            self.envs.append(PolyominoEnvironment(PORT=port, LISTENER_PORT=listener_port, HOST=host, TIMEOUT=TIMEOUT,
+                                                  MAX_TIMESTEPS=MAX_TIMESTEPS, CONTEXT=self.context,
+                                                  CONFLATE=CONFLATE, MANIFEST=manifest))
+
+        self.num_envs = len(self.envs)
+
+        self.single_action_space = self.envs[0].action_space
+        self.action_space = batch_space(self.single_action_space, self.num_envs)
+        self.single_observation_space = self.envs[0].observation_space
+        self.observation_space = batch_space(self.single_observation_space, self.num_envs)
+
+        self._observations = create_empty_array(self.single_observation_space, n=self.num_envs, fn=np.zeros)
+        self._rewards = np.zeros(self.num_envs, dtype=np.float64)
+        self._terminations = np.zeros(self.num_envs, dtype=np.bool_)
+        self._truncations = np.zeros(self.num_envs, dtype=np.bool_)
+        self._autoreset_envs = np.zeros(self.num_envs, dtype=np.bool_)
+
+        # a single poller services the action (REQ) and state (SUB) sockets of every instance
+        self.poller = zmq.Poller()
+        self._sockets = {}
+        self._reply_sockets = [None] * self.num_envs
+        for i, env in enumerate(self.envs):
+            self._register_reply_socket(i)
+            self.poller.register(env.listener, zmq.POLLIN)
+            self._sockets[env.listener] = (i, 'state')
+
+    def reset(self, *, seed=None, options=None):
+        # as with Gymnasium's vector environments, instance i is seeded with seed + i
+        for i in range(self.num_envs):
+            self._configure_episode(i, None if seed is None else seed + i)
+
+        next_shape = Actions.NEXT_SHAPE.value
+        self._exchange([self.envs[i]._create_action_data(next_shape) for i in range(self.num_envs)])
+
+        infos = {}
+        for i, env in enumerate(self.envs):
+            _, info = env._complete_reset()
+            infos = self._add_info(infos, info, i)
+
+        self._autoreset_envs[:] = False
+        return self._batch_observations(), infos
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+
+        # terminated environments are reset (i.e., sent a next_shape action) rather than stepped
+        for i in np.flatnonzero(self._autoreset_envs):
+            self._configure_episode(i)
+
+        next_shape = Actions.NEXT_SHAPE.value
+        self._exchange([env._create_action_data(next_shape if self._autoreset_envs[i] else int(actions[i]))
+                        for i, env in enumerate(self.envs)])
+
+        infos = {}
+        for i, env in enumerate(self.envs):
+            if self._autoreset_envs[i]:
+                _, info = env._complete_reset()
+                self._rewards[i] = 0.0
+                self._terminations[i] = False
+                self._truncations[i] = False
+            else:
+                _, reward, terminated, truncated, info = env._complete_step(int(actions[i]))
+                self._rewards[i] = reward
+                self._terminations[i] = terminated
+                self._truncations[i] = truncated
+
+            infos = self._add_info(infos, info, i)
+
+        self._autoreset_envs = np.logical_or(self._terminations, self._truncations)
+
+        return (self._batch_observations(), np.copy(self._rewards), np.copy(self._terminations),
+                np.copy(self._truncations), infos)
+
+    def _configure_episode(self, i, seed=None):
+        """Sends an instance the events that configure its next episode's problems (see
+        PolyominoEnvironment._get_episode_events)."""
+        env = self.envs[i]
+        for data in env._get_episode_events(seed):
+            env._send_event(data)
+            env._recv_reply()
+
+    def _register_reply_socket(self, i):
+        """Registers an instance's REQ socket with the poller, replacing its previous socket (which is replaced
+        whenever a reply is lost; see shared.ReliableRequester)."""
+        socket = self.envs[i].socket
+        previous = self._reply_sockets[i]
+        if socket is previous:
+            return
+
+        if previous is not None:
+            self.poller.unregister(previous)
+            del self._sockets[previous]
+
+        self.poller.register(socket, zmq.POLLIN)
+        self._sockets[socket] = (i, 'reply')
+        self._reply_sockets[i] = socket
+
+    def _exchange(self, requests):
+        """Submits one request per instance, then waits until every instance has acknowledged its request and
+        published a state that reflects it."""
+        for i, (env, data) in enumerate(zip(self.envs, requests)):
+            self._register_reply_socket(i)
+            env._submit(data)
+
+        pending_replies = set(range(self.num_envs))
+        pending_states = set(range(self.num_envs))
+        keyframes_requested = set()
+
+        # requests whose replies are late are resent on a new socket, and requests whose states are late are resent
+        # as nudges (see PolyominoEnvironment._nudge), up to each instance's RETRIES times
+        start_time = time.time()
+        end_time = start_time + (self.TIMEOUT / 1000)
+        reply_deadlines = [start_time + env.requester.timeout() / 1000 for env in self.envs]
+        state_deadlines = [None] * self.num_envs
+        resends = [0] * self.num_envs
+        nudges = [0] * self.num_envs
+
+        while pending_replies or pending_states:
+            now = time.time()
+            if now >= end_time:
+                # the requests are given up on (as by shared.ReliableRequester.recv), so that the pending instances'
+                # REQ sockets are replaced and can send the next step's requests
+                for i in pending_replies | pending_states:
+                    self.envs[i].requester.abandon()
+                    self._register_reply_socket(i)
+                raise TimeoutError(f"Timeout waiting for environments {sorted(pending_replies | pending_states)}")
+
+            retriable = [i for i in pending_replies if resends[i] < self.envs[i].RETRIES]
+            for i in retriable:
+                if now >= reply_deadlines[i]:
+                    self.envs[i].requester.resend()
+                    self._register_reply_socket(i)
+                    resends[i] += 1
+                    reply_deadlines[i] = now + self.envs[i].requester.timeout() / 1000
+
+            nudgeable = [i for i in pending_states - pending_replies if nudges[i] < self.envs[i].RETRIES]
+            for i in nudgeable:
+                if now >= state_deadlines[i]:
+                    env = self.envs[i]
+                    env.requester.send(env.requester.last_request)
+                    pending_replies.add(i)
+                    nudges[i] += 1
+                    reply_deadlines[i] = now + env.requester.timeout() / 1000
+                    state_deadlines[i] = now + env._wait_timeout() / 1000
+
+            wake_time = min([end_time] + [reply_deadlines[i] for i in retriable]
+                            + [state_deadlines[i] for i in nudgeable if i not in pending_replies])
+            events = dict(self.poller.poll(max(0, round((wake_time - now) * 1000))))
+
+            for socket in events:
+                i, kind = self._sockets[socket]
+                env = self.envs[i]
+
+                if kind == 'reply':
+                    env._recv_reply(flags=zmq.NOBLOCK)
+                    pending_replies.discard(i)
+                    if state_deadlines[i] is None:
+                        state_deadlines[i] = time.time() + env._wait_timeout() / 1000
+                else:
+                    # drain queued states, keeping the first one that reflects the instance's latest request (and
+                    # whose screenshots could be reconstructed, if they are delta-encoded)
+                    while True:
+                        try:
+                            topic, payload = env._recv_nowait()
+                        except zmq.Again:
+                            break
+
+                        if (i in pending_states and env._is_update(topic, payload, env.seqno)
+                                and not env.needs_keyframe):
+                            env._update_latest_state(payload)
+                            pending_states.discard(i)
+
+                # screenshots lost to a gap in delta-encoded states are restored by a keyframe, which is requested
+                # once the instance's REQ socket is free
+                if (i in pending_states and i not in pending_replies and i not in keyframes_requested
+                        and env.needs_keyframe):
+                    env._request_keyframe()
+                    pending_replies.add(i)
+                    keyframes_requested.add(i)
+                    reply_deadlines[i] = time.time() + env.requester.timeout() / 1000
+
+    def _batch_observations(self):
+        self._observations = concatenate(self.single_observation_space,
+                                         [env._get_observation() for env in self.envs], self._observations)
+        return deepcopy(self._observations) if self.COPY else self._observations
+
+    def close_extras(self, **kwargs):
+        for env in self.envs:
+            env.close()
+        self.context.term()
@@ -0,0 +1,208 @@
+import gymnasium as gym
+import numpy as np
+from gymnasium.vector.utils import batch_space, create_empty_array
+
+
+class BatchedObservationWrapper(gym.vector.VectorObservationWrapper):
+    """Base class of vector environment wrappers that preprocess a whole batch of observations at once.
+
+    Each element of the observation (the 'left' and 'right' viewports, or a single array once they are concatenated)
+    is transformed in one vectorized operation over the batch, and the result is written into a buffer that is
+    allocated once. Consequently, the returned observations are overwritten by the next step or reset and must be
+    copied if they are kept.
+
+    Subclasses implement _transform_space, which returns the transformed space of a single (unbatched) element, and
+    _transform, which writes an element's transformed batch into its buffer.
+    """
+
+    def __init__(self, env):
+        super().__init__(env)
+
+        space = env.single_observation_space
+        if isinstance(space, gym.spaces.Dict):
+            self.single_observation_space = gym.spaces.Dict(
+                {key: self._transform_space(subspace) for key, subspace in space.spaces.items()})
+        else:
+            self.single_observation_space = self._transform_space(space)
+        self.observation_space = batch_space(self.single_observation_space, self.num_envs)
+
+        self._buffers = create_empty_array(self.single_observation_space, n=self.num_envs, fn=np.zeros)
+        self._scratch = {}
+
+    def observations(self, observations):
+        if isinstance(self._buffers, dict):
+            for key, out in self._buffers.items():
+                self._transform(np.asarray(observations[key]), out, key)
+        else:
+            self._transform(np.asarray(observations), self._buffers, None)
+
+        return self._buffers
+
+    def _scratch_buffer(self, key, shape, dtype):
+        # intermediate results are also kept in preallocated buffers (one per element)
+        buffer = self._scratch.get(key)
+        if buffer is None:
+            buffer = self._scratch[key] = np.empty(shape, dtype=dtype)
+        return buffer
+
+    def _transform_space(self, space):
+        raise NotImplementedError
+
+    def _transform(self, observations, out, key):
+        raise NotImplementedError
+
+
+def _box(space, shape, low=None, high=None):
+    low = np.min(space.low) if low is None else low
+    high = np.max(space.high) if high is None else high
+    return gym.spaces.Box(low=low, high=high, shape=shape, dtype=space.dtype)
+
+
+class DownsampleObservation(BatchedObservationWrapper):
+    """Downsamples (128 x 128) screenshots by area averaging, e.g., to 64 x 64 or 32 x 32.
+
+    Args:
+        env (gym.vector.VectorEnv): The vector environment (e.g., a PolyominoVectorEnv).
+        SIZE (int): The height and width of the downsampled screenshots, which must divide the original's.
+    """
+
+    def __init__(self, env, SIZE = 64):
+        self.SIZE = SIZE
+        super().__init__(env)
+
+    def _transform_space(self, space):
+        height, width, channels = space.shape
+        if height % self.SIZE or width % self.SIZE:
+            raise ValueError(f"Size {self.SIZE} does not divide the observation size {height} x {width}")
+
+        return _box(space, (self.SIZE, self.SIZE, channels))
+
+    def _transform(self, observations, out, key):
+        n, height, width, channels = observations.shape
+        fy, fx = height // self.SIZE, width // self.SIZE
+
+        # each output pixel is the rounded mean of an fy x fx block of input pixels
+        sums = self._scratch_buffer(key, out.shape, np.uint32)
+        np.sum(observations.reshape(n, self.SIZE, fy, self.SIZE, fx, channels), axis=(2, 4), dtype=np.uint32,
+               out=sums)
+        sums += (fy * fx) // 2
+        sums //= fy * fx
+        np.copyto(out, sums, casting='unsafe')
+
+
+class CenterCropObservation(BatchedObservationWrapper):
+    """Crops screenshots to their central SIZE x SIZE pixels.
+
+    Args:
+        env (gym.vector.VectorEnv): The vector environment.
+        SIZE (int): The height and width of the cropped screenshots.
+    """
+
+    def __init__(self, env, SIZE = 96):
+        self.SIZE = SIZE
+        super().__init__(env)
+
+    def _transform_space(self, space):
+        height, width, channels = space.shape
+        if self.SIZE > min(height, width):
+            raise ValueError(f"Crop size {self.SIZE} exceeds the observation size {height} x {width}")
+
+        return _box(space, (self.SIZE, self.SIZE, channels))
+
+    def _transform(self, observations, out, key):
+        top = (observations.shape[1] - self.SIZE) // 2
+        left = (observations.shape[2] - self.SIZE) // 2
+        np.copyto(out, observations[:, top:top + self.SIZE, left:left + self.SIZE])
+
+
+class ThresholdObservation(BatchedObservationWrapper):
+    """Binarizes screenshots: pixels at or above THRESHOLD become HIGH and all others 0.
+
+    Args:
+        env (gym.vector.VectorEnv): The vector environment.
+        THRESHOLD (int): The smallest pixel value that is set to HIGH.
+        HIGH (int): The value of pixels at or above the threshold (e.g., 1 for {0, 1} observations).
+    """
+
+    def __init__(self, env, THRESHOLD = 128, HIGH = 255):
+        self.THRESHOLD = THRESHOLD
+        self.HIGH = HIGH
+        super().__init__(env)
+
+    def _transform_space(self, space):
+        return _box(space, space.shape, low=0, high=self.HIGH)
+
+    def _transform(self, observations, out, key):
+        mask = self._scratch_buffer(key, out.shape, np.bool_)
+        np.greater_equal(observations, self.THRESHOLD, out=mask)
+        np.multiply(mask, out.dtype.type(self.HIGH), out=out)
+
+
+class ConcatViewports(BatchedObservationWrapper):
+    """Concatenates the 'left' and 'right' screenshots along their channel axis into a single array observation
+    (e.g., of shape (128, 128, 2)), with the left (reference) viewport first."""
+
+    KEYS = ('left', 'right')
+
+    def __init__(self, env):
+        if not isinstance(env.single_observation_space, gym.spaces.Dict):
+            raise ValueError("ConcatViewports requires 'left' and 'right' observations")
+
+        # the element-wise base class is bypassed: the two viewports are combined into one array
+        gym.vector.VectorObservationWrapper.__init__(self, env)
+
+        left, right = (env.single_observation_space[key] for key in self.KEYS)
+        shape = (*left.shape[:-1], left.shape[-1] + right.shape[-1])
+        self.single_observation_space = gym.spaces.Box(low=min(np.min(left.low), np.min(right.low)),
+                                                       high=max(np.max(left.high), np.max(right.high)),
+                                                       shape=shape, dtype=left.dtype)
+        self.observation_space = batch_space(self.single_observation_space, self.num_envs)
+
+        self._buffers = create_empty_array(self.single_observation_space, n=self.num_envs, fn=np.zeros)
+        self._scratch = {}
+
+    def observations(self, observations):
+        np.concatenate([np.asarray(observations[key]) for key in self.KEYS], axis=-1, out=self._buffers)
+        return self._buffers
+
+
+class FrameStackObservation(BatchedObservationWrapper):
+    """Stacks each sub-environment's last STACK observations along a new axis (after the batch axis), oldest first.
+
+    After a reset (including a sub-environment's next-step autoreset), the stack is filled with the first
+    observation.
+
+    Args:
+        env (gym.vector.VectorEnv): The vector environment.
+        STACK (int): The number of stacked observations.
+    """
+
+    def __init__(self, env, STACK = 4):
+        self.STACK = STACK
+        super().__init__(env)
+
+        # the sub-environments whose stacks are refilled by the next observation
+        self._reset_mask = np.ones(self.num_envs, dtype=np.bool_)
+
+    def _transform_space(self, space):
+        return gym.spaces.Box(low=np.broadcast_to(space.low, (self.STACK, *space.shape)),
+                              high=np.broadcast_to(space.high, (self.STACK, *space.shape)),
+                              shape=(self.STACK, *space.shape), dtype=space.dtype)
+
+    def _transform(self, observations, out, key):
+        out[:, :-1] = out[:, 1:]
+        out[:, -1] = observations
+
+        if self._reset_mask.any():
+            out[self._reset_mask] = observations[self._reset_mask][:, np.newaxis]
+
+    def reset(self, *, seed=None, options=None):
+        self._reset_mask[:] = True
+        return super().reset(seed=seed, options=options)
+
+    def step(self, actions):
+        observations, rewards, terminations, truncations, infos = super().step(actions)
+
+        # with next-step autoreset, sub-environments that terminated return their reset observation on the next step
+        np.logical_or(terminations, truncations, out=self._reset_mask)
+        return observations, rewards, terminations, truncations, infos
@@ -1,6 +1,9 @@
 import argparse
+import hashlib
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import numpy as np
@@ -8,20 +11,46 @@ from PIL import Image
 
 from shared import DEFAULT_STATE_PORT
 from shared import STATE_TOPIC
+from shared import add_batch_size_arg
 from shared import add_host_arg
 from shared import add_port_arg
 from shared import add_timeout_arg
 from shared import add_verbose_arg
 from shared import get_state_subscriber
-from shared import receive
-from shared import reset_shutdown_timer
-from shared import shutdown_event
+from shared.codec import MessageCodec
+from shared.delta import FrameReconstructor
+from shared.dispatch import Dispatcher
+from shared.stream import StreamRunner
 
 # Directory where images will be saved
 DEFAULT_SAVE_PATH = Path('local/save/images')
 
 IMAGE_DIMENSIONS = (128, 128)
 
+VIEWPORT_CHOICES = {
+    'right': ('right_viewport',),
+    'left': ('left_viewport',),
+    'both': ('left_viewport', 'right_viewport'),
+}
+
+# the state message attributes (see shared.codec.StateMessage) of the viewports
+VIEWPORT_ATTRIBUTES = {
+    'left_viewport': 'left',
+    'right_viewport': 'right',
+}
+
+# right viewport images are saved under the save path's shape directories and left viewport images under this
+# subdirectory's (so that both keep the polyomino_<time>.png naming)
+LEFT_VIEWPORT_SUBDIR = 'left'
+
+DEFAULT_WORKERS = 4
+
+# maximum number of frames waiting to be written; frames received while the queue is full are dropped
+DEFAULT_QUEUE_SIZE = 64
+
+# outcomes of submitting a screenshot to the writer
+QUEUED, DUPLICATE, DROPPED = 'queued', 'duplicate', 'dropped'
+
 
 def parse_args():
     """ Parses command line arguments. """
@@ -32,6 +61,7 @@ def parse_args():
     add_port_arg(parser, default_port=DEFAULT_STATE_PORT)
     add_verbose_arg(parser)
     add_timeout_arg(parser)
+    add_batch_size_arg(parser)
 
     parser.add_argument(
         "--savepath",
@@ -40,74 +70,184 @@ def parse_args():
         help=f"Path to the directory where images will be saved (default: '{DEFAULT_SAVE_PATH}').",
         default=DEFAULT_SAVE_PATH
     )
+    parser.add_argument(
+        "--viewports",
+        choices=VIEWPORT_CHOICES.keys(),
+        required=False,
+        help="the viewport(s) to capture (default: 'right').",
+        default='right'
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        required=False,
+        help=f"the number of threads that encode and write images (default: {DEFAULT_WORKERS}).",
+        default=DEFAULT_WORKERS
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        required=False,
+        help=f"the maximum number of images waiting to be written before frames are dropped "
+             f"(default: {DEFAULT_QUEUE_SIZE}).",
+        default=DEFAULT_QUEUE_SIZE
+    )
 
     return parser.parse_args()
 
 
-def extract_time(payload):
-    return payload['header']['time']
+def extract_time(message):
+    return message.time
 
 
 def get_screenshot(viewport_data):
-    return np.array(viewport_data['screenshot'])
+    return np.asarray(viewport_data.screenshot, dtype=np.uint8)
+
 
+def get_screenshot_filepath(basedir, message, viewport_data, extension, viewport='right_viewport'):
+    if viewport == 'left_viewport':
+        basedir = Path(basedir) / LEFT_VIEWPORT_SUBDIR
 
-def get_screenshot_filepath(basedir, payload, viewport_data, extension):
-    path = Path(f'{basedir}/{viewport_data["shape"]}')
-    filename = f'polyomino_{extract_time(payload)}.{extension}'
+    path = Path(f'{basedir}/{viewport_data.shape}')
+    filename = f'polyomino_{extract_time(message)}.{extension}'
 
     return path / filename
 
 
 def save_screenshot(data, filepath):
-    array = np.array(data, dtype=np.uint8)
+    array = np.asarray(data, dtype=np.uint8)
     array = np.reshape(array, IMAGE_DIMENSIONS)
 
     img = Image.fromarray(array, mode='L')
+    img.save(filepath)
 
-    parent_dir = filepath.parent
-    if not parent_dir.exists():
-        print('creating path: ', str(parent_dir), flush=True)
-        parent_dir.mkdir(parents=True)
 
-    img.save(filepath)
+class ScreenshotWriter:
+    """ Encodes and writes screenshots on a bounded pool of worker threads.
+
+    Frames identical to their viewport's previous frame (e.g., the publisher's periodic re-sends of an unchanged
+    state) are skipped, and frames submitted while the queue is full are dropped (and counted) rather than blocking
+    the receive loop, which would otherwise let the subscriber's queue overflow silently. (PIL releases the GIL
+    while compressing, so the workers encode concurrently with the receive loop.)
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-writer')
+        self.slots = threading.BoundedSemaphore(queue_size)
+
+        self.last_digests = {}
+        self.created_dirs = set()
+        self.lock = threading.Lock()
+
+        self.saved = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, viewport, screenshot, filepath):
+        """ Queues a screenshot to be written.
+
+        Returns:
+            str: QUEUED, DUPLICATE, or DROPPED.
+        """
+        digest = hashlib.blake2b(screenshot, digest_size=16).digest()
+        if self.last_digests.get(viewport) == digest:
+            self.duplicates += 1
+            return DUPLICATE
+
+        if not self.slots.acquire(blocking=False):
+            self.dropped += 1
+            return DROPPED
+
+        # the digest is only recorded for queued frames, so a dropped frame's successor is not mistaken for a duplicate
+        self.last_digests[viewport] = digest
+        self.executor.submit(self._write, screenshot, filepath)
+        return QUEUED
+
+    def _write(self, screenshot, filepath):
+        try:
+            # directories are created once rather than checked for every frame
+            parent_dir = filepath.parent
+            if parent_dir not in self.created_dirs:
+                print('creating path: ', str(parent_dir), flush=True)
+                parent_dir.mkdir(parents=True, exist_ok=True)
+                self.created_dirs.add(parent_dir)
+
+            save_screenshot(screenshot, filepath)
+            with self.lock:
+                self.saved += 1
+        except Exception as e:
+            with self.lock:
+                self.failed += 1
+            print(f'Failed to save {filepath}: {e}', file=sys.stderr, flush=True)
+        finally:
+            self.slots.release()
+
+    def close(self):
+        """ Waits for queued screenshots to be written. """
+        self.executor.shutdown(wait=True)
+
+    def report(self):
+        return (f'Saved: {self.saved}, Duplicates skipped: {self.duplicates}, Dropped (writers behind): '
+                f'{self.dropped}, Failed: {self.failed}')
 
 
 def main():
     """ Main entry point for the script. """
+    writer = None
+    runner = None
     try:
         args = parse_args()
         connection = get_state_subscriber(
             host=args.host, port=args.port, topic=STATE_TOPIC)
 
-        timer = reset_shutdown_timer(args.timeout)
+        writer = ScreenshotWriter(workers=args.workers, queue_size=args.queue_size)
+        viewports = VIEWPORT_CHOICES[args.viewports]
 
-        # Loop until timeout or keyboard interrupt
-        while not shutdown_event.is_set():
-            topic, payload = receive(connection)
+        # rebuilds full screenshots from delta-encoded states
+        dispatcher = Dispatcher(MessageCodec(reconstructor=FrameReconstructor()))
+
+        @dispatcher.on(STATE_TOPIC)
+        def capture(message):
+            header = {'seqno': message.seqno, 'time': message.time}
+            for viewport in viewports:
+                viewport_data = getattr(message, VIEWPORT_ATTRIBUTES[viewport])
+                if viewport_data.screenshot is None:
+                    # a delta-encoded screenshot that cannot be reconstructed until the next keyframe
+                    print(f'Image received: {header}. Missing base frame; not saved.', flush=True)
+                    continue
 
-            if payload:
-                viewport_data = payload['data']['right_viewport']
                 filepath = get_screenshot_filepath(
-                    args.savepath, payload, viewport_data, 'png')
+                    args.savepath, message, viewport_data, 'png', viewport)
 
-                screenshot = get_screenshot(viewport_data)
-                save_screenshot(screenshot, filepath)
+                outcome = writer.submit(viewport, get_screenshot(viewport_data), filepath)
+                if outcome == QUEUED:
+                    print(f'Image received: {header}. Saving as {filepath}.', flush=True)
+                elif outcome == DUPLICATE:
+                    print(f'Image received: {header}. Unchanged; not saved.', flush=True)
+                else:
+                    print(f'Image received: {header}. Dropped (writers behind); '
+                          f'{writer.dropped} dropped in total.', flush=True)
 
-                print(f'Image received: {payload["header"]}. Saved as {filepath}.', flush=True)
+            if args.verbose:
+                print(f'Shape: {message.right.shape}.', flush=True)
+                print(f'Transformations: {message.transformations}.', flush=True)
 
-                timer = reset_shutdown_timer(args.timeout, timer)
+        runner = StreamRunner(connection, dispatcher.dispatch, timeout=args.timeout, batch_size=args.batch_size,
+                              verbose=args.verbose)
 
-                if args.verbose:
-                    print(f'Shape: {payload["data"]["right_viewport"]["shape"]}.', flush=True)
-                    print(f'Transformations: {payload["data"]["transformations"]}.', flush=True)
-            else:
-                if args.verbose:
-                    print("Waiting for messages...", flush=True)
+        # Loop until timeout or keyboard interrupt
+        runner.run()
 
     except KeyboardInterrupt:
         print("Interrupted by user. Shutting down...", flush=True)
 
+    if runner is not None:
+        print(runner.report(), flush=True)
+    if writer is not None:
+        writer.close()
+        print(writer.report(), flush=True)
+
     try:
         sys.exit(1)
     except SystemExit:
@@ -4,16 +4,28 @@ import sys
 from datetime import datetime
 
 import matplotlib.pyplot as plt
+import numpy as np
 
+from shared import ACTION_REQ_TOPIC
 from shared import DEFAULT_STATE_PORT
+from shared import SELECTION_RESULT_TOPIC
+from shared import STATE_TOPIC
+from shared import add_batch_size_arg
 from shared import add_host_arg
 from shared import add_port_arg
 from shared import add_timeout_arg
 from shared import add_verbose_arg
 from shared import get_state_subscriber
-from shared import receive
-from shared import reset_shutdown_timer
-from shared import shutdown_event
+from shared.codec import Transformations
+from shared.codec import Viewport
+from shared.codec import as_message
+from shared.codec import clear_screenshots
+from shared.dispatch import Dispatcher
+from shared.stream import StreamRunner
+from shared.trials import DIFFERENT
+from shared.trials import SAME
+from shared.trials import TRANSFORMATION_BINS
+from shared.trials import TrialStore
 
 """ Sample Responses
 /polyomino/action_requested {'data': {'action': 'select_same_shape', 'seqno': 1}, 'header': {'seqno': 6, 'time': 1751298299749}}
@@ -28,6 +40,9 @@ accuracy for each class
 confusion matrix
 '''
 
+# the 3D transformation plot shows a random sample of at most this many trials
+DEFAULT_MAX_PLOT_POINTS = 100000
+
 
 def parse_args():
     """Parses command line arguments.
@@ -42,13 +57,32 @@ def parse_args():
     add_host_arg(parser)
     add_port_arg(parser, default_port=DEFAULT_STATE_PORT)
     add_timeout_arg(parser)
+    add_batch_size_arg(parser)
     add_verbose_arg(parser)
 
+    parser.add_argument(
+        "--spill-path",
+        type=str,
+        required=False,
+        default=None,
+        help="a file that older trials are moved to, keeping memory use bounded in long sessions",
+    )
+    parser.add_argument(
+        "--max-plot-points",
+        type=int,
+        required=False,
+        default=DEFAULT_MAX_PLOT_POINTS,
+        help=f"the maximum number of trials shown in the 3D transformation plot (default: {DEFAULT_MAX_PLOT_POINTS})",
+    )
+
     return parser.parse_args()
 
 
 class PolyominoMetrics:
-    def __init__(self):
+    def __init__(self, spill_path=None, verbose=True):
+        # whether each processed message is reported on stdout
+        self.verbose = verbose
+
         self.pending_actions = set()
         self.last_state = {
             'left_viewport': None,
@@ -64,78 +98,118 @@ class PolyominoMetrics:
             'same_shape_attempts': 0,
             'same_shape_correct': 0,
             'different_shape_attempts': 0,
-            'different_shape_correct': 0,
-            'transformations': [],
-            'results': [],
-            'timestamps': []
+            'different_shape_correct': 0
         }
 
-        self.points = []
+        # one row per selection (see shared.trials.TRIAL_DTYPE)
+        self.trials = TrialStore(spill_path=spill_path)
+        self.pending_selection = None
 
         self.requested_actions = 0
         self.completed_actions = 0
 
-    def process_action_request(self, payload):
+    def handlers(self):
+        """Returns the message handlers by topic, none of which needs screenshots"""
+        return {
+            ACTION_REQ_TOPIC: self.process_action_request,
+            SELECTION_RESULT_TOPIC: self.process_selection_result,
+            STATE_TOPIC: self.process_last_state,
+        }
+
+    def register(self, dispatcher):
+        """Registers the message handlers with a dispatcher (see shared.dispatch.Dispatcher)"""
+        for topic, handler in self.handlers().items():
+            dispatcher.register(topic, handler, screenshots=False)
+
+    def process_message(self, topic, payload):
+        """Process a decoded message (e.g., from a recording) according to its topic"""
+        handler = self.handlers().get(topic)
+        if handler is not None:
+            clear_screenshots(payload)
+            handler(as_message(topic, payload))
+
+    def process_action_request(self, message):
         """Process incoming action request"""
-        action = payload['data']['action']
-        seqno = payload['data']['seqno']
-        timestamp = payload['header']['time']
+        action = message.action
+        seqno = message.action_seqno
+        timestamp = message.time
 
-        print(f"Action requested: {action}, Seqno: {seqno}")
+        if self.verbose:
+            print(f"Action requested: {action}, Seqno: {seqno}")
         self.pending_actions.add(seqno)
         self.requested_actions += 1
 
         # update total attempts if it's a selection action
         if "select_" in action:
+            self.pending_selection = (seqno, "same_shape" in action, timestamp)
+
             self.performance_data['total_attempts'] += 1
             if "same_shape" in action:
                 self.performance_data['same_shape_attempts'] += 1
             elif "different_shape" in action:
                 self.performance_data['different_shape_attempts'] += 1
 
-    def process_selection_result(self, payload):
+    def process_selection_result(self, message):
         """Process selection result"""
-        result = payload['data']['result']
-        seqno = payload['header']['seqno']
-
-        # timestamp = payload['header']['time']
+        result = message.result
+        seqno = message.seqno
+        timestamp = message.time
 
         if result:
             self.performance_data['correct_answers'] += 1
 
-        self.points.append((self.last_state['transformations']['rotation_active'],
-                            self.last_state['transformations']['scale'],
-                            self.last_state['transformations']['translation'],
-                            result))
+        self.record_trial(result, timestamp)
 
         if self.last_state['same'] is not None:
             if self.last_state['same']:
                 if result:
                     self.performance_data['same_shape_correct'] += 1
-                else:
+                elif self.verbose:
                     print(f"Incorrect selection for same shape at seqno {seqno}")
             else:
                 if not result:
                     self.performance_data['different_shape_correct'] += 1
-                else:
+                elif self.verbose:
                     print(f"Incorrect selection for different shape at seqno {seqno}")
 
-    def process_last_state(self, payload):
+    def record_trial(self, result, timestamp):
+        """Adds a selection's outcome, with the state it was made in, to the trial store"""
+        action_seqno, selected_same, request_time = self.pending_selection or (-1, False, None)
+        self.pending_selection = None
+
+        viewport = self.last_state['right_viewport'] or Viewport(shape=-1, id=-1)
+        transformations = self.last_state['transformations'] or Transformations(np.nan, np.nan, np.nan)
+
+        self.trials.append(
+            seqno=action_seqno,
+            shape=viewport.shape,
+            id=viewport.id,
+            same=self.last_state['same'],
+            selected_same=selected_same,
+            result=result,
+            rotation=transformations.rotation_active,
+            scale=transformations.scale,
+            translation=transformations.translation,
+            latency=timestamp - request_time if request_time is not None else np.nan)
+
+    def process_last_state(self, message):
         """Process game state update"""
-        last_action_seqno = payload['data']['last_action_seqno']
-        left_viewport = payload['data']['left_viewport']
-        right_viewport = payload['data']['right_viewport']
-        mode = payload['data']['mode']
-        same = payload['data']['same']
-        transformations = payload['data']['transformations']
-        timestamp = payload['header']['time']
+        last_action_seqno = message.last_action_seqno
+        left_viewport = message.left
+        right_viewport = message.right
+        mode = message.mode
+        same = message.same
+        transformations = message.transformations
+        timestamp = message.time
 
-        print(f"State update: Action {last_action_seqno}, Same: {same}, Transformations: {transformations}")
+        if self.verbose:
+            print(f"State update: Action {last_action_seqno}, Same: {same}, Transformations: {transformations}")
 
         if last_action_seqno in self.pending_actions:
             self.pending_actions.remove(last_action_seqno)
             self.completed_actions += 1
-            print(f"Action {last_action_seqno} completed.")
+            if self.verbose:
+                print(f"Action {last_action_seqno} completed.")
 
         # Store state data
         state_data = {
@@ -150,6 +224,24 @@ class PolyominoMetrics:
         }
         self.last_state.update(state_data)
 
+    def summary(self):
+        """Returns the metrics' mergeable counters (i.e., without the stored trials)"""
+        return {
+            'performance_data': dict(self.performance_data),
+            'statistics': self.trials.statistics,
+        }
+
+    def merge(self, summary):
+        """Adds the counters of another session's (or shard's) summary to these metrics"""
+        for key, value in summary['performance_data'].items():
+            self.performance_data[key] += value
+
+        self.trials.statistics.merge(summary['statistics'])
+
+    def to_dict(self):
+        """Returns the calculated statistics and trial breakdowns as a JSON-serializable dictionary"""
+        return {**self.calculate_statistics(), **self.trials.statistics.to_dict()}
+
     def calculate_statistics(self):
         """Calculate comprehensive performance statistics"""
         data = self.performance_data
@@ -184,20 +276,23 @@ class PolyominoMetrics:
             'different_shape_correct': data['different_shape_correct']
         }
 
-    def plot_3d_transformations(self, save_path=None):
+    def plot_3d_transformations(self, save_path=None, max_points=DEFAULT_MAX_PLOT_POINTS):
         fig = plt.figure()
         ax = fig.add_subplot(111, projection='3d')
 
-        for (rotation, scale, translation, result) in self.points:
-            color = 'green' if result else 'red'
-            ax.scatter(rotation, scale, translation, c=color, alpha=0.5)
+        # one scatter call per class (rather than per point), over a bounded sample of the trials
+        trials = self.trials.sample(max_points)
+        for result, color, label in ((True, 'green', 'Correct'), (False, 'red', 'Incorrect')):
+            selected = trials[trials['result'] == result]
+            ax.scatter(selected['rotation'], selected['scale'], selected['translation'], c=color, alpha=0.5,
+                       label=label)
 
         ax.set_title('3D Transformations of Polyomino Shapes')
         ax.set_xlabel('Rotation (degrees)')
         ax.set_ylabel('Scale')
         ax.set_zlabel('Translation (units)')
         ax.grid(True)
-        ax.legend(['Correct', 'Incorrect'])
+        ax.legend()
         plt.tight_layout()
 
         if save_path:
@@ -239,6 +334,14 @@ class PolyominoMetrics:
         ax3.set_ylabel('Number of Attempts')
         ax3.set_title('Distribution of Attempts')
 
+        # Per-shape accuracy
+        shapes, shape_accuracies = self.trials.statistics.per_shape_accuracy()
+        ax4.bar([str(shape) for shape in shapes], shape_accuracies * 100, color='purple')
+        ax4.set_xlabel('Shape')
+        ax4.set_ylabel('Accuracy (%)')
+        ax4.set_title('Accuracy by Shape')
+        ax4.set_ylim(0, 100)
+
         plt.tight_layout()
 
         if save_path:
@@ -267,57 +370,71 @@ class PolyominoMetrics:
         print(f"Different Shape Correct: {stats['different_shape_correct']}")
         print(f"Different Shape Accuracy: {stats['different_shape_accuracy']:.2f}%")
         print("\n" + "-" * 30)
+        print("ACCURACY BY SHAPE:")
+        print("-" * 30)
+        statistics = self.trials.statistics
+        shapes, shape_accuracies = statistics.per_shape_accuracy()
+        for shape, accuracy in zip(shapes, shape_accuracies):
+            print(f"Shape {shape}: {accuracy * 100:.2f}% ({statistics.shape_attempts[shape]} attempts)")
+        print("\n" + "-" * 30)
+        print("ACCURACY BY TRANSFORMATION:")
+        print("-" * 30)
+        for name in TRANSFORMATION_BINS:
+            edges, attempts, accuracies = statistics.binned_accuracy(name)
+            for low, high, n, accuracy in zip(edges[:-1], edges[1:], attempts, accuracies):
+                if n:
+                    print(f"{name.capitalize()} [{low:g}, {high:g}): {accuracy * 100:.2f}% ({n} attempts)")
+        print("\n" + "-" * 30)
+        print("CONFUSION MATRIX (actual vs. selected):")
+        print("-" * 30)
+        confusion = statistics.confusion
+        print(f"{'':>12}{'Same':>12}{'Different':>12}")
+        print(f"{'Same':>12}{confusion[SAME, SAME]:>12}{confusion[SAME, DIFFERENT]:>12}")
+        print(f"{'Different':>12}{confusion[DIFFERENT, SAME]:>12}{confusion[DIFFERENT, DIFFERENT]:>12}")
+        print("\n" + "-" * 30)
 
 
 def main():
     args = parse_args()
 
-    metrics = PolyominoMetrics()
+    metrics = PolyominoMetrics(spill_path=args.spill_path)
     connection = get_state_subscriber(host=args.host, port=args.port)
 
-    timer = reset_shutdown_timer(args.timeout)
+    # messages are decoded without their screenshots, which the metrics do not use
+    dispatcher = Dispatcher()
+    metrics.register(dispatcher)
+
+    @dispatcher.on(STATE_TOPIC, screenshots=False)
+    def print_update(message):
+        # Print periodic updates
+        if metrics.performance_data['total_attempts'] > 0 and \
+                metrics.performance_data['total_attempts'] % 10 == 0:
+            print(
+                f"\n--- Performance Update (After {metrics.performance_data['total_attempts']} attempts) ---")
+            stats = metrics.calculate_statistics()
+            print(f"Current Accuracy: {stats['overall_accuracy']:.2f}%")
+            print(f"Same Shape Accuracy: {stats['same_shape_accuracy']:.2f}%")
+            print(f"Different Shape Accuracy: {stats['different_shape_accuracy']:.2f}%")
+            print("-" * 50)
+
+    runner = StreamRunner(connection, dispatcher.dispatch, timeout=args.timeout, batch_size=args.batch_size,
+                          verbose=args.verbose)
 
     try:
         # Loop until timeout or keyboard interrupt
-        while not shutdown_event.is_set():
-            topic, payload = receive(connection)
-
-            if payload:
-                if "action_requested" in topic:
-                    metrics.process_action_request(payload)
-
-                elif "selection-result" in topic:
-                    metrics.process_selection_result(payload)
-
-                elif "state" in topic:
-                    metrics.process_last_state(payload)
-
-                    # Print periodic updates
-                    if metrics.performance_data['total_attempts'] > 0 and \
-                            metrics.performance_data['total_attempts'] % 10 == 0:
-                        print(
-                            f"\n--- Performance Update (After {metrics.performance_data['total_attempts']} attempts) ---")
-                        stats = metrics.calculate_statistics()
-                        print(f"Current Accuracy: {stats['overall_accuracy']:.2f}%")
-                        print(f"Same Shape Accuracy: {stats['same_shape_accuracy']:.2f}%")
-                        print(f"Different Shape Accuracy: {stats['different_shape_accuracy']:.2f}%")
-                        print("-" * 50)
-
-                timer = reset_shutdown_timer(args.timeout, timer)
-
-            else:
-                if args.verbose:
-                    print("Waiting for messages...", flush=True)
+        runner.run()
 
     except KeyboardInterrupt:
         pass
 
+    print(runner.report(), flush=True)
+
     # Create visualizations
     if metrics.performance_data['total_attempts'] > 0:
         print("Creating performance visualizations...")
         metrics.print_detailed_report()
         metrics.plot_performance_summary(save_path="performance_summary.png")
-        metrics.plot_3d_transformations(save_path="3d_transformations.png")
+        metrics.plot_3d_transformations(save_path="3d_transformations.png", max_points=args.max_plot_points)
 
     try:
         sys.exit(1)
@@ -0,0 +1,135 @@
+#
+# Polyomino Imagery Environment Batch Metrics Calculator
+#
+# Description: Calculates the metrics of many recorded sessions (see scripts/recorder.py) in parallel, one session
+#              per worker process, and merges them into per-session and overall reports
+# Dependencies: NumPy, Matplotlib (imported by metrics.py)
+#
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+from pathlib import Path
+
+from metrics import PolyominoMetrics
+from shared.recording import INDEX_FILE
+from shared.recording import Recording
+
+
+def parse_args():
+    """Parses command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Polyomino Imagery Environment - Batch Metrics Calculator"
+    )
+
+    parser.add_argument(
+        "recordings",
+        type=Path,
+        nargs="+",
+        help="recording directories, or directories that are searched (recursively) for recordings",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        required=False,
+        default=os.cpu_count(),
+        help="the number of worker processes (default: the number of CPUs)",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        required=False,
+        default=None,
+        help="write the per-session and overall statistics as JSON to this file",
+    )
+    parser.add_argument(
+        "--per-session",
+        action="store_true",
+        required=False,
+        help="print a detailed report for every session (in addition to the overall report)",
+    )
+
+    return parser.parse_args()
+
+
+def find_recordings(paths):
+    """Expands the given paths into the recording directories they contain.
+
+    Returns:
+        list: The recording directories (sorted, without duplicates).
+    """
+    recordings = set()
+    for path in paths:
+        if (path / INDEX_FILE).exists():
+            recordings.add(path)
+        else:
+            recordings.update(index.parent for index in path.rglob(INDEX_FILE))
+
+    return sorted(recordings)
+
+
+def process_recording(path):
+    """Calculates one session's metrics (the map step).
+
+    Returns:
+        tuple: The recording's path and its metrics' mergeable summary.
+    """
+    metrics = PolyominoMetrics(verbose=False)
+    with Recording(path) as recording:
+        for topic, payload in recording.messages():
+            metrics.process_message(topic, payload)
+
+    return path, metrics.summary()
+
+
+def main():
+    """Main entry point for the script."""
+    args = parse_args()
+
+    recordings = find_recordings(args.recordings)
+    if not recordings:
+        print("No recordings found.", flush=True)
+        return
+
+    print(f"Processing {len(recordings)} recordings with {args.workers} workers...", flush=True)
+
+    overall = PolyominoMetrics(verbose=False)
+    sessions = {}
+
+    # the reduce step: partial counters are merged as sessions complete
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(process_recording, path) for path in recordings]
+        for future in as_completed(futures):
+            path, summary = future.result()
+
+            session = PolyominoMetrics(verbose=False)
+            session.merge(summary)
+            sessions[str(path)] = session
+
+            overall.merge(summary)
+            print(f"Processed {path} ({summary['performance_data']['total_attempts']} attempts)", flush=True)
+
+    if args.per_session:
+        for path, session in sorted(sessions.items()):
+            print(f"\nSESSION: {path}")
+            session.print_detailed_report()
+
+    print("\nOVERALL")
+    overall.print_detailed_report()
+
+    if args.output:
+        report = {
+            "overall": overall.to_dict(),
+            "sessions": {path: session.to_dict() for path, session in sorted(sessions.items())},
+        }
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
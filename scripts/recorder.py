@@ -0,0 +1,91 @@
+#
+# Polyomino Imagery Environment Recorder
+#
+# Description: Records every message published by the Polyomino Imagery Environment's state publisher (states,
+#              action requests, and selection results) to a recording directory that can be replayed later
+# Dependencies: PyZMQ (see https://pyzmq.readthedocs.io/en/latest/), NumPy
+#
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+from shared import DEFAULT_STATE_PORT
+from shared import add_batch_size_arg
+from shared import add_host_arg
+from shared import add_port_arg
+from shared import add_timeout_arg
+from shared import add_verbose_arg
+from shared import get_state_subscriber
+from shared.recording import RecordingWriter
+from shared.stream import StreamRunner
+
+# Directory where recordings are saved (one subdirectory per session)
+DEFAULT_SAVE_PATH = Path("local/save/recordings")
+
+
+def parse_args():
+    """Parses command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Polyomino Imagery Environment - Recorder"
+    )
+
+    add_host_arg(parser)
+    add_port_arg(parser, default_port=DEFAULT_STATE_PORT)
+    add_timeout_arg(parser)
+    add_batch_size_arg(parser)
+    add_verbose_arg(parser)
+
+    parser.add_argument(
+        "--savepath",
+        type=Path,
+        required=False,
+        default=None,
+        help=f"the recording directory (default: a new timestamped directory under '{DEFAULT_SAVE_PATH}')",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    """Main entry point for the script."""
+    args = parse_args()
+    connection = get_state_subscriber(host=args.host, port=args.port)
+
+    savepath = args.savepath or DEFAULT_SAVE_PATH / time.strftime("session_%Y%m%d_%H%M%S")
+    writer = RecordingWriter(savepath)
+    print(f"Recording to {savepath}", flush=True)
+
+    def record(frames):
+        writer.write(frames)
+        if args.verbose:
+            print(f"Recorded message {writer.count}", flush=True)
+
+    # buffered messages are written out while the publisher is idle
+    runner = StreamRunner(connection, record, timeout=args.timeout, batch_size=args.batch_size,
+                          on_idle=writer.flush, verbose=args.verbose)
+
+    try:
+        # Loop until timeout or keyboard interrupt
+        runner.run()
+
+    except KeyboardInterrupt:
+        print("Interrupted by user. Shutting down...", flush=True)
+
+    print(runner.report(), flush=True)
+    writer.close()
+    print(f"Recorded {writer.count} messages to {savepath}", flush=True)
+
+    try:
+        sys.exit(1)
+    except SystemExit:
+        os._exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#
+# Polyomino Imagery Environment Replayer
+#
+# Description: Publishes a recording (see scripts/recorder.py) in place of the Polyomino Imagery Environment's state
+#              publisher, so that its consumers (e.g., metrics.py and image_capture.py) can reprocess past sessions
+# Dependencies: PyZMQ (see https://pyzmq.readthedocs.io/en/latest/), NumPy
+#
+import argparse
+import time
+from pathlib import Path
+
+import zmq
+
+from shared import DEFAULT_STATE_PORT
+from shared import add_verbose_arg
+from shared.recording import Recording
+from shared.recording import replay
+
+# time allowed for subscribers to connect before the replay starts (messages published earlier are lost)
+DEFAULT_DELAY_MS = 1000
+
+
+def parse_args():
+    """Parses command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Polyomino Imagery Environment - Replayer"
+    )
+
+    parser.add_argument("recording", type=Path, help="the recording directory to replay")
+    parser.add_argument(
+        "--host",
+        type=str,
+        required=False,
+        default="*",
+        help="the address to publish on (default: all interfaces)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        required=False,
+        default=DEFAULT_STATE_PORT,
+        help=f"the port number to publish on (default: {DEFAULT_STATE_PORT})",
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        required=False,
+        default=1.0,
+        help="the replay speed relative to the original session; 0 replays as fast as possible (default: 1.0)",
+    )
+    parser.add_argument(
+        "--delay",
+        type=int,
+        required=False,
+        default=DEFAULT_DELAY_MS,
+        help=f"the time in milliseconds to wait for subscribers before replaying (default: {DEFAULT_DELAY_MS} ms)",
+    )
+    add_verbose_arg(parser)
+
+    return parser.parse_args()
+
+
+def main():
+    """Main entry point for the script."""
+    args = parse_args()
+
+    with Recording(args.recording) as recording:
+        socket = zmq.Context().socket(zmq.PUB)
+
+        # the whole recording is available up front, so messages are queued rather than dropped for slow subscribers
+        socket.setsockopt(zmq.SNDHWM, 0)
+        socket.bind(f"tcp://{args.host}:{args.port}")
+
+        if args.verbose:
+            print(f"Replaying {len(recording)} messages from {args.recording} on port {args.port}", flush=True)
+
+        time.sleep(args.delay / 1000)
+
+        try:
+            start = time.perf_counter()
+            count = replay(recording, socket, speed=args.speed)
+            print(f"Replayed {count} messages in {time.perf_counter() - start:.2f} seconds", flush=True)
+        except KeyboardInterrupt:
+            print("Interrupted by user. Shutting down...", flush=True)
+
+        # lets queued messages drain to subscribers before exiting
+        socket.close(linger=-1)
+
+
+if __name__ == "__main__":
+    main()
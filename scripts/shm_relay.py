@@ -0,0 +1,162 @@
+#
+# Polyomino Imagery Environment Shared-Memory Relay
+#
+# Description: Relays the Polyomino Imagery Environment's state publisher to same-host consumers, writing screenshots
+#              into a shared memory ring buffer (see shared/shm.py) and republishing messages that carry only the
+#              screenshots' slot references
+# Dependencies: PyZMQ (see https://pyzmq.readthedocs.io/en/latest/), NumPy
+#
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import zmq
+
+from shared import DEFAULT_STATE_PORT
+from shared import STATE_TOPIC
+from shared import VIEWPORTS
+from shared import add_batch_size_arg
+from shared import add_host_arg
+from shared import add_port_arg
+from shared import add_timeout_arg
+from shared import add_verbose_arg
+from shared import decode_message
+from shared import get_state_subscriber
+from shared import has_topic
+from shared.delta import FrameReconstructor
+from shared.shm import DEFAULT_SLOTS
+from shared.shm import FRAME_RING_KEY
+from shared.shm import FrameRing
+from shared.stream import StreamRunner
+
+# port that relayed messages are published on
+DEFAULT_RELAY_PORT = 10003
+
+# size in bytes of a 128 x 128 8-bit screenshot
+FRAME_SIZE = 128 * 128
+
+
+def parse_args():
+    """Parses command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Polyomino Imagery Environment - Shared-Memory Relay"
+    )
+
+    add_host_arg(parser)
+    add_port_arg(parser, default_port=DEFAULT_STATE_PORT)
+    add_timeout_arg(parser)
+    add_batch_size_arg(parser)
+    add_verbose_arg(parser)
+
+    parser.add_argument(
+        "--relay-port",
+        type=int,
+        required=False,
+        default=DEFAULT_RELAY_PORT,
+        help=f"the port number that relayed messages are published on (default: {DEFAULT_RELAY_PORT})",
+    )
+    parser.add_argument(
+        "--name",
+        type=str,
+        required=False,
+        default=None,
+        help="the shared memory block's name (default: polyomino-frames-<relay port>)",
+    )
+    parser.add_argument(
+        "--slots",
+        type=int,
+        required=False,
+        default=DEFAULT_SLOTS,
+        help=f"the number of screenshots the ring buffer holds (default: {DEFAULT_SLOTS})",
+    )
+
+    return parser.parse_args()
+
+
+class ShmRelay:
+    """Converts received state messages into messages whose screenshots are references into a FrameRing.
+
+    Screenshots that are unchanged from a viewport's previous state (i.e., delta-encoded as unchanged) keep their
+    slot rather than being written again.
+
+    Args:
+        ring (FrameRing): The ring that screenshots are written into.
+    """
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.reconstructor = FrameReconstructor()
+        self._last = dict.fromkeys(VIEWPORTS, (None, None))
+
+    def relay(self, frames):
+        """Returns the message frames to republish for a received message."""
+        if not has_topic(frames, STATE_TOPIC):
+            return frames
+
+        topic, payload = decode_message(frames)
+        payload = self.reconstructor.apply(payload)
+
+        # relayed screenshots are full frames (or None, if they were lost to a gap in delta-encoded states)
+        data = payload.get("data") or {}
+        data.pop("frame_seqno", None)
+
+        for viewport in VIEWPORTS:
+            viewport_data = data.get(viewport)
+            if not viewport_data or viewport_data.get("screenshot") is None:
+                continue
+
+            screenshot = viewport_data["screenshot"]
+            last_screenshot, reference = self._last[viewport]
+            if screenshot is not last_screenshot or not self.ring.is_current(*reference):
+                reference = self.ring.write(np.asarray(screenshot, dtype=np.uint8))
+                self._last[viewport] = (screenshot, reference)
+
+            viewport_data["screenshot"] = list(reference)
+
+        data[FRAME_RING_KEY] = self.ring.name
+        return [f"{topic} {json.dumps(payload)}".encode("utf-8")]
+
+
+def main():
+    """Main entry point for the script."""
+    args = parse_args()
+    connection = get_state_subscriber(host=args.host, port=args.port)
+
+    publisher = zmq.Context().socket(zmq.PUB)
+    publisher.bind(f"tcp://127.0.0.1:{args.relay_port}")
+
+    ring = FrameRing(args.name or f"polyomino-frames-{args.relay_port}", slots=args.slots, frame_size=FRAME_SIZE,
+                     create=True)
+    relay = ShmRelay(ring)
+    print(f"Relaying port {args.port} to port {args.relay_port} through shared memory block '{ring.name}'",
+          flush=True)
+
+    runner = StreamRunner(connection, lambda frames: publisher.send_multipart(relay.relay(frames)),
+                          timeout=args.timeout, batch_size=args.batch_size, verbose=args.verbose)
+
+    try:
+        # Loop until timeout or keyboard interrupt
+        runner.run()
+
+    except KeyboardInterrupt:
+        print("Interrupted by user. Shutting down...", flush=True)
+
+    print(runner.report(), flush=True)
+
+    publisher.close(linger=0)
+    ring.close()
+
+    try:
+        sys.exit(1)
+    except SystemExit:
+        os._exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,14 +10,14 @@ import sys
 
 from shared import DEFAULT_STATE_PORT
 from shared import STATE_TOPIC
+from shared import add_batch_size_arg
 from shared import add_host_arg
 from shared import add_port_arg
 from shared import add_timeout_arg
 from shared import add_verbose_arg
 from shared import get_state_subscriber
-from shared import receive
-from shared import reset_shutdown_timer
-from shared import shutdown_event
+from shared.dispatch import Dispatcher
+from shared.stream import StreamRunner
 
 
 def parse_args():
@@ -33,6 +33,7 @@ def parse_args():
     add_host_arg(parser)
     add_port_arg(parser, default_port=DEFAULT_STATE_PORT)
     add_timeout_arg(parser)
+    add_batch_size_arg(parser)
     add_verbose_arg(parser)
 
     return parser.parse_args()
@@ -44,23 +45,26 @@ def main():
     connection = get_state_subscriber(
         host=args.host, port=args.port, topic=STATE_TOPIC)
 
-    timer = reset_shutdown_timer(args.timeout)
+    # states are printed as typed messages (see shared.codec.StateMessage) without their screenshots, which are
+    # neither decoded nor printed (so delta-encoded states need no reconstructor)
+    dispatcher = Dispatcher()
+
+    @dispatcher.on(STATE_TOPIC, screenshots=False)
+    def print_state(message):
+        print(f"topic: {message.topic}; message: {message}", flush=True)
+
+    runner = StreamRunner(connection, dispatcher.dispatch, timeout=args.timeout, batch_size=args.batch_size,
+                          verbose=args.verbose)
 
     try:
         # Loop until timeout or keyboard interrupt
-        while not shutdown_event.is_set():
-            topic, payload = receive(connection)
-
-            if payload:
-                print(f"topic: {topic}; payload: {payload}", flush=True)
-                timer = reset_shutdown_timer(args.timeout, timer)
-            else:
-                if args.verbose:
-                    print("Waiting for messages...", flush=True)
+        runner.run()
 
     except KeyboardInterrupt:
         print("Interrupted by user. Shutting down...", flush=True)
 
+    print(runner.report(), flush=True)
+
     try:
         sys.exit(1)
     except SystemExit:
@@ -19,7 +19,7 @@ setup(
                 "software agents.",
     author="Sean Kugele",
     author_email="kugeles@rhodes.edu",
-    packages=find_packages(),
+    packages=find_packages(exclude=("benchmarks", "benchmarks.*", "tests", "tests.*")),
     install_requires=load_requirements("requirements.txt"),
     python_requires=">=3.11",
 )
@@ -1,9 +1,21 @@
 import json
+import re
 import sys
 import threading
 import time
+from collections import deque
 
+import numpy as np
 import zmq
+import zmq.asyncio
+
+from shared.latency import AdaptiveTimeout
+from shared.latency import LatencyTracker
+
+try:
+    import orjson
+except ImportError:  # orjson is optional (see JSON_DECODERS)
+    orjson = None
 
 # blocking wait interval per attempt at receiving a message
 RECEIVE_WAIT_MS = 1000  # in milliseconds
@@ -12,14 +24,34 @@ DEFAULT_HOST = "localhost"
 DEFAULT_STATE_PORT = 10001
 DEFAULT_ACTION_PORT = 10002
 
+# number of times a request whose reply is not received is resent (on a new socket) before the request fails
+DEFAULT_REQUEST_RETRIES = 3
+
 # script terminates if no message is received from the GAB state publisher within this time duration
 DEFAULT_SHUTDOWN_TIMEOUT_MS = 25000  # in milliseconds
 
+# the maximum number of queued messages a script handles per wakeup (see shared.stream.StreamRunner)
+DEFAULT_BATCH_SIZE = 64
+
 # by default, receives all published messages (i.e., all topics accepted)
 SUB_ALL_TOPICS = ""
 
 STATE_TOPIC = "/polyomino-world/state"
 ACTION_REQ_TOPIC = "/polyomino/action_requested"
+SELECTION_RESULT_TOPIC = "/polyomino/selection-result/"
+
+# viewport elements of the state message that may carry screenshot data
+VIEWPORTS = ("left_viewport", "right_viewport")
+
+# matches a state message's last_action_seqno element in its encoded (JSON) payload
+LAST_ACTION_SEQNO_PATTERN = re.compile(rb'"last_action_seqno"\s*:\s*(-?\d+)')
+
+# JSON decoders of message payloads by name. orjson, when installed, is the default (it decodes full-screenshot
+# state messages several times faster than the standard library's json; see benchmarks/codec.py)
+JSON_DECODERS = {"json": json.loads}
+if orjson is not None:
+    JSON_DECODERS["orjson"] = orjson.loads
+DEFAULT_JSON_DECODER = "orjson" if orjson is not None else "json"
 
 # used to signal the script to shutdown gracefully when a timer event or KeyboardInterrupt occurs
 shutdown_event = threading.Event()
@@ -46,46 +78,357 @@ def get_state_subscriber(host=DEFAULT_HOST, port=DEFAULT_STATE_PORT, topic=SUB_A
     return socket
 
 
-def get_action_publisher(host=DEFAULT_HOST, port=DEFAULT_ACTION_PORT):
+def get_async_state_subscriber(host=DEFAULT_HOST, port=DEFAULT_STATE_PORT, topic=SUB_ALL_TOPICS, context=None):
+    """Establishes an asyncio connection to the Godot AI Bridge state publisher (see receive_async).
+
+    Args:
+        host (str): The GAB state publisher's host IP address.
+        port (int): The GAB state publisher's port number.
+        topic (str): A message topic filter.
+        context (zmq.asyncio.Context, optional): The context to create the socket in. By default, all asyncio
+            subscribers share a single context (and I/O thread).
+
+    Returns:
+        zmq.asyncio.Socket: The socket connection.
+    """
+    context = context if context is not None else zmq.asyncio.Context.instance()
+    socket = context.socket(zmq.SUB)
+
+    socket.setsockopt_string(zmq.SUBSCRIBE, topic)
+    socket.setsockopt(zmq.RCVTIMEO, RECEIVE_WAIT_MS)
+
+    socket.connect(f"tcp://{host}:{str(port)}")
+    return socket
+
+
+def get_action_publisher(host=DEFAULT_HOST, port=DEFAULT_ACTION_PORT, retries=DEFAULT_REQUEST_RETRIES,
+                         pipelined=False):
     """Establishes a connection to the Godot AI Bridge action listener.
 
     Args:
         host (str): The IP address of the GAB action listener host.
         port (int): The port number of the GAB action listener.
+        retries (int): The number of times a request is resent when its reply is not received (see
+            ReliableRequester).
+        pipelined (bool): Whether several requests may be in flight at once (see PipelinedRequester).
 
     Returns:
-        zmq.Socket: A ZeroMQ REQ socket connected to the action listener.
+        ReliableRequester: A connection to the action listener that recovers from lost replies.
     """
-    socket = zmq.Context().socket(zmq.REQ)
-    socket.connect(f"tcp://{host}:{str(port)}")
+    requester_class = PipelinedRequester if pipelined else ReliableRequester
 
     # without timeout the process can hang indefinitely
-    socket.setsockopt(zmq.RCVTIMEO, RECEIVE_WAIT_MS)
-    return socket
+    return requester_class(f"tcp://{host}:{str(port)}", context=zmq.Context(), timeout=RECEIVE_WAIT_MS,
+                           retries=retries)
+
 
+class ReliableRequester:
+    """A REQ connection that recovers from lost or late replies (ZeroMQ's "lazy pirate" pattern).
 
-def receive(connection):
+    A REQ socket that times out waiting for a reply cannot send another request. Instead of failing, the socket is
+    closed (discarding the reply, should it still arrive) and replaced, and the pending request is resent unchanged.
+    The resent request keeps its header (seqno and time), which the Godot environment uses to recognize the
+    duplicate of an action it already received: the action is not executed twice, but is queued again if it was
+    dropped from a full queue.
+
+    The time waited for each reply adapts to the latency of recent replies (see shared.latency.AdaptiveTimeout), so
+    a lost reply is retried after a few typical round-trips rather than after the full timeout.
+
+    Args:
+        address (str): The action listener's endpoint (e.g., "tcp://localhost:10002").
+        context (zmq.Context, optional): The context to create sockets in (by default, the global instance). Sockets
+            of a zmq.asyncio.Context return awaitables from send and resend (see AsyncPolyominoEnvironment).
+        timeout (int): The longest time in milliseconds to wait for each reply (and the initial time waited).
+        retries (int): The number of times a request is resent before it fails.
+        adaptive (bool): Whether the time waited follows the latency of recent replies rather than always being
+            timeout.
+    """
+
+    socket_type = zmq.REQ
+
+    def __init__(self, address, context=None, timeout=RECEIVE_WAIT_MS, retries=DEFAULT_REQUEST_RETRIES,
+                 adaptive=True):
+        self.address = address
+        self.context = context if context is not None else zmq.Context.instance()
+        self.retries = retries
+
+        self.latency = LatencyTracker(("reply",))
+        self.timeout = AdaptiveTimeout(self.latency, "reply", max_ms=timeout) if adaptive else (lambda: timeout)
+
+        # the encoded requests awaiting replies (oldest first, with their send times) and the most recently sent
+        # request. replies arrive in the order the requests were sent, so they are matched to requests by position
+        self.in_flight = deque()
+        self.last_request = None
+
+        # the number of requests sent and replies received, which identify each request's reply (see request)
+        self.sent = 0
+        self.acked = 0
+
+        # the number of times requests were resent (i.e., replies were lost or late)
+        self.resends = 0
+
+        self.socket = None
+        self.connect()
+
+    @property
+    def pending(self):
+        """The oldest encoded request awaiting a reply (or None)."""
+        return self.in_flight[0][0] if self.in_flight else None
+
+    def connect(self):
+        """Replaces the socket with a new one (discarding any pending replies)."""
+        if self.socket is not None:
+            self.socket.close(linger=0)
+
+        self.socket = self.context.socket(self.socket_type)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.connect(self.address)
+
+    def send(self, encoded_request):
+        """Sends an encoded request, whose reply must be received before the next request is sent."""
+        self.in_flight.append((encoded_request, time.perf_counter_ns()))
+        self.last_request = encoded_request
+        self.sent += 1
+        return self._send(encoded_request)
+
+    def _send(self, encoded_request):
+        return self.socket.send_string(encoded_request)
+
+    def resend(self):
+        """Resends the requests awaiting replies, in order, on a new socket."""
+        self.connect()
+        self.resends += 1
+
+        result = None
+        for encoded_request, _ in self.in_flight:
+            result = self._send(encoded_request)
+        return result
+
+    def recv(self):
+        """Waits for the oldest pending request's reply, resending the pending requests on a new socket after each
+        timeout.
+
+        Returns:
+            dict: The decoded reply.
+
+        Raises:
+            zmq.Again: If no reply was received after every retry. The socket is replaced, so later requests can
+                still be sent.
+        """
+        for attempt in range(self.retries + 1):
+            if self.socket.poll(self.timeout(), zmq.POLLIN):
+                return self.recv_nowait()
+            if attempt < self.retries:
+                self.resend()
+
+        self.abandon()
+        raise zmq.Again("No reply received from the action listener")
+
+    def abandon(self):
+        """Gives up on the pending requests, replacing the socket so that the next request can be sent."""
+        self.connect()
+        self.acked += len(self.in_flight)
+        self.in_flight.clear()
+
+    def recv_nowait(self):
+        """Receives the oldest pending request's reply, which must be available (e.g., after polling the socket)."""
+        reply = self._recv()
+        self.received()
+        return reply
+
+    def _recv(self):
+        return self.socket.recv_json(flags=zmq.NOBLOCK)
+
+    def received(self):
+        """Records that the oldest pending request's reply was received."""
+        _, sent_ns = self.in_flight.popleft()
+        self.latency.record("reply", time.perf_counter_ns() - sent_ns)
+        self.acked += 1
+
+    def request(self, encoded_request):
+        """Sends an encoded request and waits for its reply (see recv)."""
+        self.send(encoded_request)
+
+        # the replies of requests sent earlier (if any are in flight) arrive first
+        ticket = self.sent
+        while True:
+            reply = self.recv()
+            if self.acked >= ticket:
+                return reply
+
+    def close(self):
+        self.socket.close(linger=0)
+
+
+class PipelinedRequester(ReliableRequester):
+    """A DEALER connection to the action listener that keeps several requests in flight at once.
+
+    Unlike a REQ socket, which must receive each reply before sending the next request, requests are sent as soon as
+    they are made. The action listener's REP socket still serves them one at a time, in order, so each reply belongs
+    to the oldest request still awaiting one. Lost replies are recovered as by ReliableRequester, except that every
+    request in flight is resent (the Godot environment does not execute the duplicates of recent actions).
+
+    The Godot environment queues at most MAX_PENDING_ACTIONS actions, so callers should keep at most that many in
+    flight (see PolyominoEnvironment.step_async).
+
+    Args:
+        See ReliableRequester. Asyncio contexts are not supported.
+    """
+
+    socket_type = zmq.DEALER
+
+    def _send(self, encoded_request):
+        # a DEALER talking to a REP socket supplies the empty delimiter frame that a REQ socket would add
+        return self.socket.send_multipart([b"", encoded_request.encode("utf-8")])
+
+    def _recv(self):
+        return json.loads(self.socket.recv_multipart(flags=zmq.NOBLOCK)[-1])
+
+
+def receive(connection, reconstructor=None):
     """Receives and decodes next message from the GAB state publisher, waiting until TIMEOUT reached if none available.
 
+    Both the JSON-only wire format and the multipart binary screenshot format are accepted (see decode_message).
+
     Args:
         connection (zmq.Socket): A connection to the GAB state publisher.
+        reconstructor (shared.delta.FrameReconstructor, optional): Reconstructs the screenshots of delta-encoded
+            messages. Without one, delta-encoded screenshots are returned as received.
 
     Returns:
         tuple: A tuple containing the received message's topic (str) and payload (dict or None).
     """
     try:
-        msg = connection.recv_string()
+        frames = connection.recv_multipart(copy=False)
     except zmq.Again:
         # if no message is received within the RECEIVE_WAIT_MS timeout, return None
         return None, None
 
+    topic, payload = decode_message(frames)
+    if reconstructor is not None:
+        payload = reconstructor.apply(payload)
+
+    return topic, payload
+
+
+async def receive_async(connection, reconstructor=None):
+    """Awaits and decodes the next message from the GAB state publisher (see receive).
+
+    Args:
+        connection (zmq.asyncio.Socket): An asyncio connection to the GAB state publisher.
+        reconstructor (shared.delta.FrameReconstructor, optional): Reconstructs the screenshots of delta-encoded
+            messages.
+
+    Returns:
+        tuple: A tuple containing the received message's topic (str) and payload (dict or None).
+    """
+    try:
+        frames = await connection.recv_multipart(copy=False)
+    except zmq.Again:
+        # if no message is received within the RECEIVE_WAIT_MS timeout, return None
+        return None, None
+
+    topic, payload = decode_message(frames)
+    if reconstructor is not None:
+        payload = reconstructor.apply(payload)
+
+    return topic, payload
+
+
+def get_json_decoder(name=None):
+    """Returns a JSON decoder (a function of str or bytes) by name.
+
+    Args:
+        name (str, optional): One of JSON_DECODERS' names (by default, DEFAULT_JSON_DECODER).
+
+    Returns:
+        callable: The decoder.
+    """
+    name = DEFAULT_JSON_DECODER if name is None else name
+    if name not in JSON_DECODERS:
+        raise ValueError(f"Unavailable JSON decoder: {name} (expected one of {tuple(JSON_DECODERS)})")
+    return JSON_DECODERS[name]
+
+
+def split_message(msg):
+    """Splits a message string into its topic and JSON-encoded payload.
+
+    The message is split at its first space: topics never contain spaces (subscriptions match "<TOPIC> " prefixes),
+    but may contain any other character, including braces.
+
+    Args:
+        msg (str or bytes): A message string of the form "<TOPIC> <JSON>".
+
+    Returns:
+        tuple: A tuple containing the message's topic and encoded payload (of the message's type).
+    """
+    topic, _, encoded_payload = msg.partition(" " if isinstance(msg, str) else b" ")
+    return topic, encoded_payload
+
+
+def has_topic(frames, topic):
+    """Checks whether a received message has the given topic without decoding (or copying) its payload.
+
+    Args:
+        frames (list): The message frames (zmq.Frame or bytes) returned by recv_multipart.
+        topic (str): The topic to check for.
+
+    Returns:
+        bool: True if the message's topic matches; otherwise, False.
+    """
+    prefix = f"{topic} ".encode("utf-8")
+    head = frames[0]
+    buffer = head.buffer if isinstance(head, zmq.Frame) else memoryview(head)
+    return buffer[:len(prefix)] == prefix
+
+
+def peek_last_action_seqno(frames):
+    """Extracts a state message's last_action_seqno without decoding its payload (or screenshots).
+
+    Args:
+        frames (list): The message frames (zmq.Frame or bytes) returned by recv_multipart.
+
+    Returns:
+        int: The seqno of the last action reflected in the state, or None if the message does not contain one.
+    """
+    head = frames[0]
+    match = LAST_ACTION_SEQNO_PATTERN.search(head.buffer if isinstance(head, zmq.Frame) else head)
+    return int(match.group(1)) if match else None
+
+
+def decode_message(frames, loads=None):
+    """Decodes a (possibly multipart) message received from the GAB state publisher.
+
+    The first frame always contains a string of the form "<TOPIC> <JSON>". When the publisher runs with binary
+    screenshots enabled, each viewport's "screenshot" element holds the index of a trailing frame that contains the
+    viewport's raw 8-bit luminance values instead of a list of integers. Those frames are wrapped (without copying)
+    in NumPy arrays.
+
+    Args:
+        frames (list): The message frames (zmq.Frame or bytes) returned by recv_multipart.
+        loads (callable, optional): The JSON decoder (by default, the DEFAULT_JSON_DECODER; see get_json_decoder).
+
+    Returns:
+        tuple: A tuple containing the message's topic (str) and payload (dict).
+    """
+    head = frames[0]
+
     # messages are received as strings of the form: "<TOPIC> <JSON>". this splits the message string into TOPIC
-    # and JSON-encoded payload
-    ndx = msg.find("{")
-    topic, encoded_payload = msg[0: ndx - 1], msg[ndx:]
+    # and JSON-encoded payload (both decoders accept UTF-8 encoded bytes)
+    topic, encoded_payload = split_message(head.bytes if isinstance(head, zmq.Frame) else bytes(head))
 
     # unmarshal JSON message content
-    payload = json.loads(encoded_payload)
+    payload = (loads or JSON_DECODERS[DEFAULT_JSON_DECODER])(encoded_payload)
+    topic = topic.decode("utf-8")
+
+    if len(frames) > 1:
+        data = payload.get("data") or {}
+        for viewport in VIEWPORTS:
+            viewport_data = data.get(viewport)
+            if viewport_data and isinstance(viewport_data.get("screenshot"), int):
+                frame = frames[1 + viewport_data["screenshot"]]
+                buffer = frame.buffer if isinstance(frame, zmq.Frame) else frame
+                viewport_data["screenshot"] = np.frombuffer(buffer, dtype=np.uint8)
 
     return topic, payload
 
@@ -93,6 +436,9 @@ def receive(connection):
 def reset_shutdown_timer(timeout, timer=None):
     """Starts or resets the shutdown timer.
 
+    Each reset starts a new timer thread, so scripts that receive messages at high rates should use
+    shared.stream.StreamRunner, whose inactivity timeout is checked against a single deadline instead.
+
     Args:
         timeout (int): The maximum time in milliseconds to wait for a message before shutting down.
         timer (threading.Timer, optional): The existing timer to reset. Defaults to None.
@@ -118,18 +464,20 @@ def reset_shutdown_timer(timeout, timer=None):
 
 def send(connection, request):
     """Sends an encoded request to the GAB action listener and returns its reply.
+
     Args:
-        connection: A connection object to the GAB action listener.
+        connection (ReliableRequester): A connection to the GAB action listener (see get_action_publisher).
         request (dict): A dictionary containing the action request payload.
+
     Returns:
-        dict: The GAB action listener's reply, indicating SUCCESS or ERROR.
+        dict: The GAB action listener's reply, indicating SUCCESS or ERROR (or None if no reply was received after
+        every retry).
     """
     encoded_request = json.dumps(request)
-    connection.send_string(encoded_request)
 
     reply = None
     try:
-        reply = connection.recv_json()
+        reply = connection.request(encoded_request)
     except zmq.Again:
         pass
 
@@ -175,6 +523,17 @@ def add_timeout_arg(parser, default_timeout=DEFAULT_SHUTDOWN_TIMEOUT_MS):
     )
 
 
+def add_batch_size_arg(parser, default_batch_size=DEFAULT_BATCH_SIZE):
+    """Adds a batch size argument to the parser."""
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        required=False,
+        default=default_batch_size,
+        help=f"the maximum number of queued messages handled per wakeup (default: {default_batch_size})",
+    )
+
+
 def add_port_arg(parser, default_port):
     """Adds a port argument to the parser."""
     parser.add_argument(
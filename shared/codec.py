@@ -0,0 +1,394 @@
+import numpy as np
+import zmq
+
+from shared import ACTION_REQ_TOPIC
+from shared import SELECTION_RESULT_TOPIC
+from shared import STATE_TOPIC
+from shared import VIEWPORTS
+from shared import get_json_decoder
+from shared import split_message
+from shared.shm import FRAME_RING_KEY
+
+# the key of a viewport's screenshot element in an encoded state message
+SCREENSHOT_KEY = b'"screenshot"'
+
+# the bytes that may separate SCREENSHOT_KEY from its value
+_SEPARATORS = frozenset(b" \t\r\n:")
+
+# topics are peeked at (see peek_topic) within this many leading bytes of a message
+MAX_TOPIC_LENGTH = 256
+
+
+class Message:
+    """Base class of typed messages from the GAB state publisher.
+
+    Messages are records with fixed attributes (__slots__) rather than nested dicts: every message has its topic and
+    its header's seqno and time, and subclasses add the elements of their topic's data. Messages are built from
+    decoded payloads by from_payload (see MessageCodec, which also decodes them).
+    """
+
+    __slots__ = ("topic", "seqno", "time")
+
+    # the topic of the message type's messages (None for UntypedMessage)
+    TOPIC = None
+
+    def __init__(self, topic=None, seqno=None, time=None):
+        self.topic = self.TOPIC if topic is None else topic
+        self.seqno = seqno
+        self.time = time
+
+    @classmethod
+    def from_payload(cls, payload, topic=None):
+        """Builds a message from a decoded payload (e.g., as returned by shared.receive)."""
+        header = payload.get("header") or {}
+        message = cls(topic, header.get("seqno"), header.get("time"))
+        message._set_data(payload.get("data") or {})
+        return message
+
+    def _set_data(self, data):
+        pass
+
+    def _fields(self):
+        return [name for klass in reversed(type(self).__mro__) for name in getattr(klass, "__slots__", ())]
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            _equal(getattr(self, name), getattr(other, name)) for name in self._fields())
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields() if name != "topic")
+        return f"{type(self).__name__}({fields})"
+
+
+def _equal(a, b):
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.array_equal(a, b)
+    return a == b
+
+
+class Viewport:
+    """A viewport of a state message: its object's shape and id, and its screenshot (a flat uint8 array, or None if
+    the state did not carry it)."""
+
+    __slots__ = ("shape", "id", "screenshot")
+
+    def __init__(self, shape=None, id=None, screenshot=None):
+        self.shape = shape
+        self.id = id
+        self.screenshot = screenshot
+
+    @classmethod
+    def from_data(cls, data):
+        if data is None:
+            return None
+
+        screenshot = data.get("screenshot")
+        if screenshot is not None and not isinstance(screenshot, np.ndarray):
+            screenshot = np.asarray(screenshot, dtype=np.uint8)
+        return cls(data.get("shape"), data.get("id"), screenshot)
+
+    def __eq__(self, other):
+        return (isinstance(other, Viewport) and (self.shape, self.id) == (other.shape, other.id)
+                and _equal(self.screenshot, other.screenshot))
+
+    def __repr__(self):
+        screenshot = None if self.screenshot is None else f"<{self.screenshot.size} pixels>"
+        return f"Viewport(shape={self.shape!r}, id={self.id!r}, screenshot={screenshot})"
+
+
+class Transformations:
+    """The active object's transformations in a state message (rotation in degrees, scale, and translation)."""
+
+    __slots__ = ("rotation_active", "scale", "translation")
+
+    def __init__(self, rotation_active=None, scale=None, translation=None):
+        self.rotation_active = rotation_active
+        self.scale = scale
+        self.translation = translation
+
+    @classmethod
+    def from_data(cls, data):
+        if data is None:
+            return None
+        return cls(data.get("rotation_active"), data.get("scale"), data.get("translation"))
+
+    def __eq__(self, other):
+        return isinstance(other, Transformations) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return (f"Transformations(rotation_active={self.rotation_active!r}, scale={self.scale!r}, "
+                f"translation={self.translation!r})")
+
+
+class StateMessage(Message):
+    """A state message: the seqno of the last executed action, the play mode, whether the objects are the same, the
+    left (reference) and right (active) viewports, and the active object's transformations."""
+
+    __slots__ = ("last_action_seqno", "mode", "same", "left", "right", "transformations")
+
+    TOPIC = STATE_TOPIC
+
+    def _set_data(self, data):
+        self.last_action_seqno = data.get("last_action_seqno")
+        self.mode = data.get("mode")
+        self.same = data.get("same")
+        self.left = Viewport.from_data(data.get("left_viewport"))
+        self.right = Viewport.from_data(data.get("right_viewport"))
+        self.transformations = Transformations.from_data(data.get("transformations"))
+
+
+class ActionRequestedMessage(Message):
+    """An action_requested message: the requested action and the seqno of its request."""
+
+    __slots__ = ("action", "action_seqno")
+
+    TOPIC = ACTION_REQ_TOPIC
+
+    def _set_data(self, data):
+        self.action = data.get("action")
+        self.action_seqno = data.get("seqno")
+
+
+class SelectionResultMessage(Message):
+    """A selection-result message: whether the selection was correct."""
+
+    __slots__ = ("result",)
+
+    TOPIC = SELECTION_RESULT_TOPIC
+
+    def _set_data(self, data):
+        self.result = data.get("result")
+
+
+class UntypedMessage(Message):
+    """A message of a topic without a message type, whose data is kept as a dict."""
+
+    __slots__ = ("data",)
+
+    def _set_data(self, data):
+        self.data = data
+
+
+# message types by topic
+MESSAGE_TYPES = {message_type.TOPIC: message_type
+                 for message_type in (StateMessage, ActionRequestedMessage, SelectionResultMessage)}
+
+
+def as_message(topic, payload):
+    """Converts a decoded (topic, payload) tuple (e.g., from shared.receive or a recording) into a typed message."""
+    return MESSAGE_TYPES.get(topic, UntypedMessage).from_payload(payload, topic)
+
+
+def _parse_screenshot(text):
+    """Parses the text of a screenshot array (without its brackets) into a flat uint8 array."""
+    if not text.strip():
+        return np.zeros(0, dtype=np.uint8)
+    return np.fromstring(text, dtype=np.uint8, sep=",")
+
+
+class EncodedScreenshot:
+    """A screenshot of a JSON state message whose array has not been parsed yet (see extract_screenshots).
+
+    The array is parsed (once) when decode is called, or when NumPy converts the screenshot (e.g., np.asarray), so
+    screenshots that are never used are never parsed.
+    """
+
+    __slots__ = ("text", "_array")
+
+    def __init__(self, text):
+        self.text = text
+        self._array = None
+
+    def decode(self):
+        """Returns the screenshot as a flat uint8 array."""
+        if self._array is None:
+            self._array = _parse_screenshot(self.text)
+            self.text = None
+        return self._array
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.decode()
+        if dtype is not None and array.dtype != dtype:
+            return array.astype(dtype)
+        return array.copy() if copy else array
+
+    def __repr__(self):
+        return "EncodedScreenshot(parsed)" if self._array is not None else f"EncodedScreenshot({len(self.text)} bytes)"
+
+
+def peek_topic(frames):
+    """Returns a message's topic without decoding (or copying) its payload.
+
+    Args:
+        frames (list): The message frames (zmq.Frame or bytes) returned by recv_multipart.
+
+    Returns:
+        str: The message's topic.
+    """
+    head = frames[0]
+    buffer = head.buffer if isinstance(head, zmq.Frame) else memoryview(head)
+
+    prefix = bytes(buffer[:MAX_TOPIC_LENGTH])
+    if b" " not in prefix:
+        prefix = bytes(buffer)
+    return split_message(prefix)[0].decode("utf-8")
+
+
+def extract_screenshots(encoded_payload, parse=True, lazy=False):
+    """Parses the screenshot arrays of an encoded (JSON wire format) state message directly into uint8 arrays.
+
+    A JSON decoder would build a Python int for each of a state's 32,768 pixels, only for them to be converted into
+    an array. Instead, each screenshot's text is parsed by NumPy and replaced by its index in the returned list, as
+    in the binary screenshot wire format, so the rest of the message decodes quickly.
+
+    Args:
+        encoded_payload (bytes): A state message's encoded payload.
+        parse (bool): Whether the screenshots are parsed. Otherwise, each is replaced by null without being parsed
+            (which costs little more than finding its end).
+        lazy (bool): Whether parsing is deferred: each screenshot is returned as an EncodedScreenshot, which is
+            parsed when it is first used.
+
+    Returns:
+        tuple: The encoded payload without its screenshot arrays (bytes) and the screenshots (list of arrays, or of
+            EncodedScreenshots if lazy is True, which is empty if parse is False).
+    """
+    screenshots = []
+    parts = []
+    position = 0
+    while (key := encoded_payload.find(SCREENSHOT_KEY, position)) >= 0:
+        start = key + len(SCREENSHOT_KEY)
+        while start < len(encoded_payload) and encoded_payload[start] in _SEPARATORS:
+            start += 1
+
+        # screenshots that are not arrays (e.g., null) are left to the JSON decoder
+        if start >= len(encoded_payload) or encoded_payload[start] != ord("["):
+            parts.append(encoded_payload[position:start])
+            position = start
+            continue
+
+        end = encoded_payload.index(b"]", start)
+        parts.append(encoded_payload[position:start])
+        position = end + 1
+
+        if not parse:
+            parts.append(b"null")
+            continue
+
+        text = encoded_payload[start + 1:end]
+        screenshots.append(EncodedScreenshot(text) if lazy else _parse_screenshot(text))
+        parts.append(str(len(screenshots) - 1).encode("ascii"))
+
+    parts.append(encoded_payload[position:])
+    return b"".join(parts), screenshots
+
+
+def _attach_screenshots(payload, screenshots):
+    """Replaces the screenshot indices of a payload's viewports with the indexed screenshots."""
+    data = payload.get("data") or {}
+    for viewport in VIEWPORTS:
+        viewport_data = data.get(viewport)
+        if viewport_data and isinstance(viewport_data.get("screenshot"), int):
+            viewport_data["screenshot"] = screenshots[viewport_data["screenshot"]]
+
+
+def clear_screenshots(payload):
+    """Replaces the screenshots (or screenshot indices or references) of a decoded payload's viewports with None
+    (e.g., so that as_message does not convert screenshots that will not be used)."""
+    data = payload.get("data") or {}
+    for viewport in VIEWPORTS:
+        viewport_data = data.get(viewport)
+        if viewport_data and "screenshot" in viewport_data:
+            viewport_data["screenshot"] = None
+
+
+class MessageCodec:
+    """Decodes messages from the GAB state publisher into typed messages (see Message).
+
+    Decoding is schema-driven: state messages in the JSON wire format have their screenshots parsed directly into
+    arrays (see extract_screenshots), and states in the binary screenshot wire format wrap their screenshot frames
+    without copying. The remaining JSON is decoded by a pluggable decoder (see shared.JSON_DECODERS). Topics are
+    split from payloads at the first space, so they may contain any character but a space.
+
+    Args:
+        decoder (str, optional): The name of the JSON decoder (by default, shared.DEFAULT_JSON_DECODER).
+        reconstructor (shared.delta.FrameReconstructor, optional): Reconstructs the screenshots of delta-encoded
+            messages.
+        frame_reader (shared.shm.SharedFrameReader, optional): Resolves the screenshot references of messages
+            relayed through shared memory.
+    """
+
+    def __init__(self, decoder=None, reconstructor=None, frame_reader=None):
+        self.loads = get_json_decoder(decoder)
+        self.reconstructor = reconstructor
+        self.frame_reader = frame_reader
+
+    def decode_payload(self, frames, screenshots=True, lazy=False):
+        """Decodes a (possibly multipart) message into its topic and payload, with screenshots as uint8 arrays.
+
+        Args:
+            frames (list): The message frames (zmq.Frame or bytes) returned by recv_multipart.
+            screenshots (bool): Whether screenshots are decoded. Otherwise, they are skipped (and None), and neither
+                the reconstructor nor the frame reader is applied, so a codec whose reconstructor tracks a stream of
+                delta-encoded states must decode all of them with screenshots.
+            lazy (bool): Whether the screenshots of JSON state messages are left unparsed, as EncodedScreenshots
+                (which NumPy converts into arrays on first use). Binary screenshots are arrays either way.
+
+        Returns:
+            tuple: A tuple containing the message's topic (str) and payload (dict).
+        """
+        head = frames[0]
+        topic, encoded_payload = split_message(head.bytes if isinstance(head, zmq.Frame) else bytes(head))
+        topic = topic.decode("utf-8")
+
+        if not screenshots:
+            if len(frames) == 1 and topic == STATE_TOPIC:
+                encoded_payload, _ = extract_screenshots(encoded_payload, parse=False)
+            payload = self.loads(encoded_payload)
+            clear_screenshots(payload)
+            return topic, payload
+
+        arrays = None
+        if len(frames) > 1:
+            arrays = [np.frombuffer(frame.buffer if isinstance(frame, zmq.Frame) else frame, dtype=np.uint8)
+                      for frame in frames[1:]]
+        elif topic == STATE_TOPIC and FRAME_RING_KEY.encode("ascii") not in encoded_payload:
+            # (relayed screenshots are [slot, generation] references rather than pixels)
+            encoded_payload, arrays = extract_screenshots(encoded_payload, lazy=lazy)
+
+        payload = self.loads(encoded_payload)
+        if arrays:
+            _attach_screenshots(payload, arrays)
+
+        if self.reconstructor is not None:
+            payload = self.reconstructor.apply(payload)
+        if self.frame_reader is not None:
+            payload = self.frame_reader.apply(payload)
+
+        return topic, payload
+
+    def decode(self, frames, screenshots=True):
+        """Decodes a (possibly multipart) message into a typed message.
+
+        Args:
+            frames (list): The message frames (zmq.Frame or bytes) returned by recv_multipart.
+            screenshots (bool): Whether screenshots are decoded (see decode_payload).
+
+        Returns:
+            Message: The message (a StateMessage, ActionRequestedMessage or SelectionResultMessage, or an
+                UntypedMessage for other topics).
+        """
+        return as_message(*self.decode_payload(frames, screenshots))
+
+    def receive(self, connection):
+        """Receives and decodes the next message (see shared.receive).
+
+        Returns:
+            Message: The message, or None if none was received before the connection's timeout.
+        """
+        try:
+            frames = connection.recv_multipart(copy=False)
+        except zmq.Again:
+            return None
+
+        return self.decode(frames)
@@ -0,0 +1,253 @@
+import io
+import json
+import os
+import re
+import tarfile
+import zipfile
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+IMAGE_DIMENSIONS = (128, 128)
+
+# images are named by image_capture.py as polyomino_<time in ms>.png
+IMAGE_NAME_PATTERN = re.compile(r"polyomino_(\d+)\.png$")
+
+# label of images whose parent directory is not a shape (e.g., in images_flat.tgz)
+UNLABELED = -1
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".cache"
+CACHE_IMAGES_FILE = "images.npy"
+CACHE_INDEX_FILE = "index.npz"
+CACHE_META_FILE = "meta.json"
+
+
+def parse_image_name(name):
+    """Parses an image's label and capture time from its path (e.g., "images/7/polyomino_1628865420102.png").
+
+    Args:
+        name (str): The image's path within a directory or archive.
+
+    Returns:
+        tuple: The image's label (int, or UNLABELED) and capture time in milliseconds (int), or None if the name is
+            not an image's.
+    """
+    match = IMAGE_NAME_PATTERN.search(name)
+    if match is None:
+        return None
+
+    parts = name.replace("\\", "/").split("/")
+    label = int(parts[-2]) if len(parts) > 1 and parts[-2].isdigit() else UNLABELED
+    return label, int(match.group(1))
+
+
+def list_images(source):
+    """Lists the images in a directory, tarball (.tar, .tgz, .tar.gz), or zip archive.
+
+    Returns:
+        list: A (name, label, time) tuple per image.
+    """
+    source = Path(source)
+    if source.is_dir():
+        names = [path.relative_to(source.parent).as_posix() for path in source.rglob("*.png")]
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            names = archive.namelist()
+    else:
+        with tarfile.open(source) as archive:
+            names = [member.name for member in archive.getmembers() if member.isfile()]
+
+    images = []
+    for name in names:
+        parsed = parse_image_name(name)
+        if parsed is not None:
+            images.append((name, *parsed))
+
+    return images
+
+
+def read_images(source):
+    """Yields the encoded (PNG) contents of the images in a directory or archive, without extracting the archive.
+
+    Yields:
+        tuple: Each image's name and encoded contents (bytes).
+    """
+    source = Path(source)
+    if source.is_dir():
+        for path in source.rglob("polyomino_*.png"):
+            if IMAGE_NAME_PATTERN.search(path.name):
+                yield path.relative_to(source.parent).as_posix(), path.read_bytes()
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for name in archive.namelist():
+                if IMAGE_NAME_PATTERN.search(name):
+                    yield name, archive.read(name)
+    else:
+        # archives are streamed, so compressed tarballs are decompressed exactly once
+        with tarfile.open(source, mode="r|*") as archive:
+            for member in archive:
+                if member.isfile() and IMAGE_NAME_PATTERN.search(member.name):
+                    yield member.name, archive.extractfile(member).read()
+
+
+def decode_image(data):
+    """Decodes an encoded image into an array of 8-bit luminance values."""
+    with Image.open(io.BytesIO(data)) as img:
+        array = np.asarray(img.convert("L"))
+
+    if array.shape != IMAGE_DIMENSIONS:
+        raise ValueError(f"Image dimensions {array.shape} do not match the expected {IMAGE_DIMENSIONS}")
+
+    return array
+
+
+def _source_signature(source):
+    source = Path(source)
+    stat = source.stat()
+    if source.is_dir():
+        # a directory changes when any of its images is added, removed, or rewritten
+        stats = [path.stat() for path in source.rglob("*.png")]
+        return {"path": str(source.resolve()), "count": len(stats),
+                "mtime_ns": max((s.st_mtime_ns for s in stats), default=stat.st_mtime_ns),
+                "size": sum(s.st_size for s in stats)}
+
+    return {"path": str(source.resolve()), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def build_cache(source, cache_dir):
+    """Decodes every image in a directory or archive into a contiguous uint8 array stored as a .npy file.
+
+    Images are ordered by label and capture time. Their labels and times are stored alongside in an .npz file.
+
+    Args:
+        source (str): A directory of shape subdirectories, or a tarball or zip archive of one.
+        cache_dir (str): The directory where the cache is written.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    images = sorted(list_images(source), key=lambda image: (image[1], image[2], image[0]))
+    rows = {name: row for row, (name, _, _) in enumerate(images)}
+
+    # decoded images are written straight into the memory-mapped cache rather than accumulated in memory
+    tmp_path = cache_dir / f"{CACHE_IMAGES_FILE}.tmp"
+    array = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=(len(images), *IMAGE_DIMENSIONS))
+    for name, data in read_images(source):
+        array[rows[name]] = decode_image(data)
+    array.flush()
+    del array
+
+    os.replace(tmp_path, cache_dir / CACHE_IMAGES_FILE)
+    np.savez(cache_dir / CACHE_INDEX_FILE,
+             labels=np.array([label for _, label, _ in images], dtype=np.int16),
+             times=np.array([time for _, _, time in images], dtype=np.int64),
+             names=np.array([name for name, _, _ in images]))
+
+    # the metadata file is written last, so a cache without one is incomplete
+    meta = {"version": CACHE_VERSION, "source": _source_signature(source), "count": len(images)}
+    (cache_dir / CACHE_META_FILE).write_text(json.dumps(meta))
+
+
+def is_cache_valid(source, cache_dir):
+    meta_path = Path(cache_dir) / CACHE_META_FILE
+    if not meta_path.exists():
+        return False
+
+    meta = json.loads(meta_path.read_text())
+    return meta.get("version") == CACHE_VERSION and meta.get("source") == _source_signature(source)
+
+
+class ImageDataset:
+    """The polyomino images (e.g., data/images.tgz) as a memory-mapped uint8 array of shape (N, 128, 128).
+
+    On first use, every image is decoded once into a cache directory (by default, next to the source with the suffix
+    ".cache"); afterwards the cache is memory-mapped, so no PNG decoding is needed. The cache is rebuilt whenever
+    the source changes.
+
+    Args:
+        source (str): A directory of shape subdirectories (e.g., data/images), or a tarball or zip archive of one.
+        cache_dir (str, optional): The cache directory.
+        rebuild (bool): Whether to rebuild the cache even if it is up to date.
+
+    Attributes:
+        images (numpy.ndarray): The (read-only, memory-mapped) images.
+        labels (numpy.ndarray): Each image's label (its shape directory's number, or UNLABELED).
+        times (numpy.ndarray): Each image's capture time in milliseconds.
+        classes (numpy.ndarray): The distinct labels.
+    """
+
+    def __init__(self, source, cache_dir=None, rebuild=False):
+        self.source = Path(source)
+        self.cache_dir = Path(cache_dir) if cache_dir else Path(str(self.source).rstrip("/\\") + CACHE_SUFFIX)
+
+        if rebuild or not is_cache_valid(self.source, self.cache_dir):
+            build_cache(self.source, self.cache_dir)
+
+        self.images = np.load(self.cache_dir / CACHE_IMAGES_FILE, mmap_mode="r")
+        with np.load(self.cache_dir / CACHE_INDEX_FILE) as index:
+            self.labels = index["labels"]
+            self.times = index["times"]
+            self.names = index["names"]
+
+        self.classes, self._class_starts = np.unique(self.labels, return_index=True)
+        self._class_counts = np.diff(np.append(self._class_starts, len(self.labels)))
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, i):
+        return self.images[i], self.labels[i]
+
+    def sample(self, batch_size, rng=None, stratified=False, out=None):
+        """Draws a random batch (with replacement).
+
+        Args:
+            batch_size (int): The number of images.
+            rng (numpy.random.Generator, optional): The random number generator.
+            stratified (bool): Whether to draw (as near as possible) equally many images of every class.
+            out (numpy.ndarray, optional): A (batch_size, 128, 128) uint8 array to receive the images.
+
+        Returns:
+            tuple: The batch's images and labels.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+
+        if stratified:
+            # images are ordered by label, so each class occupies a contiguous range of rows
+            classes = np.resize(rng.permutation(len(self.classes)), batch_size)
+            indices = self._class_starts[classes] + (rng.random(batch_size) * self._class_counts[classes]).astype(
+                np.int64)
+        else:
+            indices = rng.integers(0, len(self), size=batch_size)
+
+        return self._gather(indices, out)
+
+    def batches(self, batch_size, shuffle=True, rng=None, drop_last=False):
+        """Iterates over the dataset once (i.e., one epoch) in batches.
+
+        The yielded images are written into a single reused buffer, so they must be copied if they are kept beyond
+        the next iteration.
+
+        Yields:
+            tuple: Each batch's images and labels.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        order = rng.permutation(len(self)) if shuffle else np.arange(len(self))
+
+        buffer = np.empty((batch_size, *IMAGE_DIMENSIONS), dtype=np.uint8)
+        stop = len(self) - len(self) % batch_size if drop_last else len(self)
+        for start in range(0, stop, batch_size):
+            indices = order[start:start + batch_size]
+            yield self._gather(indices, buffer[:len(indices)])
+
+    def _gather(self, indices, out=None):
+        # rows are read in ascending order (for sequential access to the memory map), but returned in the sampled
+        # order: images are stored by label, so sorted batches would be ordered by class
+        order = np.argsort(indices, kind="stable")
+        if out is None:
+            out = np.empty((len(indices), *self.images.shape[1:]), dtype=self.images.dtype)
+
+        out[order] = np.take(self.images, indices[order], axis=0)
+        return out, self.labels[indices]
@@ -0,0 +1,93 @@
+import numpy as np
+
+from shared import VIEWPORTS
+
+# viewport screenshot encodings of the delta wire format (POLYENV_DELTA_SCREENSHOTS=true)
+KEYFRAME = "key"
+ROWS = "rows"
+UNCHANGED = "unchanged"
+
+# the event data of a request that makes the Godot environment publish its next state with full screenshots
+KEYFRAME_EVENT = {"event": {"type": "keyframe"}}
+
+
+class FrameReconstructor:
+    """Reconstructs full screenshots from delta-encoded state messages.
+
+    With delta screenshots enabled, each state message carries a "frame_seqno" element, and each viewport's
+    "encoding" element says whether its screenshot is a keyframe (the full screenshot), a patch of the rows given by
+    its "rows" element, or unchanged (no screenshot). Patches and unchanged screenshots are relative to the previous
+    state publication, so the last screenshot of each viewport is kept here.
+
+    A gap in the frame seqno (e.g., a state dropped by a full queue or skipped undecoded) leaves the following patches
+    without a base. Their screenshots are set to None, and needs_keyframe is True until a keyframe arrives (which can
+    be requested with KEYFRAME_EVENT; keyframes are also published periodically).
+
+    Messages that are not delta-encoded are passed through unchanged.
+    """
+
+    def __init__(self):
+        self._frames = dict.fromkeys(VIEWPORTS)
+        self._frame_seqno = None
+
+        # whether a delta-encoded state has been received (after which no state can be skipped undecoded)
+        self.tracking = False
+        self.needs_keyframe = False
+
+        # the number of states whose screenshots could not be reconstructed
+        self.gaps = 0
+
+    def apply(self, payload):
+        """Replaces a decoded state message's delta-encoded screenshots with full (read-only) screenshots.
+
+        Args:
+            payload (dict): A payload decoded by shared.decode_message.
+
+        Returns:
+            dict: The payload, in the format of a message that is not delta-encoded.
+        """
+        data = (payload or {}).get("data") or {}
+        frame_seqno = data.get("frame_seqno")
+        if frame_seqno is None:
+            return payload
+
+        self.tracking = True
+        contiguous = self._frame_seqno is not None and frame_seqno == self._frame_seqno + 1
+        self._frame_seqno = frame_seqno
+
+        failed = False
+        for viewport in VIEWPORTS:
+            viewport_data = data.get(viewport)
+            if not viewport_data:
+                continue
+
+            encoding = viewport_data.pop("encoding", KEYFRAME)
+            rows = viewport_data.pop("rows", None)
+            previous = self._frames[viewport] if contiguous else None
+
+            if encoding == KEYFRAME:
+                frame = np.asarray(viewport_data["screenshot"], dtype=np.uint8)
+            elif previous is None:
+                frame = None
+            elif encoding == UNCHANGED:
+                frame = previous
+            elif encoding == ROWS:
+                patch = viewport_data["screenshot"]
+                start, stop = rows
+                width = len(patch) // (stop - start)
+
+                frame = previous.copy()
+                frame[start * width:stop * width] = patch
+            else:
+                raise ValueError(f"Unsupported screenshot encoding: {encoding}")
+
+            if frame is not None:
+                frame.setflags(write=False)
+            failed = failed or frame is None
+
+            self._frames[viewport] = frame
+            viewport_data["screenshot"] = frame
+
+        self.needs_keyframe = any(frame is None for frame in self._frames.values())
+        self.gaps += failed
+        return payload
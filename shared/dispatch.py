@@ -0,0 +1,92 @@
+import zmq
+
+from shared.codec import MessageCodec
+from shared.codec import peek_topic
+
+
+class Dispatcher:
+    """Routes messages from the GAB state publisher to the handlers registered for their exact topics.
+
+    A message's topic is read first (see shared.codec.peek_topic), and its payload is decoded only if a handler is
+    registered for the topic. Handlers receive typed messages (see shared.codec.Message). Handlers registered with
+    screenshots=False need only the messages' other elements, and while all of a topic's handlers are registered so,
+    its messages are decoded without their screenshots, which are most of a state message's decoding time.
+
+        dispatcher = Dispatcher()
+        dispatcher.register(STATE_TOPIC, on_state, screenshots=False)
+        while True:
+            dispatcher.receive(connection)
+
+    Args:
+        codec (shared.codec.MessageCodec, optional): The codec that decodes messages (e.g., with a reconstructor of
+            delta-encoded screenshots). By default, a codec with the default JSON decoder.
+    """
+
+    def __init__(self, codec=None):
+        self.codec = codec if codec is not None else MessageCodec()
+
+        # handlers by topic, and whether any of a topic's handlers needs screenshots
+        self.handlers = {}
+        self.screenshots = {}
+
+        # the number of messages handled and of messages ignored (i.e., whose topics have no handlers) by topic
+        self.handled = {}
+        self.ignored = {}
+
+    def register(self, topic, handler, screenshots=True):
+        """Registers a handler of a topic's messages.
+
+        Args:
+            topic (str): The topic, which must match messages' topics exactly.
+            handler (callable): Called with each of the topic's messages, in the order the handlers were registered.
+            screenshots (bool): Whether the handler needs the messages' screenshots.
+        """
+        self.handlers.setdefault(topic, []).append(handler)
+        self.screenshots[topic] = self.screenshots.get(topic, False) or screenshots
+
+    def on(self, topic, screenshots=True):
+        """Returns a decorator that registers a function as a handler of a topic's messages (see register)."""
+        def decorator(handler):
+            self.register(topic, handler, screenshots=screenshots)
+            return handler
+
+        return decorator
+
+    def dispatch(self, frames):
+        """Decodes a received message and calls its topic's handlers, unless the topic has none.
+
+        Args:
+            frames (list): The message frames (zmq.Frame or bytes) returned by recv_multipart.
+
+        Returns:
+            shared.codec.Message: The decoded message, or None if it was ignored.
+        """
+        topic = peek_topic(frames)
+        handlers = self.handlers.get(topic)
+        if not handlers:
+            self.ignored[topic] = self.ignored.get(topic, 0) + 1
+            return None
+
+        message = self.codec.decode(frames, screenshots=self.screenshots[topic])
+        for handler in handlers:
+            handler(message)
+
+        self.handled[topic] = self.handled.get(topic, 0) + 1
+        return message
+
+    def receive(self, connection):
+        """Receives and dispatches the next message, waiting until the connection's timeout if none is available.
+
+        Args:
+            connection (zmq.Socket): A connection to the GAB state publisher.
+
+        Returns:
+            bool: Whether a message was received (whether or not it was handled).
+        """
+        try:
+            frames = connection.recv_multipart(copy=False)
+        except zmq.Again:
+            return False
+
+        self.dispatch(frames)
+        return True
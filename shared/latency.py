@@ -0,0 +1,189 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+
+# number of most recent samples per phase used to calculate percentiles
+DEFAULT_WINDOW = 10000
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+DEFAULT_METRIC_NAME = "polyomino_env_latency_seconds"
+
+# lower bound of adaptive timeouts (about six frames at 60 fps)
+DEFAULT_MIN_TIMEOUT_MS = 100
+
+
+class LatencyTracker:
+    """Keeps rolling latency samples (in nanoseconds) for a fixed set of named phases.
+
+    Percentiles are calculated over each phase's most recent samples, while counts and sums cover all samples ever
+    recorded (as in a Prometheus summary).
+
+    Args:
+        phases (list): The names of the tracked phases (e.g., "send", "ack", "wait").
+        window (int): The number of most recent samples per phase used to calculate percentiles.
+        labels (dict, optional): Labels added to every exported metric (e.g., {"env": "localhost:10002"}).
+    """
+
+    def __init__(self, phases, window=DEFAULT_WINDOW, labels=None):
+        self.phases = tuple(phases)
+        self.window = window
+        self.labels = dict(labels or {})
+
+        self._samples = {phase: np.zeros(window, dtype=np.int64) for phase in self.phases}
+        self._counts = dict.fromkeys(self.phases, 0)
+        self._sums = dict.fromkeys(self.phases, 0)
+
+    def record(self, phase, elapsed_ns):
+        """Records a phase's elapsed time in nanoseconds."""
+        count = self._counts[phase]
+        self._samples[phase][count % self.window] = elapsed_ns
+        self._counts[phase] = count + 1
+        self._sums[phase] += elapsed_ns
+
+    def record_all(self, timings):
+        """Records the elapsed times (in nanoseconds) in a dictionary keyed by phase."""
+        for phase, elapsed_ns in timings.items():
+            self.record(phase, elapsed_ns)
+
+    def count(self, phase):
+        return self._counts[phase]
+
+    def percentiles(self, phase, quantiles=DEFAULT_QUANTILES):
+        """Calculates a phase's latency percentiles in nanoseconds over its most recent samples.
+
+        Returns:
+            dict: The percentiles keyed by quantile (or None for each quantile if no samples were recorded).
+        """
+        samples = self._samples[phase][:min(self._counts[phase], self.window)]
+        if samples.size == 0:
+            return dict.fromkeys(quantiles)
+
+        values = np.quantile(samples, quantiles)
+        return {q: float(value) for q, value in zip(quantiles, values)}
+
+    def summary(self, quantiles=DEFAULT_QUANTILES):
+        """Summarizes every phase's latency (in nanoseconds).
+
+        Returns:
+            dict: For each phase, its sample count, mean, and percentiles (keyed as "p50", "p95", etc.).
+        """
+        summary = {}
+        for phase in self.phases:
+            count = self._counts[phase]
+            stats = {"count": count, "mean": self._sums[phase] / count if count else None}
+            for q, value in self.percentiles(phase, quantiles).items():
+                stats[f"p{q * 100:g}"] = value
+            summary[phase] = stats
+
+        return summary
+
+    def to_prometheus(self, name=DEFAULT_METRIC_NAME, quantiles=DEFAULT_QUANTILES):
+        """Formats the tracked latencies (in seconds) as a Prometheus summary in the text exposition format."""
+        lines = [
+            f"# HELP {name} Latency of each phase of an environment step.",
+            f"# TYPE {name} summary",
+        ]
+
+        for phase in self.phases:
+            labels = ",".join(f'{key}="{value}"' for key, value in {**self.labels, "phase": phase}.items())
+
+            for q, value in self.percentiles(phase, quantiles).items():
+                value = "NaN" if value is None else repr(value / 1e9)
+                lines.append(f'{name}{{{labels},quantile="{q}"}} {value}')
+
+            lines.append(f"{name}_sum{{{labels}}} {self._sums[phase] / 1e9!r}")
+            lines.append(f"{name}_count{{{labels}}} {self._counts[phase]}")
+
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path, name=DEFAULT_METRIC_NAME):
+        """Atomically writes the tracked latencies to a file (e.g., for node_exporter's textfile collector)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.to_prometheus(name))
+        os.replace(tmp_path, path)
+
+
+class AdaptiveTimeout:
+    """A timeout that follows a tracked phase's rolling latency: a multiple of its recent percentile, within bounds.
+
+    Until the phase has enough samples, the maximum is used. The percentile is recalculated only every refresh
+    samples, so calling the timeout is cheap enough to do before every request.
+
+    Args:
+        tracker (LatencyTracker): The tracker of the phase's latencies.
+        phase (str): The phase whose latency the timeout follows (e.g., "ack").
+        max_ms (int): The largest (and initial) timeout in milliseconds.
+        min_ms (int): The smallest timeout in milliseconds.
+        quantile (float): The percentile (as a quantile) of the phase's recent latencies that the timeout follows.
+        factor (float): The multiple of the percentile used as the timeout.
+        min_samples (int): The number of samples needed before the timeout adapts.
+        refresh (int): The number of new samples after which the percentile is recalculated.
+    """
+
+    def __init__(self, tracker, phase, max_ms, min_ms=DEFAULT_MIN_TIMEOUT_MS, quantile=0.99, factor=4.0,
+                 min_samples=20, refresh=50):
+        self.tracker = tracker
+        self.phase = phase
+        self.max_ms = max_ms
+        self.min_ms = min(min_ms, max_ms)
+        self.quantile = quantile
+        self.factor = factor
+        self.min_samples = min_samples
+        self.refresh = refresh
+
+        self._timeout_ms = max_ms
+        self._count = None
+
+    def __call__(self):
+        """Returns the current timeout in milliseconds."""
+        count = self.tracker.count(self.phase)
+        if count < self.min_samples:
+            return self.max_ms
+
+        if self._count is None or count - self._count >= self.refresh:
+            latency_ns = self.tracker.percentiles(self.phase, (self.quantile,))[self.quantile]
+            self._timeout_ms = round(min(self.max_ms, max(self.min_ms, self.factor * latency_ns / 1e6)))
+            self._count = count
+
+        return self._timeout_ms
+
+
+def serve_metrics(tracker, port, host="127.0.0.1", name=DEFAULT_METRIC_NAME):
+    """Serves a tracker's latencies at http://<host>:<port>/metrics from a background thread.
+
+    Args:
+        tracker (LatencyTracker): The tracker to serve.
+        port (int): The port number to listen on.
+        host (str): The address to listen on.
+        name (str): The exported metric's name.
+
+    Returns:
+        ThreadingHTTPServer: The running server (call shutdown() to stop it).
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+
+            body = tracker.to_prometheus(name).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # requests are not logged to stderr
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
@@ -0,0 +1,299 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import zmq
+
+from shared import ACTION_REQ_TOPIC
+from shared import SELECTION_RESULT_TOPIC
+from shared import STATE_TOPIC
+from shared import VIEWPORTS
+from shared import decode_message
+from shared import split_message
+from shared.delta import FrameReconstructor
+
+RECORDING_VERSION = 1
+
+# files that make up a recording directory
+HEADER_FILE = "recording.json"
+MESSAGES_FILE = "messages.txt"
+FRAMES_FILE = "frames.u8"
+INDEX_FILE = "index.bin"
+
+# topics are stored in the index as small integer codes so that messages can be filtered without being decoded
+TOPIC_CODES = {STATE_TOPIC: 1, ACTION_REQ_TOPIC: 2, SELECTION_RESULT_TOPIC: 3}
+OTHER_TOPIC_CODE = 0
+
+# one index entry per recorded message
+INDEX_DTYPE = np.dtype([
+    ("time_ns", "<i8"),  # receive time (time.time_ns())
+    ("seqno", "<i8"),  # the publisher's header seqno (or -1)
+    ("topic", "u1"),  # see TOPIC_CODES
+    ("n_frames", "u1"),  # the number of screenshot frames
+    ("message_length", "<u4"),  # the length in bytes of the message's line in MESSAGES_FILE (without newline)
+    ("message_offset", "<i8"),  # the offset in bytes of the message's line in MESSAGES_FILE
+    ("first_frame", "<i8"),  # the row of the message's first frame in FRAMES_FILE
+])
+
+
+class RecordingWriter:
+    """Appends messages received from the GAB state publisher to a recording directory.
+
+    Every message is stored in the binary screenshot wire format (see shared.decode_message): its first frame, with
+    each screenshot replaced by the index of a trailing frame, is appended as a line to a text file, and its
+    screenshots are appended as rows to a raw uint8 frame file that can be memory-mapped. An index of fixed-size
+    entries (INDEX_DTYPE) records each message's receive time, seqno, topic, and offsets into the other files.
+    Delta-encoded screenshots (see shared.delta) are reconstructed, so every recorded screenshot is a full frame.
+
+    Args:
+        path (str): The recording directory (created if it does not exist; existing recordings are appended to).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        header_path = self.path / HEADER_FILE
+        self.header = json.loads(header_path.read_text()) if header_path.exists() else None
+
+        self._messages = open(self.path / MESSAGES_FILE, "ab")
+        self._frames = open(self.path / FRAMES_FILE, "ab")
+        self._index = open(self.path / INDEX_FILE, "ab")
+
+        # an existing recording is appended to (each file continues from its end)
+        self._message_offset = self._messages.tell()
+        frame_size = self.header["frame_size"] if self.header else None
+        self._n_frames = self._frames.tell() // frame_size if frame_size else 0
+
+        self.reconstructor = FrameReconstructor()
+
+        self._entry = np.zeros(1, dtype=INDEX_DTYPE)
+        self.count = 0
+
+    def write(self, frames, time_ns=None):
+        """Appends a message received from the GAB state publisher.
+
+        Args:
+            frames (list): The message frames (zmq.Frame or bytes) returned by recv_multipart.
+            time_ns (int, optional): The message's receive time in nanoseconds (defaults to now).
+        """
+        if time_ns is None:
+            time_ns = time.time_ns()
+
+        delta = False
+        if len(frames) > 1:
+            head = frames[0]
+            line = head.bytes if isinstance(head, zmq.Frame) else bytes(head)
+            topic, encoded_payload = split_message(line.decode("utf-8"))
+            payload = json.loads(encoded_payload)
+            header = payload.get("header") or {}
+            delta = "frame_seqno" in (payload.get("data") or {})
+
+        if len(frames) > 1 and not delta:
+            # binary screenshot format: the first frame is stored as received
+            screenshots = [frame.buffer if isinstance(frame, zmq.Frame) else frame for frame in frames[1:]]
+        else:
+            topic, payload = decode_message(frames)
+            payload = self.reconstructor.apply(payload)
+            header = payload.get("header") or {}
+            line, screenshots = self._extract_screenshots(topic, payload)
+
+        for screenshot in screenshots:
+            self._write_frame(screenshot)
+
+        self._messages.write(line)
+        self._messages.write(b"\n")
+
+        entry = self._entry[0]
+        entry["time_ns"] = time_ns
+        entry["seqno"] = header.get("seqno") if header.get("seqno") is not None else -1
+        entry["topic"] = TOPIC_CODES.get(topic, OTHER_TOPIC_CODE)
+        entry["n_frames"] = len(screenshots)
+        entry["message_length"] = len(line)
+        entry["message_offset"] = self._message_offset
+        entry["first_frame"] = self._n_frames - len(screenshots)
+        self._index.write(self._entry.tobytes())
+
+        self._message_offset += len(line) + 1
+        self.count += 1
+
+    @staticmethod
+    def _extract_screenshots(topic, payload):
+        """Converts a JSON-only (or reconstructed delta-encoded) message into the binary screenshot format."""
+        screenshots = []
+        data = payload.get("data") or {}
+        for viewport in VIEWPORTS:
+            viewport_data = data.get(viewport)
+            if viewport_data and viewport_data.get("screenshot") is not None:
+                screenshots.append(np.asarray(viewport_data["screenshot"], dtype=np.uint8))
+                viewport_data["screenshot"] = len(screenshots) - 1
+
+        return f"{topic} {json.dumps(payload)}".encode("utf-8"), screenshots
+
+    def _write_frame(self, screenshot):
+        screenshot = memoryview(screenshot).cast("B")
+
+        if self.header is None:
+            self.header = {"version": RECORDING_VERSION, "frame_size": len(screenshot),
+                           "created": round(time.time() * 1000)}
+            (self.path / HEADER_FILE).write_text(json.dumps(self.header))
+        elif len(screenshot) != self.header["frame_size"]:
+            raise ValueError(f"Screenshot size {len(screenshot)} does not match the recording's frame size "
+                             f"{self.header['frame_size']}")
+
+        self._frames.write(screenshot)
+        self._n_frames += 1
+
+    def flush(self):
+        # data files are flushed before the index so that index entries never refer to unwritten data
+        self._frames.flush()
+        self._messages.flush()
+        self._index.flush()
+
+    def close(self):
+        self.flush()
+        for f in (self._frames, self._messages, self._index):
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Recording:
+    """Read-only access to a recording directory written by RecordingWriter.
+
+    The frame file is memory-mapped, so opening a recording is cheap regardless of its size, and messages decode to
+    the same (topic, payload) tuples as shared.receive, with screenshots as (read-only) views of the frame file.
+    Incomplete trailing entries (e.g., from a recorder that was killed) are ignored.
+
+    Args:
+        path (str): The recording directory.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+        header_path = self.path / HEADER_FILE
+        self.header = json.loads(header_path.read_text()) if header_path.exists() else {}
+        self.frame_size = self.header.get("frame_size")
+
+        index = np.fromfile(self.path / INDEX_FILE, dtype=INDEX_DTYPE)
+
+        # frames are mapped as one row per screenshot
+        frames_path = self.path / FRAMES_FILE
+        n_frames = os.path.getsize(frames_path) // self.frame_size if self.frame_size else 0
+        if n_frames:
+            self.frames = np.memmap(frames_path, dtype=np.uint8, mode="r", shape=(n_frames, self.frame_size))
+        else:
+            self.frames = np.zeros((0, self.frame_size or 0), dtype=np.uint8)
+
+        messages_path = self.path / MESSAGES_FILE
+        complete = ((index["message_offset"] + index["message_length"] < os.path.getsize(messages_path))
+                    & (index["first_frame"] + index["n_frames"] <= n_frames))
+        self.index = index[:np.argmin(complete) if not complete.all() else len(index)]
+
+        self._messages = open(messages_path, "rb")
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        """Decodes the i-th message.
+
+        Returns:
+            tuple: A tuple containing the message's topic (str) and payload (dict).
+        """
+        return decode_message(self.frames_of(i))
+
+    def __iter__(self):
+        return self.messages()
+
+    def frames_of(self, i):
+        """Returns the i-th message in the binary screenshot wire format (a list of bytes and uint8 arrays)."""
+        entry = self.index[i]
+        self._messages.seek(entry["message_offset"])
+        head = self._messages.read(entry["message_length"])
+
+        first = entry["first_frame"]
+        return [head, *self.frames[first:first + entry["n_frames"]]]
+
+    def messages(self, topics=None, start=0, stop=None):
+        """Iterates over decoded messages.
+
+        Args:
+            topics (list, optional): Only messages with these topics are decoded and yielded.
+            start (int): The index of the first message.
+            stop (int, optional): The index at which iteration stops.
+
+        Yields:
+            tuple: A tuple containing each message's topic (str) and payload (dict).
+        """
+        for i in self.select(topics, start, stop):
+            yield self[i]
+
+    def select(self, topics=None, start=0, stop=None):
+        """Returns the indices of the messages with the given topics (using only the index)."""
+        indices = np.arange(start, len(self) if stop is None else min(stop, len(self)))
+        if topics is not None:
+            codes = [TOPIC_CODES.get(topic, OTHER_TOPIC_CODE) for topic in topics]
+            indices = indices[np.isin(self.index["topic"][indices], codes)]
+
+        return indices
+
+    def find_time(self, time_ns):
+        """Returns the index of the first message received at or after time_ns."""
+        return int(np.searchsorted(self.index["time_ns"], time_ns, side="left"))
+
+    def find_seqno(self, seqno, topic=STATE_TOPIC):
+        """Returns the index of the first message with the given topic and seqno (or None)."""
+        matches = np.flatnonzero((self.index["seqno"] == seqno)
+                                 & (self.index["topic"] == TOPIC_CODES.get(topic, OTHER_TOPIC_CODE)))
+        return int(matches[0]) if len(matches) else None
+
+    def close(self):
+        self._messages.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def replay(recording, socket, speed=1.0, topics=None, start=0, stop=None):
+    """Publishes a recording's messages (in the binary screenshot wire format) on a ZMQ PUB socket.
+
+    Args:
+        recording (Recording): The recording to replay.
+        socket (zmq.Socket): A bound PUB socket.
+        speed (float): The replay speed relative to the original receive times (None or 0 replays as fast as
+            possible).
+        topics (list, optional): Only messages with these topics are replayed.
+        start (int): The index of the first replayed message.
+        stop (int, optional): The index at which the replay stops.
+
+    Returns:
+        int: The number of messages published.
+    """
+    indices = recording.select(topics, start, stop)
+    if len(indices) == 0:
+        return 0
+
+    times = recording.index["time_ns"]
+    origin_ns = times[indices[0]]
+    start_ns = time.perf_counter_ns()
+
+    for i in indices:
+        if speed:
+            delay_ns = (times[i] - origin_ns) / speed - (time.perf_counter_ns() - start_ns)
+            if delay_ns > 0:
+                time.sleep(delay_ns / 1e9)
+
+        socket.send_multipart(recording.frames_of(i), copy=False)
+
+    return len(indices)
@@ -0,0 +1,165 @@
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from shared import VIEWPORTS
+
+# the ring's shared memory block starts with a header (the number of slots and the size of a frame), followed by one
+# generation counter per slot and then the slots' frames
+HEADER_DTYPE = np.dtype([("slots", "<u8"), ("frame_size", "<u8")])
+GENERATION_DTYPE = np.dtype("<u8")
+
+DEFAULT_SLOTS = 64
+
+# the element of a state message's data that names the ring holding its screenshots
+FRAME_RING_KEY = "frame_ring"
+
+
+class FrameRing:
+    """A ring buffer of fixed-size frames in a multiprocessing.shared_memory block.
+
+    A single writer fills the slots in turn. Each slot has a generation counter that is odd while the slot is being
+    written and is incremented again when the write completes, so a reader holding a (slot, generation) reference
+    can tell whether the frame it refers to has since been overwritten.
+
+    Args:
+        name (str): The shared memory block's name.
+        slots (int): The number of frames the ring holds (when creating it).
+        frame_size (int): The size of a frame in bytes (when creating it).
+        create (bool): Whether to create the block (as the writer) rather than attach to an existing one.
+    """
+
+    def __init__(self, name, slots=DEFAULT_SLOTS, frame_size=None, create=False):
+        if create:
+            size = HEADER_DTYPE.itemsize + slots * (GENERATION_DTYPE.itemsize + frame_size)
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            header = np.ndarray(1, dtype=HEADER_DTYPE, buffer=self.shm.buf)
+            header[0] = (slots, frame_size)
+            del header
+        else:
+            self.shm = _attach(name)
+
+        header = np.ndarray(1, dtype=HEADER_DTYPE, buffer=self.shm.buf)[0]
+        self.slots, self.frame_size = int(header["slots"]), int(header["frame_size"])
+        self.name = name
+        self.owner = create
+
+        self.generations = np.ndarray(self.slots, dtype=GENERATION_DTYPE, buffer=self.shm.buf,
+                                      offset=HEADER_DTYPE.itemsize)
+        self.frames = np.ndarray((self.slots, self.frame_size), dtype=np.uint8, buffer=self.shm.buf,
+                                 offset=HEADER_DTYPE.itemsize + self.generations.nbytes)
+
+        self._next_slot = 0
+
+    def write(self, frame):
+        """Writes a frame (a uint8 array or bytes-like object) into the next slot.
+
+        Returns:
+            tuple: The slot and generation that refer to the written frame.
+        """
+        slot = self._next_slot
+        self._next_slot = (slot + 1) % self.slots
+
+        if not isinstance(frame, np.ndarray):
+            frame = np.frombuffer(frame, dtype=np.uint8)
+
+        self.generations[slot] += 1
+        self.frames[slot] = frame.reshape(-1)
+        self.generations[slot] += 1
+
+        return slot, int(self.generations[slot])
+
+    def is_current(self, slot, generation):
+        """Checks whether a slot still holds the frame written as the given generation."""
+        return int(self.generations[slot]) == generation
+
+    def view(self, slot, generation):
+        """Returns a read-only view of a slot's frame (see SharedFrame)."""
+        frame = self.frames[slot].view(SharedFrame)
+        frame.flags.writeable = False
+        frame.ring, frame.slot, frame.generation = self, slot, generation
+        return frame
+
+    def close(self):
+        self.generations = self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # views of the ring are still in use; the mapping is released when they are garbage collected
+            return
+
+        if self.owner:
+            self.shm.unlink()
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before Python 3.13, attaching registers the block with the resource tracker, which would unlink it when
+        # this (reading) process exits
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class SharedFrame(np.ndarray):
+    """A read-only view of a frame in a FrameRing.
+
+    Views of it (e.g., reshaped observations) keep track of the frame's slot and generation, so their overwritten
+    property tells whether the writer has since reused the slot (in which case the view's contents are no longer
+    the frame's). Frames that must outlive the ring's capacity should be copied with np.array.
+    """
+
+    def __array_finalize__(self, obj):
+        self.ring = getattr(obj, "ring", None)
+        self.slot = getattr(obj, "slot", None)
+        self.generation = getattr(obj, "generation", None)
+
+    @property
+    def overwritten(self):
+        return self.ring is not None and not self.ring.is_current(self.slot, self.generation)
+
+
+class SharedFrameReader:
+    """Replaces the screenshot references of state messages relayed through a FrameRing (see scripts/shm_relay.py)
+    with read-only views of the referenced frames.
+
+    In relayed messages, the data element FRAME_RING_KEY names the ring, and each viewport's "screenshot" element
+    holds the frame's slot and generation. Messages without a ring are passed through unchanged.
+    """
+
+    def __init__(self):
+        self.rings = {}
+
+    def apply(self, payload):
+        """Replaces a decoded state message's screenshot references with views of the referenced frames.
+
+        Args:
+            payload (dict): A payload decoded by shared.decode_message.
+
+        Returns:
+            dict: The payload, with SharedFrame screenshots.
+        """
+        data = (payload or {}).get("data") or {}
+        name = data.get(FRAME_RING_KEY)
+        if name is None:
+            return payload
+
+        ring = self.rings.get(name)
+        if ring is None:
+            ring = self.rings[name] = FrameRing(name)
+
+        for viewport in VIEWPORTS:
+            viewport_data = data.get(viewport)
+            if viewport_data and viewport_data.get("screenshot") is not None:
+                slot, generation = viewport_data["screenshot"]
+                viewport_data["screenshot"] = ring.view(slot, generation)
+
+        return payload
+
+    def close(self):
+        for ring in self.rings.values():
+            ring.close()
+        self.rings = {}
@@ -0,0 +1,128 @@
+import sys
+import time
+
+import zmq
+
+from shared import DEFAULT_BATCH_SIZE
+from shared import DEFAULT_SHUTDOWN_TIMEOUT_MS
+from shared import RECEIVE_WAIT_MS
+from shared import shutdown_event
+
+
+class StreamRunner:
+    """Receives messages from the GAB state publisher and passes them to a handler until shutdown.
+
+    The inactivity timeout is a single monotonic deadline, which is pushed back once per batch of messages and checked
+    whenever the runner wakes (waits are bounded by the deadline), so it costs no thread or timer per message (unlike
+    shared.reset_shutdown_timer). When it passes, shared.shutdown_event is set. The deadline is not checked while the
+    handler runs, so a handler that blocks delays the shutdown until it returns.
+
+    Each wakeup drains up to batch_size queued messages without blocking. The runner's counters show whether the
+    handler keeps up with the publisher: batches that were full (i.e., messages were still queued when the batch
+    ended) and the fraction of time spent handling messages (utilization) both approach 1 as the subscriber's queue
+    grows, and once it reaches its high-water mark, newer messages are dropped.
+
+        dispatcher = Dispatcher()
+        ...
+        runner = StreamRunner(connection, dispatcher.dispatch, timeout=args.timeout)
+        runner.run()
+        print(runner.report())
+
+    Args:
+        connection (zmq.Socket): A connection to the GAB state publisher (see shared.get_state_subscriber).
+        handler (callable): Called with the frames (list of zmq.Frame) of each received message (e.g.,
+            shared.dispatch.Dispatcher.dispatch).
+        timeout (int): The maximum time in milliseconds to wait for a message before shutting down.
+        batch_size (int): The maximum number of messages handled per wakeup.
+        on_idle (callable, optional): Called when no message was received for RECEIVE_WAIT_MS (e.g., to flush
+            buffered output).
+        verbose (bool): Whether waits without messages are reported on stdout.
+    """
+
+    def __init__(self, connection, handler, timeout=DEFAULT_SHUTDOWN_TIMEOUT_MS, batch_size=DEFAULT_BATCH_SIZE,
+                 on_idle=None, verbose=False):
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive, not {batch_size}")
+
+        self.connection = connection
+        self.handler = handler
+        self.timeout_ns = timeout * 1_000_000
+        self.batch_size = batch_size
+        self.on_idle = on_idle
+        self.verbose = verbose
+
+        self.poller = zmq.Poller()
+        self.poller.register(connection, zmq.POLLIN)
+
+        # whether the runner stopped because no message was received before the timeout
+        self.timed_out = False
+
+        # backpressure counters
+        self.received = 0
+        self.batches = 0
+        self.full_batches = 0
+        self.max_batch = 0
+        self.busy_ns = 0
+        self.elapsed_ns = 0
+
+    @property
+    def utilization(self):
+        """float: The fraction of the runner's time spent handling messages."""
+        return self.busy_ns / self.elapsed_ns if self.elapsed_ns else 0.0
+
+    def run(self):
+        """Receives and handles messages until shared.shutdown_event is set (by stop or the inactivity timeout)."""
+        started = time.monotonic_ns()
+        deadline = started + self.timeout_ns
+        try:
+            while not shutdown_event.is_set():
+                remaining_ms = -(-(deadline - time.monotonic_ns()) // 1_000_000)
+                if remaining_ms <= 0:
+                    print(f"No message received for {self.timeout_ns / 1e9} seconds. Shutting down...",
+                          file=sys.stderr)
+                    self.timed_out = True
+                    self.stop()
+                    break
+
+                if not self.poller.poll(min(remaining_ms, RECEIVE_WAIT_MS)):
+                    if remaining_ms > RECEIVE_WAIT_MS:
+                        if self.on_idle is not None:
+                            self.on_idle()
+                        if self.verbose:
+                            print("Waiting for messages...", flush=True)
+                    continue
+
+                batch_start = time.monotonic_ns()
+                self._drain()
+                batch_end = time.monotonic_ns()
+
+                self.busy_ns += batch_end - batch_start
+                deadline = batch_end + self.timeout_ns
+        finally:
+            self.elapsed_ns = time.monotonic_ns() - started
+
+    def _drain(self):
+        """Handles the queued messages, up to batch_size of them."""
+        count = 0
+        while count < self.batch_size:
+            try:
+                frames = self.connection.recv_multipart(zmq.NOBLOCK, copy=False)
+            except zmq.Again:
+                break
+
+            count += 1
+            self.handler(frames)
+
+        self.received += count
+        self.batches += 1
+        self.max_batch = max(self.max_batch, count)
+        if count == self.batch_size:
+            self.full_batches += 1
+
+    def stop(self):
+        """Stops the runner (and any other loop waiting on shared.shutdown_event)."""
+        shutdown_event.set()
+
+    def report(self):
+        return (f"Received: {self.received} in {self.batches} batches (largest: {self.max_batch}, full: "
+                f"{self.full_batches}), Utilization: {self.utilization:.1%}")
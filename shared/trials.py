@@ -0,0 +1,211 @@
+from pathlib import Path
+
+import numpy as np
+
+# one row per selection trial
+TRIAL_DTYPE = np.dtype([
+    ("seqno", "<i8"),  # the selection action's seqno
+    ("shape", "<i2"),  # the active (right viewport) polyomino's shape
+    ("id", "<i2"),  # the active polyomino's id
+    ("same", "i1"),  # whether the viewports showed the same polyomino (1), different ones (0), or unknown (-1)
+    ("selected_same", "?"),  # whether "same" was selected
+    ("result", "?"),  # whether the selection was correct
+    ("rotation", "<f4"),
+    ("scale", "<f4"),
+    ("translation", "<f4"),
+    ("latency", "<f4"),  # milliseconds from the action request to the selection result (NaN if unknown)
+])
+
+DEFAULT_CHUNK_SIZE = 65536
+
+# confusion matrix indices
+DIFFERENT, SAME = 0, 1
+
+# bin edges of the transformations that accuracy is broken down by (values beyond the outer edges are counted in the
+# first or last bin)
+TRANSFORMATION_BINS = {
+    "rotation": np.linspace(0.0, 360.0, 13),
+    "scale": np.linspace(0.6, 1.5, 10),
+    "translation": np.linspace(0.0, 60.0, 13),
+}
+
+
+class TrialStatistics:
+    """Counters summarizing selection trials: the same/different confusion matrix and per-shape and per-transformation
+    bin attempts and correct selections.
+
+    Every counter is a sum over trials, so the statistics of separate sessions (or shards of one) can be combined
+    with merge.
+    """
+
+    def __init__(self):
+        # confusion[actual, selected], where actual is DIFFERENT or SAME (trials with unknown actual are excluded)
+        self.confusion = np.zeros((2, 2), dtype=np.int64)
+        self.shape_attempts = np.zeros(0, dtype=np.int64)
+        self.shape_correct = np.zeros(0, dtype=np.int64)
+        self.bin_attempts = {name: np.zeros(len(edges) - 1, dtype=np.int64)
+                             for name, edges in TRANSFORMATION_BINS.items()}
+        self.bin_correct = {name: np.zeros(len(edges) - 1, dtype=np.int64)
+                            for name, edges in TRANSFORMATION_BINS.items()}
+
+    def add(self, shape, same, selected_same, result, transformations):
+        """Counts a trial.
+
+        Args:
+            shape (int): The active polyomino's shape (or -1 if unknown).
+            same (bool): Whether the viewports showed the same polyomino (or None if unknown).
+            selected_same (bool): Whether "same" was selected.
+            result (bool): Whether the selection was correct.
+            transformations (dict): The trial's value of each transformation in TRANSFORMATION_BINS (NaN if unknown).
+        """
+        if same is not None:
+            self.confusion[int(bool(same)), int(bool(selected_same))] += 1
+
+        if shape >= 0:
+            self._grow_shapes(shape + 1)
+            self.shape_attempts[shape] += 1
+            self.shape_correct[shape] += bool(result)
+
+        for name, edges in TRANSFORMATION_BINS.items():
+            value = transformations.get(name)
+            if value is None or np.isnan(value):
+                continue
+
+            i = min(max(int(np.searchsorted(edges, value, side="right")) - 1, 0), len(edges) - 2)
+            self.bin_attempts[name][i] += 1
+            self.bin_correct[name][i] += bool(result)
+
+    def _grow_shapes(self, n):
+        if n > len(self.shape_attempts):
+            self.shape_attempts = np.pad(self.shape_attempts, (0, n - len(self.shape_attempts)))
+            self.shape_correct = np.pad(self.shape_correct, (0, n - len(self.shape_correct)))
+
+    def merge(self, other):
+        """Adds another TrialStatistics' counts to these."""
+        self.confusion += other.confusion
+
+        self._grow_shapes(len(other.shape_attempts))
+        self.shape_attempts[:len(other.shape_attempts)] += other.shape_attempts
+        self.shape_correct[:len(other.shape_correct)] += other.shape_correct
+
+        for name in TRANSFORMATION_BINS:
+            self.bin_attempts[name] += other.bin_attempts[name]
+            self.bin_correct[name] += other.bin_correct[name]
+
+    def per_shape_accuracy(self):
+        """Returns the shapes that have been attempted and the fraction of their trials that were correct."""
+        shapes = np.flatnonzero(self.shape_attempts)
+        return shapes, self.shape_correct[shapes] / self.shape_attempts[shapes]
+
+    def binned_accuracy(self, name):
+        """Returns a transformation's bin edges, attempts per bin, and accuracy per bin (NaN for empty bins)."""
+        attempts = self.bin_attempts[name]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            accuracy = np.where(attempts > 0, self.bin_correct[name] / attempts, np.nan)
+        return TRANSFORMATION_BINS[name], attempts, accuracy
+
+    def to_dict(self):
+        """Returns the statistics as (JSON-serializable) lists."""
+        shapes, shape_accuracies = self.per_shape_accuracy()
+        return {
+            "confusion": {"actual_same": {"selected_same": int(self.confusion[SAME, SAME]),
+                                          "selected_different": int(self.confusion[SAME, DIFFERENT])},
+                          "actual_different": {"selected_same": int(self.confusion[DIFFERENT, SAME]),
+                                               "selected_different": int(self.confusion[DIFFERENT, DIFFERENT])}},
+            "shapes": {str(shape): {"attempts": int(self.shape_attempts[shape]), "accuracy": float(accuracy)}
+                       for shape, accuracy in zip(shapes, shape_accuracies)},
+            "transformations": {name: {"edges": TRANSFORMATION_BINS[name].tolist(),
+                                       "attempts": self.bin_attempts[name].tolist(),
+                                       "correct": self.bin_correct[name].tolist()}
+                                for name in TRANSFORMATION_BINS},
+        }
+
+
+class TrialStore:
+    """A growable, columnar (NumPy structured array) store of selection trials with incrementally updated counters.
+
+    Rows are appended to an in-memory chunk. Without a spill path, the chunk doubles in size as needed; with one,
+    each full chunk is appended to the spill file (raw TRIAL_DTYPE rows) and memory use stays bounded by the chunk
+    size. Summary statistics (see TrialStatistics) are updated on every append, so they never require a pass over
+    the stored trials.
+
+    Args:
+        spill_path (str, optional): The file that full chunks are appended to (overwritten if it exists).
+        chunk_size (int): The number of rows held in memory before spilling (or the initial capacity, otherwise).
+    """
+
+    def __init__(self, spill_path=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.spill_path = Path(spill_path) if spill_path else None
+        if self.spill_path:
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            self.spill_path.write_bytes(b"")
+
+        self._chunk = np.zeros(chunk_size, dtype=TRIAL_DTYPE)
+        self._n = 0
+        self.spilled = 0
+
+        self.statistics = TrialStatistics()
+
+    def __len__(self):
+        return self.spilled + self._n
+
+    def append(self, seqno, shape, id, same, selected_same, result, rotation, scale, translation, latency):
+        """Appends a trial and updates the counters."""
+        if self._n == len(self._chunk):
+            self._make_room()
+
+        self._chunk[self._n] = (seqno, shape, id, -1 if same is None else same, selected_same, result, rotation,
+                                scale, translation, latency)
+        self._n += 1
+
+        self.statistics.add(shape, same, selected_same, result,
+                            {"rotation": rotation, "scale": scale, "translation": translation})
+
+    def _make_room(self):
+        if self.spill_path is None:
+            self._chunk = np.concatenate([self._chunk, np.zeros(len(self._chunk), dtype=TRIAL_DTYPE)])
+            return
+
+        self.flush()
+
+    def flush(self):
+        """Appends the in-memory rows to the spill file (if any)."""
+        if self.spill_path is None or self._n == 0:
+            return
+
+        with open(self.spill_path, "ab") as f:
+            f.write(self._chunk[:self._n].tobytes())
+
+        self.spilled += self._n
+        self._n = 0
+
+    def chunks(self):
+        """Yields the stored trials as arrays: the spilled rows (memory-mapped) followed by the in-memory rows."""
+        if self.spilled:
+            yield np.memmap(self.spill_path, dtype=TRIAL_DTYPE, mode="r", shape=(self.spilled,))
+        if self._n:
+            yield self._chunk[:self._n]
+
+    def to_array(self):
+        """Returns all stored trials as a single (in-memory) array."""
+        chunks = list(self.chunks())
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=TRIAL_DTYPE)
+
+    def sample(self, max_rows, rng=None):
+        """Returns at most max_rows trials, chosen uniformly at random (in their stored order) when there are more.
+
+        Only the chosen rows of the spill file are read.
+        """
+        if len(self) <= max_rows:
+            return self.to_array()
+
+        rng = rng if rng is not None else np.random.default_rng()
+        indices = np.sort(rng.choice(len(self), size=max_rows, replace=False))
+
+        parts, offset = [], 0
+        for chunk in self.chunks():
+            selected = indices[(indices >= offset) & (indices < offset + len(chunk))] - offset
+            parts.append(np.asarray(chunk[selected]))
+            offset += len(chunk)
+
+        return np.concatenate(parts)
@@ -0,0 +1,55 @@
+import socket
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# the environments import their sibling modules directly (as when run from the gymnasium directory)
+sys.path.insert(0, str(REPO_ROOT / "gymnasium"))
+sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks.standin import StandInEnvironment  # noqa: E402
+
+
+def free_port():
+    """Returns a TCP port that is free on the loopback interface."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+@pytest.fixture
+def ports():
+    """The (action, state) ports of a stand-in Godot environment."""
+    return free_port(), free_port()
+
+
+@pytest.fixture
+def start_standin(ports):
+    """Returns a function that starts a stand-in Godot environment (see benchmarks.standin) on ports in a thread."""
+    stop = threading.Event()
+    threads = []
+
+    def start():
+        action_port, state_port = ports
+        standin = StandInEnvironment(state_port=state_port, action_port=action_port, seed=0)
+
+        def run():
+            try:
+                standin.run(stop_event=stop)
+            finally:
+                standin.close()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        threads.append(thread)
+        return standin
+
+    yield start
+
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=5)
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+import pytest
+
+from AsyncPolyominoEnv import AsyncPolyominoEnvironment
+from PolyominoEnv import Actions
+
+
+@pytest.fixture
+def env(ports, start_standin):
+    action_port, state_port = ports
+    start_standin()
+
+    env = AsyncPolyominoEnvironment(PORT=action_port, LISTENER_PORT=state_port, HOST="127.0.0.1", TIMEOUT=2000)
+    time.sleep(0.3)
+    yield env
+    env.close()
+
+
+def test_step_sequence(env):
+    async def run():
+        await env.reset()
+        sequence = await env.step_sequence([Actions.UP.value] * 7 + [Actions.NEXT_SHAPE.value, Actions.LEFT.value])
+        repeat = await env.step_repeat(Actions.ROTATE_CLOCKWISE.value, 3)
+        return sequence, repeat
+
+    (observation, _, _, _, info), (_, _, _, _, repeat_info) = asyncio.run(run())
+    assert info["actions"] == 9
+    assert repeat_info["actions"] == 3
+    assert observation["left"].shape == (128, 128, 1)
+    assert env.latest_env_state is not None
+
+
+def test_step_async(env):
+    async def run():
+        await env.reset()
+        seqno = env.seqno
+        for action in (Actions.UP.value, Actions.DOWN.value, Actions.LEFT.value):
+            env.step_async(action)
+
+        transitions = [await env.step_wait() for _ in range(3)]
+        with pytest.raises(RuntimeError):
+            await env.step_wait()
+        return seqno, transitions
+
+    seqno, transitions = asyncio.run(run())
+    assert len(transitions) == 3
+    assert env.seqno == seqno + 3
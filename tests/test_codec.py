@@ -0,0 +1,27 @@
+import numpy as np
+
+from benchmarks.codec import state_message
+from shared.codec import EncodedScreenshot
+from shared.codec import MessageCodec
+
+
+def test_lazy_screenshots_match_parsed_screenshots():
+    frames = state_message(16)
+    codec = MessageCodec()
+
+    _, parsed = codec.decode_payload(frames)
+    _, lazy = codec.decode_payload(frames, lazy=True)
+
+    for viewport in ("left_viewport", "right_viewport"):
+        screenshot = lazy["data"][viewport]["screenshot"]
+        assert isinstance(screenshot, EncodedScreenshot)
+        np.testing.assert_array_equal(np.asarray(screenshot, dtype=np.uint8), parsed["data"][viewport]["screenshot"])
+
+    assert lazy["data"]["transformations"] == parsed["data"]["transformations"]
+
+
+def test_lazy_decoding_leaves_binary_screenshots_as_arrays():
+    frames = state_message(16, binary=True)
+    _, payload = MessageCodec().decode_payload(frames, lazy=True)
+
+    assert isinstance(payload["data"]["right_viewport"]["screenshot"], np.ndarray)
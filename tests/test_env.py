@@ -0,0 +1,41 @@
+import time
+
+import numpy as np
+import pytest
+
+from PolyominoEnv import Actions
+from PolyominoEnv import PolyominoEnvironment
+
+
+@pytest.fixture
+def env(ports, start_standin):
+    action_port, state_port = ports
+    start_standin()
+
+    env = PolyominoEnvironment(PORT=action_port, LISTENER_PORT=state_port, HOST="127.0.0.1", TIMEOUT=2000)
+    time.sleep(0.3)
+    yield env
+    env.close()
+
+
+def test_cached_reference_observation_is_writable(env):
+    env.reset()
+
+    # the stand-in's reference object changes with every state, so one is pinned to exercise the cache
+    env.latest_env_state["reference"] = (1, 0)
+    first = env._get_observation()["left"]
+    first[:] = 0
+
+    second = env._get_observation()["left"]
+    assert second.flags.writeable
+    assert second is not first
+    assert second.any()
+
+
+def test_observations_are_converted_on_access(env):
+    env.reset()
+    observation, *_ = env.step(Actions.UP.value)
+
+    assert callable(dict.__getitem__(observation, "left"))
+    assert observation["left"].shape == (128, 128, 1)
+    assert np.asarray(observation["right"]).dtype == np.uint8
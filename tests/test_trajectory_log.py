@@ -0,0 +1,23 @@
+import logging
+
+from PolyominoTrajectoryLog import TrajectoryLogger
+
+
+def _log_steps(path, **kwargs):
+    trajectory_log = TrajectoryLogger(str(path), **kwargs)
+    for seqno in range(3):
+        trajectory_log.log_step(seqno, 0, 0.0, False, False)
+    trajectory_log.close()
+    return path.read_text().splitlines() if path.exists() else []
+
+
+def test_steps_are_logged_at_step_level(tmp_path):
+    lines = _log_steps(tmp_path / 'steps.log', level=logging.DEBUG, step_level=logging.DEBUG)
+
+    assert len(lines) == 3
+    assert all(' - DEBUG - Seqno: ' in line for line in lines)
+
+
+def test_level_filters_steps_below_it(tmp_path):
+    assert _log_steps(tmp_path / 'steps.log', level=logging.WARNING) == []
+    assert _log_steps(tmp_path / 'debug_steps.log', step_level=logging.DEBUG) == []
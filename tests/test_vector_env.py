@@ -0,0 +1,33 @@
+import time
+
+import pytest
+import zmq
+
+from PolyominoVectorEnv import PolyominoVectorEnv
+
+
+def test_step_after_timeout(ports, start_standin):
+    action_port, state_port = ports
+
+    # an action listener that never replies
+    context = zmq.Context()
+    silent = context.socket(zmq.ROUTER)
+    silent.bind(f"tcp://127.0.0.1:{action_port}")
+
+    env = PolyominoVectorEnv([("127.0.0.1", action_port, state_port)], TIMEOUT=600)
+    try:
+        with pytest.raises(TimeoutError):
+            env.reset()
+
+        silent.close(linger=0)
+        start_standin()
+        time.sleep(0.3)
+
+        # the timed-out requests' sockets were replaced, so the environment recovers once the listener replies
+        observations, _ = env.reset()
+        assert len(observations["left"]) == 1
+        _, rewards, _, _, _ = env.step([0])
+        assert rewards.shape == (1,)
+    finally:
+        env.close()
+        context.term()